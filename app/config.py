@@ -0,0 +1,213 @@
+"""
+App Configuration
+-----------------
+Runtime settings read once from environment variables, so every worker
+started from the same environment behaves the same way.
+
+Usage:
+    from app import config
+
+    if config.PLAN_CACHE_SIZE > 0:
+        ...
+"""
+
+import os
+from typing import Optional
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(name, default).strip()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    """Unset (or empty) = None, for overrides that fall back to other sources."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else None
+
+
+def _env_optional_bool(name: str) -> Optional[bool]:
+    """Unset (or empty) = None, for overrides that fall back to other sources."""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Logging ---
+# DEBUG also logs every raw model completion.
+LOG_LEVEL = _env_str("LOG_LEVEL", "INFO").upper()
+
+# --- Plan cache ---
+# Max number of plans kept in the in-process LRU (0 disables the cache).
+PLAN_CACHE_SIZE = _env_int("PLAN_CACHE_SIZE", 512)
+# Seconds a cached plan stays valid (0 = never expires).
+PLAN_CACHE_TTL = _env_float("PLAN_CACHE_TTL", 6 * 60 * 60)
+# Optional SQLite file shared by all workers on the host ("" disables it).
+PLAN_CACHE_PATH = _env_str("PLAN_CACHE_PATH", "")
+# Bucket sizes used when building the cache key (0 = exact value).
+PLAN_CACHE_BUCKET_AGE = _env_int("PLAN_CACHE_BUCKET_AGE", 0)
+PLAN_CACHE_BUCKET_HEIGHT = _env_float("PLAN_CACHE_BUCKET_HEIGHT", 0)
+PLAN_CACHE_BUCKET_WEIGHT = _env_float("PLAN_CACHE_BUCKET_WEIGHT", 0)
+
+# --- Inference worker / jobs ---
+# Completions allowed to wait for the model before requests get a 503.
+INFERENCE_QUEUE_SIZE = _env_int("INFERENCE_QUEUE_SIZE", 8)
+# Max seconds a synchronous request waits for its completion.
+INFERENCE_TIMEOUT = _env_float("INFERENCE_TIMEOUT", 300)
+# Background threads running async plan jobs.
+JOB_WORKERS = _env_int("JOB_WORKERS", 2)
+# Queued + running jobs allowed before POST /ai/jobs answers 429.
+JOB_MAX_PENDING = _env_int("JOB_MAX_PENDING", 32)
+# Seconds a finished job's result stays available for polling.
+JOB_RESULT_TTL = _env_float("JOB_RESULT_TTL", 15 * 60)
+# Latency budget for GET /ai/generate: seconds to wait for the model before
+# answering with the deterministic plan (source "fallback") while the model
+# keeps going in the background. 0 = always wait; budget_ms overrides per request.
+PLAN_DEADLINE_SECONDS = _env_float("PLAN_DEADLINE_SECONDS", 0)
+# Background generations for budgeted requests (their own pool, not
+# JOB_WORKERS); 0 = what the inference queues can hold, beyond which 503.
+PLAN_UPGRADE_WORKERS = _env_int("PLAN_UPGRADE_WORKERS", 0)
+
+# --- Precomputed plan library ---
+# Memory-mapped file built with `python -m app.services.plan_library`
+# ("" or a missing file disables it).
+PLAN_LIBRARY_PATH = _env_str("PLAN_LIBRARY_PATH", "")
+
+# --- Nearest-neighbour plans (see app/services/plan_neighbors.py) ---
+# A model plan is reused for a profile with the same gender / activity /
+# goal whose scaled distance (age / AGE_SCALE, height / HEIGHT_SCALE,
+# weight / WEIGHT_SCALE) is at most MAX_DISTANCE (0 disables).
+PLAN_NEIGHBORS_MAX_DISTANCE = _env_float("PLAN_NEIGHBORS_MAX_DISTANCE", 1.0)
+PLAN_NEIGHBORS_AGE_SCALE = _env_float("PLAN_NEIGHBORS_AGE_SCALE", 5.0)
+PLAN_NEIGHBORS_HEIGHT_SCALE = _env_float("PLAN_NEIGHBORS_HEIGHT_SCALE", 5.0)
+PLAN_NEIGHBORS_WEIGHT_SCALE = _env_float("PLAN_NEIGHBORS_WEIGHT_SCALE", 2.5)
+# Plans kept per (gender, activity, goal) partition, oldest replaced first.
+PLAN_NEIGHBORS_PARTITION_SIZE = _env_int("PLAN_NEIGHBORS_PARTITION_SIZE", 5000)
+# Newest model_requests rows indexed at startup (0 = start empty).
+PLAN_NEIGHBORS_WARM_ROWS = _env_int("PLAN_NEIGHBORS_WARM_ROWS", 20000)
+
+# --- Request coalescing ---
+# Concurrent /ai/generate requests with the same profile key share one generation.
+PLAN_COALESCE = _env_bool("PLAN_COALESCE", True)
+
+# --- Decoding ---
+# Constrain generation with the plan GBNF grammar so output always parses.
+LLM_CONSTRAINED_DECODING = _env_bool("LLM_CONSTRAINED_DECODING", True)
+# "json": the model writes the whole plan JSON. "compact": it writes short
+# meal/exercise catalog codes that are expanded server-side (far fewer tokens).
+LLM_OUTPUT_MODE = _env_str("LLM_OUTPUT_MODE", "json").lower()
+
+# --- Speculative decoding ---
+# "off", "prompt_lookup" (n-gram drafts from the prompt + output so far) or
+# "draft" (a small GGUF with the same tokenizer at LLM_DRAFT_MODEL_PATH).
+LLM_SPECULATIVE = _env_str("LLM_SPECULATIVE", "off").lower()
+LLM_DRAFT_MODEL_PATH = _env_str("LLM_DRAFT_MODEL_PATH", "")
+# Tokens proposed per draft, and the longest n-gram prompt lookup matches.
+LLM_DRAFT_TOKENS = _env_int("LLM_DRAFT_TOKENS", 10)
+LLM_DRAFT_NGRAM = _env_int("LLM_DRAFT_NGRAM", 2)
+
+# --- Prompt prefix KV reuse ---
+# "snapshot": evaluate the static prompt prefix once and restore its state,
+# "ram": llama_cpp LlamaRAMCache, "off": disabled.
+LLM_PREFIX_CACHE = _env_str("LLM_PREFIX_CACHE", "snapshot").lower()
+# Capacity of the LlamaRAMCache when LLM_PREFIX_CACHE=ram.
+LLM_RAM_CACHE_BYTES = _env_int("LLM_RAM_CACHE_BYTES", 512 << 20)
+
+# --- Database ---
+# "mysql" (production) or "sqlite" (local runs / load tests).
+DB_BACKEND = _env_str("DB_BACKEND", "mysql").lower()
+DB_HOST = _env_str("DB_HOST", "localhost")
+DB_PORT = _env_int("DB_PORT", 3306)
+DB_USER = _env_str("DB_USER", "root")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "ahmed.147")
+DB_NAME = _env_str("DB_NAME", "gym_ai")
+SQLITE_PATH = _env_str("SQLITE_PATH", "gym_ai.sqlite3")
+# Connections kept open, plus temporary extra ones under bursts.
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_POOL_MAX_OVERFLOW = _env_int("DB_POOL_MAX_OVERFLOW", 10)
+# Seconds before a pooled connection is replaced (0 = never).
+DB_POOL_RECYCLE = _env_float("DB_POOL_RECYCLE", 1800)
+# Health-check each connection when it is checked out.
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# Seconds to wait for a free connection before failing.
+DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 10)
+
+# --- Write-behind request log ---
+# Rows held in memory while the DB is slow/down (extra rows are dropped).
+REQUEST_LOG_BUFFER = _env_int("REQUEST_LOG_BUFFER", 10000)
+# Rows per executemany() batch, and max seconds a row waits to be written.
+REQUEST_LOG_BATCH_SIZE = _env_int("REQUEST_LOG_BATCH_SIZE", 100)
+REQUEST_LOG_FLUSH_INTERVAL = _env_float("REQUEST_LOG_FLUSH_INTERVAL", 1.0)
+
+# --- Plan history ---
+# zlib level for stored request/response payloads (1 fastest - 9 smallest).
+PLAN_HISTORY_COMPRESSION = _env_int("PLAN_HISTORY_COMPRESSION", 6)
+
+# --- Meal portions ---
+# Food table (per 100 g) and menus; "" uses the files in app/data.
+FOODS_PATH = _env_str("FOODS_PATH", "")
+MENUS_PATH = _env_str("MENUS_PATH", "")
+
+# --- Bulk user import ---
+# Max rows accepted by POST /users/bulk, and rows per insert transaction.
+USER_BULK_MAX_ROWS = _env_int("USER_BULK_MAX_ROWS", 100000)
+USER_BULK_CHUNK_SIZE = _env_int("USER_BULK_CHUNK_SIZE", 500)
+
+# --- Batch plan calculation ---
+# Max profiles accepted by POST /plans/calculate/batch.
+PLAN_BATCH_MAX_ROWS = _env_int("PLAN_BATCH_MAX_ROWS", 100000)
+
+# --- Model loading ---
+LLM_MODEL_PATH = _env_str("LLM_MODEL_PATH", "data/llama-3.2-1b-instruct-q4_k_m.gguf")
+# "lazy" (first AI request), "startup" (background, at app startup) or
+# "eager" (while ai_model is imported).
+LLM_LOAD_MODE = _env_str("LLM_LOAD_MODE", "lazy").lower()
+# Run one tiny generation right after loading.
+LLM_WARMUP = _env_bool("LLM_WARMUP", False)
+# Seconds before a failed load is retried, doubled after each further
+# failure up to LLM_LOAD_RETRY_MAX_SECONDS.
+LLM_LOAD_RETRY_SECONDS = _env_float("LLM_LOAD_RETRY_SECONDS", 30)
+LLM_LOAD_RETRY_MAX_SECONDS = _env_float("LLM_LOAD_RETRY_MAX_SECONDS", 600)
+
+# --- LLaMA runtime settings (see app/services/llama_settings.py) ---
+# Optional JSON file with any of n_ctx, n_batch, n_threads, n_threads_batch,
+# use_mmap, use_mlock, max_tokens.
+LLM_SETTINGS_PATH = _env_str("LLM_SETTINGS_PATH", "")
+# Each one overrides the file and autotune when set (unset = not overridden).
+LLM_N_CTX = _env_optional_int("LLM_N_CTX")
+LLM_N_BATCH = _env_optional_int("LLM_N_BATCH")
+LLM_THREADS = _env_optional_int("LLM_THREADS")
+LLM_THREADS_BATCH = _env_optional_int("LLM_THREADS_BATCH")
+LLM_USE_MMAP = _env_optional_bool("LLM_USE_MMAP")
+LLM_USE_MLOCK = _env_optional_bool("LLM_USE_MLOCK")
+LLM_MAX_TOKENS = _env_optional_int("LLM_MAX_TOKENS")
+# "off", "cached" (tune threads / batch once per host and reuse the
+# result from LLM_AUTOTUNE_PATH) or "force" (tune on every start).
+LLM_AUTOTUNE = _env_str("LLM_AUTOTUNE", "off").lower()
+LLM_AUTOTUNE_PATH = _env_str("LLM_AUTOTUNE_PATH", "data/llama_autotune.json")
+
+# --- Model instances ---
+# Independent model instances (each with its own worker thread and KV
+# cache; the mmap'd weights are shared). LLM_TOTAL_THREADS is split
+# evenly between them.
+LLM_INSTANCES = _env_int("LLM_INSTANCES", 1)
+LLM_TOTAL_THREADS = _env_int("LLM_TOTAL_THREADS", 4)
+# Pin each instance to its own disjoint set of cores (Linux only).
+LLM_PIN_CORES = _env_bool("LLM_PIN_CORES", False)
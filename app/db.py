@@ -1,26 +1,392 @@
-import mysql.connector
-from mysql.connector import Error
-
-def get_db_connection():
-    """
-    Create and return a MySQL database connection.
-    Raises a clear error if connection fails.
-    """
-
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",       # ✅ Database host
-            user="root",            # ✅ Your MySQL username
-            password="ahmed.147",   # ✅ Your MySQL password
-            database="gym_ai"       # ✅ Your database name
-        )
-
-        if conn.is_connected():
-            print("✅ Database connection successful!")
-            return conn
-        else:
-            raise ConnectionError("❌ Failed to connect to MySQL database.")
-
-    except Error as e:
-        print("❌ MySQL connection error:", e)
-        raise e
+"""
+Database Access
+---------------
+Pooled database connections behind one interface.
+
+    get_db_connection() -> connection with .cursor(dictionary=...),
+                           .commit(), .rollback() and .close()
+    is_duplicate_key(e)  -> whether e is a unique-key violation
+
+close() hands the connection back to the pool instead of dropping it.
+The backend is picked with DB_BACKEND:
+    - "mysql"  (default) the production MySQL server
+    - "sqlite" a local file with the same tables, for load tests and
+               running the API without a MySQL server
+
+Pool behaviour (size, overflow, recycle, health check on checkout) is
+configured in app/config.py.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+from app import config
+
+
+# --- SQLite backend ---
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL UNIQUE,
+        age INTEGER NOT NULL,
+        height_cm REAL NOT NULL,
+        weight_kg REAL NOT NULL,
+        gender TEXT NOT NULL,
+        activity_level TEXT NOT NULL,
+        goal TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Same indexes as sql/001_users_filter_indexes.sql
+    "CREATE INDEX IF NOT EXISTS idx_users_goal_id ON users (goal, id)",
+    "CREATE INDEX IF NOT EXISTS idx_users_activity_id ON users (activity_level, id)",
+    "CREATE INDEX IF NOT EXISTS idx_users_goal_activity_id ON users (goal, activity_level, id)",
+    """
+    CREATE TABLE IF NOT EXISTS model_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        request_json BLOB,
+        response_json BLOB,
+        model_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Same index as sql/002_model_requests_history.sql
+    "CREATE INDEX IF NOT EXISTS idx_model_requests_user_created ON model_requests (user_id, created_at, id)",
+]
+
+
+class SQLiteCursor:
+    """Gives sqlite3 cursors the mysql.connector API the routes use."""
+
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool = False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _translate(sql: str) -> str:
+        # MySQL placeholders / dialect -> SQLite
+        return sql.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        columns = [col[0] for col in self._cursor.description]
+        return dict(zip(columns, row))
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(self._translate(sql), params or ())
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        self._cursor.executemany(self._translate(sql), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size: int = 1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection exposing the subset of mysql.connector we use."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self, dictionary: bool = False, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, **kwargs):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self) -> bool:
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+_sqlite_schema_ready = False
+_sqlite_schema_lock = threading.Lock()
+
+
+def _sqlite_connect() -> SQLiteConnection:
+    global _sqlite_schema_ready
+    conn = SQLiteConnection(config.SQLITE_PATH)
+    with _sqlite_schema_lock:
+        if not _sqlite_schema_ready:
+            for statement in SQLITE_SCHEMA:
+                conn._conn.execute(statement)
+            conn.commit()
+            _sqlite_schema_ready = True
+    return conn
+
+
+# --- MySQL backend ---
+def _mysql_connect():
+    import mysql.connector
+    from mysql.connector import Error
+
+    try:
+        conn = mysql.connector.connect(
+            host=config.DB_HOST,
+            port=config.DB_PORT,
+            user=config.DB_USER,
+            password=config.DB_PASSWORD,
+            database=config.DB_NAME
+        )
+
+        if conn.is_connected():
+            return conn
+        else:
+            raise ConnectionError("❌ Failed to connect to MySQL database.")
+
+    except Error as e:
+        print("❌ MySQL connection error:", e)
+        raise e
+
+
+def _mysql_ping(conn) -> None:
+    conn.ping(reconnect=False, attempts=1, delay=0)
+
+
+# --- Pool ---
+class PooledConnection:
+    """A checked-out connection; close() returns it to its pool."""
+
+    def __init__(self, pool: "ConnectionPool", raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool with a fixed core size plus temporary overflow.
+
+    On checkout, connections older than `recycle` seconds are replaced,
+    and with `pre_ping` each connection is health-checked first. Broken
+    ones are replaced transparently.
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        ping: Callable,
+        size: int = 5,
+        max_overflow: int = 10,
+        recycle: float = 1800,
+        pre_ping: bool = True,
+        timeout: float = 10,
+    ):
+        self._connect = connect
+        self._ping = ping
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self.created = 0
+        self.recycled = 0
+        self.failed_pings = 0
+        self.checkouts = 0
+
+    def _new(self):
+        raw = self._connect()
+        with self._lock:
+            self.created += 1
+        return raw, time.monotonic()
+
+    @staticmethod
+    def _discard(raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._open < self.size + self.max_overflow:
+                self._open += 1
+                return True
+        return False
+
+    def _unreserve(self) -> None:
+        with self._lock:
+            self._open -= 1
+
+    def get(self) -> PooledConnection:
+        try:
+            raw, created_at = self._idle.get_nowait()
+        except queue.Empty:
+            if self._reserve():
+                try:
+                    raw, created_at = self._new()
+                except Exception:
+                    self._unreserve()
+                    raise
+                return self._checkout(raw, created_at)
+            try:
+                raw, created_at = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise ConnectionError(
+                    f"❌ Database pool exhausted ({self.size} + {self.max_overflow} connections in use)."
+                )
+
+        # Replace connections that are too old or no longer alive
+        if self.recycle > 0 and time.monotonic() - created_at > self.recycle:
+            self._discard(raw)
+            with self._lock:
+                self.recycled += 1
+            raw = None
+        elif self.pre_ping:
+            try:
+                self._ping(raw)
+            except Exception:
+                self._discard(raw)
+                with self._lock:
+                    self.failed_pings += 1
+                raw = None
+
+        if raw is None:
+            try:
+                raw, created_at = self._new()
+            except Exception:
+                self._unreserve()
+                raise
+        return self._checkout(raw, created_at)
+
+    def _checkout(self, raw, created_at: float) -> PooledConnection:
+        with self._lock:
+            self.checkouts += 1
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at: float) -> None:
+        try:
+            # Never hand an open transaction to the next caller
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            self._unreserve()
+            return
+
+        with self._lock:
+            keep = self._idle.qsize() < self.size
+        if keep:
+            self._idle.put((raw, created_at))
+        else:
+            self._discard(raw)
+            self._unreserve()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": config.DB_BACKEND,
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "created": self.created,
+                "recycled": self.recycled,
+                "failed_pings": self.failed_pings,
+                "checkouts": self.checkouts,
+            }
+
+
+def _build_pool() -> ConnectionPool:
+    if config.DB_BACKEND == "sqlite":
+        connect, ping = _sqlite_connect, lambda conn: conn.ping()
+    elif config.DB_BACKEND == "mysql":
+        connect, ping = _mysql_connect, _mysql_ping
+    else:
+        raise ValueError(f"Invalid DB_BACKEND '{config.DB_BACKEND}'. Must be mysql or sqlite.")
+
+    return ConnectionPool(
+        connect,
+        ping,
+        size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_POOL_MAX_OVERFLOW,
+        recycle=config.DB_POOL_RECYCLE,
+        pre_ping=config.DB_POOL_PRE_PING,
+        timeout=config.DB_POOL_TIMEOUT,
+    )
+
+
+pool = _build_pool()
+
+
+def get_db_connection():
+    """
+    Check a connection out of the pool.
+    Call .close() (or use `with`) to return it.
+    """
+    return pool.get()
+
+
+# MySQL ER_DUP_ENTRY
+MYSQL_DUPLICATE_KEY = 1062
+
+
+def is_duplicate_key(error: Exception) -> bool:
+    """True if error is a unique-key violation on either backend."""
+    if isinstance(error, sqlite3.IntegrityError):
+        return "UNIQUE" in str(error)
+    return getattr(error, "errno", None) == MYSQL_DUPLICATE_KEY
@@ -1,52 +1,236 @@
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional
-from app.services.ai_model import generate_plan
-
-# ✅ Better: add prefix and tags for organization
-router = APIRouter(
-    prefix="/ai",
-    tags=["AI Plan Generator"]
-)
-
-@router.get("/generate")
-def generate_plan_endpoint(
-    age: int = Query(..., description="User age in years", ge=10, le=100),
-    height_cm: float = Query(..., description="Height in cm", gt=50, lt=250),
-    weight_kg: float = Query(..., description="Weight in kg", gt=20, lt=300),
-    gender: str = Query(..., description="Gender: male/female/other"),
-    activity_level: str = Query(..., description="Activity level: sedentary/light/moderate/active/very_active"),
-    goal: str = Query(..., description="Goal: lose/maintain/gain"),
-    user_id: Optional[int] = Query(None, description="Optional user ID for DB logging")
-):
-    """
-    ✅ Generates a personalized diet + workout plan based on user details.
-    - Validates all inputs
-    - Calls LLaMA model through generate_plan()
-    - Returns JSON with macros, meals, and workout plan
-    """
-
-    # --- Input validation ---
-    gender = gender.lower()
-    if gender not in ["male", "female", "other"]:
-        raise HTTPException(status_code=400, detail="Invalid gender. Must be: male, female, or other.")
-    
-    activity_level = activity_level.lower()
-    if activity_level not in ["sedentary", "light", "moderate", "active", "very_active"]:
-        raise HTTPException(status_code=400, detail="Invalid activity level. Must be: sedentary, light, moderate, active, or very_active.")
-    
-    goal = goal.lower()
-    if goal not in ["lose", "maintain", "gain"]:
-        raise HTTPException(status_code=400, detail="Invalid goal. Must be: lose, maintain, or gain.")
-
-    # --- Call the model safely ---
-    try:
-        plan_result = generate_plan(age, height_cm, weight_kg, gender, activity_level, goal, user_id)
-    except Exception as e:
-        # Catch any runtime/model errors so the frontend doesn't crash
-        raise HTTPException(status_code=500, detail=f"AI plan generation failed: {str(e)}")
-
-    return {
-        "status": "success",
-        "message": "AI-generated plan created successfully",
-        "data": plan_result
-    }
+import json
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+from app import config
+from app.services.ai_model import (
+    deadline_stats, decoding_stats, generate_plan, generate_plan_stream, generate_plan_within, inference_pool,
+    plan_flights, plan_upgrades
+)
+from app.services.inference_worker import QueueFullError
+from app.services.jobs import job_store
+from app.services.plan_cache import plan_cache
+from app.services.plan_library import plan_library
+from app.services.plan_neighbors import plan_neighbors
+from app.services.request_log import request_log
+
+# ✅ Better: add prefix and tags for organization
+router = APIRouter(
+    prefix="/ai",
+    tags=["AI Plan Generator"]
+)
+
+
+class PlanJobRequest(BaseModel):
+    age: int = Field(..., ge=10, le=100, description="User age in years")
+    height_cm: float = Field(..., gt=50, lt=250, description="Height in cm")
+    weight_kg: float = Field(..., gt=20, lt=300, description="Weight in kg")
+    gender: str = Field(..., description="Gender: male/female/other")
+    activity_level: str = Field(..., description="Activity level: sedentary/light/moderate/active/very_active")
+    goal: str = Field(..., description="Goal: lose/maintain/gain")
+    user_id: Optional[int] = Field(None, description="Optional user ID for DB logging")
+    fresh: bool = Field(False, description="Skip the precomputed library / cache and ask the model")
+
+
+def _validate_profile(gender: str, activity_level: str, goal: str):
+    """Normalize and validate the categorical profile fields."""
+    gender = gender.lower()
+    if gender not in ["male", "female", "other"]:
+        raise HTTPException(status_code=400, detail="Invalid gender. Must be: male, female, or other.")
+
+    activity_level = activity_level.lower()
+    if activity_level not in ["sedentary", "light", "moderate", "active", "very_active"]:
+        raise HTTPException(status_code=400, detail="Invalid activity level. Must be: sedentary, light, moderate, active, or very_active.")
+
+    goal = goal.lower()
+    if goal not in ["lose", "maintain", "gain"]:
+        raise HTTPException(status_code=400, detail="Invalid goal. Must be: lose, maintain, or gain.")
+
+    return gender, activity_level, goal
+
+
+def _overloaded(status_code: int, error: QueueFullError):
+    """Backpressure response telling the client when to come back."""
+    return HTTPException(
+        status_code=status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+@router.get("/generate")
+def generate_plan_endpoint(
+    age: int = Query(..., description="User age in years", ge=10, le=100),
+    height_cm: float = Query(..., description="Height in cm", gt=50, lt=250),
+    weight_kg: float = Query(..., description="Weight in kg", gt=20, lt=300),
+    gender: str = Query(..., description="Gender: male/female/other"),
+    activity_level: str = Query(..., description="Activity level: sedentary/light/moderate/active/very_active"),
+    goal: str = Query(..., description="Goal: lose/maintain/gain"),
+    user_id: Optional[int] = Query(None, description="Optional user ID for DB logging"),
+    fresh: bool = Query(False, description="Skip the precomputed library / cache and ask the model"),
+    budget_ms: Optional[int] = Query(None, ge=0, description="Latency budget in ms (default PLAN_DEADLINE_SECONDS, 0 = wait for the model)")
+):
+    """
+    ✅ Generates a personalized diet + workout plan based on user details.
+    - Validates all inputs
+    - Serves precomputed plans when the profile is on the library grid
+      (fresh=true asks the model anyway)
+    - Calls LLaMA model through generate_plan()
+    - Returns JSON with macros, meals, workout plan and `source`
+    - With a latency budget, answers with the deterministic plan
+      (source "fallback") once it runs out; the model's plan follows at
+      GET /ai/plans/{plan_id}
+    - Answers 503 + Retry-After when the inference queue is full
+    """
+
+    # --- Input validation ---
+    gender, activity_level, goal = _validate_profile(gender, activity_level, goal)
+    deadline = budget_ms / 1000 if budget_ms is not None else config.PLAN_DEADLINE_SECONDS
+
+    # --- Call the model safely ---
+    try:
+        if deadline > 0:
+            plan_result = generate_plan_within(deadline, age, height_cm, weight_kg, gender, activity_level, goal, user_id, fresh)
+        else:
+            plan_result = generate_plan(age, height_cm, weight_kg, gender, activity_level, goal, user_id, fresh)
+    except QueueFullError as e:
+        raise _overloaded(503, e)
+    except Exception as e:
+        # Catch any runtime/model errors so the frontend doesn't crash
+        raise HTTPException(status_code=500, detail=f"AI plan generation failed: {str(e)}")
+
+    if plan_result.get("plan_id"):
+        message = f"Model still working: default plan returned, AI plan will be at /ai/plans/{plan_result['plan_id']}"
+    elif plan_result.get("source") == "fallback":
+        message = "AI model unavailable: default plan returned"
+    else:
+        message = "AI-generated plan created successfully"
+    return {
+        "status": "success",
+        "message": message,
+        "data": plan_result
+    }
+
+
+@router.get("/generate/stream")
+def generate_plan_stream_endpoint(
+    age: int = Query(..., description="User age in years", ge=10, le=100),
+    height_cm: float = Query(..., description="Height in cm", gt=50, lt=250),
+    weight_kg: float = Query(..., description="Weight in kg", gt=20, lt=300),
+    gender: str = Query(..., description="Gender: male/female/other"),
+    activity_level: str = Query(..., description="Activity level: sedentary/light/moderate/active/very_active"),
+    goal: str = Query(..., description="Goal: lose/maintain/gain"),
+    user_id: Optional[int] = Query(None, description="Optional user ID for DB logging"),
+    fresh: bool = Query(False, description="Skip the precomputed library / cache and ask the model"),
+    format: str = Query("ndjson", description="Stream format: ndjson or sse")
+):
+    """
+    ⚡ Streaming version of /ai/generate.
+    - Sends macros immediately, then each meal/workout day as soon as the
+      model finishes writing it, then a final "done" event with the full plan
+    - NDJSON: one {"event": ..., "data": ...} object per line
+    - SSE: standard `event:` / `data:` frames for EventSource clients
+    """
+    gender, activity_level, goal = _validate_profile(gender, activity_level, goal)
+
+    format = format.lower()
+    if format not in ["ndjson", "sse"]:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be: ndjson or sse.")
+
+    try:
+        events = generate_plan_stream(age, height_cm, weight_kg, gender, activity_level, goal, user_id, fresh)
+    except QueueFullError as e:
+        raise _overloaded(503, e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI plan generation failed: {str(e)}")
+
+    if format == "sse":
+        body = (f"event: {item['event']}\ndata: {json.dumps(item['data'])}\n\n" for item in events)
+        media_type = "text/event-stream"
+    else:
+        body = (json.dumps(item) + "\n" for item in events)
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/jobs", status_code=202)
+def create_plan_job(data: PlanJobRequest):
+    """
+    🕒 Start plan generation in the background and return a job id.
+    Poll GET /ai/jobs/{job_id} for the result.
+    """
+    gender, activity_level, goal = _validate_profile(data.gender, data.activity_level, data.goal)
+
+    try:
+        job = job_store.submit(
+            generate_plan,
+            data.age, data.height_cm, data.weight_kg, gender, activity_level, goal, data.user_id, data.fresh,
+            retry_after=inference_pool.retry_after()
+        )
+    except QueueFullError as e:
+        raise _overloaded(429, e)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "accepted",
+            "message": "Plan generation started",
+            "data": {"job_id": job["job_id"], "state": job["state"]}
+        },
+        headers={"Location": f"/ai/jobs/{job['job_id']}"}
+    )
+
+
+@router.get("/jobs/{job_id}")
+def get_plan_job(job_id: str):
+    """
+    🔍 Poll a background plan job. `state` is queued, running, done or failed.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    return {
+        "status": "success",
+        "data": job
+    }
+
+
+@router.get("/plans/{plan_id}")
+def get_upgraded_plan(plan_id: str):
+    """
+    🔁 Poll the model plan behind a budgeted /ai/generate fallback.
+    `state` is queued, running, done (plan in `result`) or failed.
+    """
+    job = plan_upgrades.get(plan_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Plan not found or expired")
+
+    return {
+        "status": "success",
+        "data": job
+    }
+
+
+@router.get("/stats")
+def ai_stats():
+    """
+    📈 Runtime counters for the AI pipeline (plan library, plan cache, neighbour index, decoding, worker queue, coalescing, jobs, latency budget, DB log).
+    """
+    return {
+        "cache": plan_cache.stats(),
+        "library": plan_library.stats(),
+        "neighbors": plan_neighbors.stats(),
+        "decoding": decoding_stats(),
+        "worker": inference_pool.stats(),
+        "coalescing": plan_flights.stats(),
+        "jobs": job_store.stats(),
+        "deadline": deadline_stats(),
+        "request_log": request_log.stats()
+    }
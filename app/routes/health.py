@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app import config
+from app.services.ai_model import inference_pool
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get("/live")
+def liveness():
+    """
+    💓 The process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+def readiness():
+    """
+    🚦 Ready to take traffic?
+    - lazy loading: ready unless the model failed to load and is still
+      cooling down before the next attempt (it is loaded by the first
+      AI request)
+    - startup/eager loading: ready once the model is loaded; a failed
+      load is retried in the background once its cooldown is over
+    Answers 503 when not ready, so load balancers hold traffic back.
+    """
+    model = inference_pool.model_status()
+    if config.LLM_LOAD_MODE == "lazy":
+        ready = inference_pool.available()
+    else:
+        inference_pool.retry_failed()
+        ready = model["state"] == "ready"
+
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "model": model}
+    )
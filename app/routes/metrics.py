@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.services import metrics
+from app.services.ai_model import inference_pool
+from app.services.jobs import job_store
+from app.services.plan_cache import plan_cache
+from app.services.request_log import request_log
+
+router = APIRouter(tags=["Metrics"])
+
+# Gauges read from the services' own counters at scrape time
+metrics.gauge("gym_ai_inference_queue_depth", "Completions waiting for a model instance",
+              lambda: inference_pool.queue_depth)
+metrics.gauge("gym_ai_inference_busy_instances", "Model instances currently generating",
+              lambda: sum(worker.pending - worker.queue_depth for worker in inference_pool.workers))
+metrics.gauge("gym_ai_inference_instances", "Model instances in the pool",
+              lambda: len(inference_pool.workers))
+metrics.gauge("gym_ai_jobs_pending", "Background plan jobs queued or running",
+              lambda: job_store.stats()["pending"])
+metrics.gauge("gym_ai_plan_cache_entries", "Plans held in the in-process cache",
+              lambda: plan_cache.stats()["size"])
+metrics.gauge("gym_ai_request_log_pending", "model_requests rows waiting to be written",
+              lambda: request_log.stats()["pending"])
+metrics.gauge("gym_ai_request_log_dropped", "model_requests rows dropped since startup",
+              lambda: request_log.stats()["dropped"])
+
+
+@router.get("/metrics")
+def prometheus_metrics():
+    """
+    📊 Prometheus scrape endpoint (text exposition format): per-stage
+    timings, token counts, decoding events and queue depths.
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,94 +1,222 @@
-from fastapi import APIRouter
-from pydantic import BaseModel, Field
-from app.services.nutrition import calculate_macros
-
-router = APIRouter(prefix="/plans", tags=["Plans"])
-
-
-class PlanRequest(BaseModel):
-    age: int = Field(..., gt=0)
-    height_cm: float = Field(..., gt=0)
-    weight_kg: float = Field(..., gt=0)
-    gender: str
-    activity_level: str
-    goal: str
-
-
-class PlanResponse(BaseModel):
-    bmr: float
-    tdee: float
-    calories: float
-    protein_g: float
-    fat_g: float
-    carbs_g: float
-    meal_plan: list[str]
-    workout_plan: list[str]
-
-
-@router.post("/calculate", response_model=PlanResponse)
-def calculate_plan(data: PlanRequest):
-    macros = calculate_macros(
-        age=data.age,
-        height_cm=data.height_cm,
-        weight_kg=data.weight_kg,
-        gender=data.gender,
-        activity_level=data.activity_level,
-        goal=data.goal
-    )
-
-    # 🧮 Split daily macros into meals
-    breakfast_cal = macros["calories"] * 0.25
-    lunch_cal = macros["calories"] * 0.35
-    dinner_cal = macros["calories"] * 0.30
-    snack_cal = macros["calories"] * 0.10
-
-    # 🍳 Estimate food portions using calorie density
-    # (approx values: chicken ~ 165 kcal per 100g, oats ~ 380 kcal per 100g, etc.)
-    breakfast_oats_g = round((breakfast_cal * 0.4) / 3.8)  # ~40% oats
-    breakfast_eggs_g = round((breakfast_cal * 0.3) / 1.55) # ~30% eggs
-    breakfast_fruit_g = round((breakfast_cal * 0.3) / 0.52) # ~30% fruits
-
-    lunch_chicken_g = round((lunch_cal * 0.5) / 1.65)
-    lunch_rice_g = round((lunch_cal * 0.35) / 3.6)
-    lunch_veggies_g = round((lunch_cal * 0.15) / 0.5)
-
-    dinner_fish_g = round((dinner_cal * 0.5) / 2.0)
-    dinner_pasta_g = round((dinner_cal * 0.35) / 3.5)
-    dinner_salad_g = round((dinner_cal * 0.15) / 0.4)
-
-    snack_nuts_g = round((snack_cal * 0.6) / 6.0)
-    snack_fruit_g = round((snack_cal * 0.4) / 0.52)
-
-    # 🍱 Build personalized meal plan
-    meal_plan = [
-        f"🍳 Breakfast: {breakfast_oats_g}g oats + {breakfast_eggs_g}g eggs + {breakfast_fruit_g}g fruits",
-        f"🥗 Lunch: {lunch_chicken_g}g grilled chicken + {lunch_rice_g}g brown rice + {lunch_veggies_g}g veggies",
-        f"🍝 Dinner: {dinner_fish_g}g baked fish + {dinner_pasta_g}g whole grain pasta + {dinner_salad_g}g salad",
-        f"🍏 Snack: {snack_nuts_g}g mixed nuts + {snack_fruit_g}g fruit"
-    ]
-
-    # 🏋️‍♂️ Workout plan (still goal-based, but can be dynamic too)
-    if data.goal.lower() == "lose":
-        workout_plan = [
-            "🏃‍♂️ 40 mins cardio + 15 mins HIIT",
-            "💪 Full-body resistance training (3x sets)",
-            "🧘‍♂️ Mobility + core strengthening"
-        ]
-    elif data.goal.lower() == "gain":
-        workout_plan = [
-            "🏋️‍♂️ Heavy push day (Bench, OHP, Dips)",
-            "🦵 Leg hypertrophy (Squats, Deadlifts)",
-            "💪 Pull workout (Rows, Pullups, Curls)"
-        ]
-    else:
-        workout_plan = [
-            "🏋️‍♂️ Full-body strength (3x per week)",
-            "🚶‍♂️ Cardio 30 mins",
-            "🧘‍♂️ Core + stretching"
-        ]
-
-    return {
-        **macros,
-        "meal_plan": meal_plan,
-        "workout_plan": workout_plan
-    }
+import csv
+import io
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
+from app import config
+from app.services.batch_plans import MACRO_COLUMNS, calculate_batch
+from app.services.nutrition import ACTIVITY_MULTIPLIERS, GENDERS, GOALS, calculate_macros
+from app.services.portions import DEFAULT_MENU, MENUS, format_meal_plan, get_menu, portion_grams
+
+router = APIRouter(prefix="/plans", tags=["Plans"])
+
+
+class PlanRequest(BaseModel):
+    age: int = Field(..., gt=0)
+    height_cm: float = Field(..., gt=0)
+    weight_kg: float = Field(..., gt=0)
+    gender: str
+    activity_level: str
+    goal: str
+    menu: str = DEFAULT_MENU
+
+
+class PlanResponse(BaseModel):
+    bmr: float
+    tdee: float
+    calories: float
+    protein_g: float
+    fat_g: float
+    carbs_g: float
+    meal_plan: list[str]
+    workout_plan: list[str]
+
+
+WORKOUT_PLANS = {
+    "lose": [
+        "🏃‍♂️ 40 mins cardio + 15 mins HIIT",
+        "💪 Full-body resistance training (3x sets)",
+        "🧘‍♂️ Mobility + core strengthening"
+    ],
+    "gain": [
+        "🏋️‍♂️ Heavy push day (Bench, OHP, Dips)",
+        "🦵 Leg hypertrophy (Squats, Deadlifts)",
+        "💪 Pull workout (Rows, Pullups, Curls)"
+    ],
+    "maintain": [
+        "🏋️‍♂️ Full-body strength (3x per week)",
+        "🚶‍♂️ Cardio 30 mins",
+        "🧘‍♂️ Core + stretching"
+    ],
+}
+
+
+def workout_plan_for(goal: str) -> list[str]:
+    return list(WORKOUT_PLANS.get(goal.lower(), WORKOUT_PLANS["maintain"]))
+
+
+@router.post("/calculate", response_model=PlanResponse)
+def calculate_plan(data: PlanRequest):
+    macros = calculate_macros(
+        age=data.age,
+        height_cm=data.height_cm,
+        weight_kg=data.weight_kg,
+        gender=data.gender,
+        activity_level=data.activity_level,
+        goal=data.goal
+    )
+
+    # 🍱 Build personalized meal plan (portions solved to hit the calorie + macro targets)
+    menu = data.menu.lower()
+    if menu not in MENUS:
+        raise HTTPException(status_code=400, detail=f"Invalid menu. Must be: {', '.join(MENUS)}.")
+    meal_plan = format_meal_plan(portion_grams(macros, menu), menu)
+
+    # 🏋️‍♂️ Workout plan (still goal-based, but can be dynamic too)
+    workout_plan = workout_plan_for(data.goal)
+
+    return {
+        **macros,
+        "meal_plan": meal_plan,
+        "workout_plan": workout_plan
+    }
+
+
+# --- Batch calculation ---
+def _read_rows(body: bytes, content_type: str) -> list:
+    """
+    Decode a JSON array, NDJSON or CSV upload into raw row dicts. An
+    NDJSON line that doesn't parse becomes the exception itself, reported
+    as an invalid row instead of failing the batch.
+    """
+    text = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        return list(csv.DictReader(io.StringIO(text)))
+    if "ndjson" in content_type or "jsonl" in content_type:
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                rows.append(ValueError(f"Invalid JSON: {e.msg}"))
+        return rows
+
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of profiles")
+    return rows
+
+
+def _validate_row(row) -> dict:
+    """PlanRequest validation + the categorical checks calculate_macros does."""
+    if isinstance(row, Exception):
+        raise ValueError(str(row))
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    menu = row.get("menu")
+    if menu is None or (isinstance(menu, str) and not menu.strip()):
+        # A blank CSV cell (or null) means "not given": use the default menu
+        row = {key: value for key, value in row.items() if key != "menu"}
+    data = PlanRequest(**row)
+    profile = {
+        "age": data.age,
+        "height_cm": data.height_cm,
+        "weight_kg": data.weight_kg,
+        "gender": data.gender.lower(),
+        "activity_level": data.activity_level.lower(),
+        "goal": data.goal.lower(),
+        "menu": data.menu.lower(),
+    }
+    if profile["gender"] not in GENDERS:
+        raise ValueError("Invalid gender. Must be 'male', 'female', or 'other'.")
+    if profile["activity_level"] not in ACTIVITY_MULTIPLIERS:
+        raise ValueError("Invalid activity_level. Must be sedentary, light, moderate, active, or very_active.")
+    if profile["goal"] not in GOALS:
+        raise ValueError("Invalid goal. Must be lose, maintain, or gain.")
+    get_menu(profile["menu"])
+    return profile
+
+
+def _calculate_batch_rows(rows: list):
+    """Validate every row, then compute all valid ones in one vectorized pass."""
+    profiles, row_numbers, errors = [], [], []
+    for i, row in enumerate(rows):
+        try:
+            profiles.append(_validate_row(row))
+            row_numbers.append(i)
+        except ValidationError as e:
+            errors.append({"row": i, "detail": [err["msg"] for err in e.errors()]})
+        except (ValueError, TypeError) as e:
+            errors.append({"row": i, "detail": [str(e)]})
+
+    columns = calculate_batch(profiles) if profiles else {}
+    return profiles, row_numbers, columns, errors
+
+
+@router.post("/calculate/batch")
+async def calculate_plan_batch(
+    request: Request,
+    format: str = Query("columnar", description="Output format: columnar or ndjson")
+):
+    """
+    🧮 Calculate macros + meal portions for many profiles at once.
+    - Body: JSON array, NDJSON (application/x-ndjson) or CSV (text/csv)
+      with the same fields as /plans/calculate (menu is optional per row)
+    - Invalid rows are reported with their row number; they don't abort
+      the batch
+    - columnar: one array per field; ndjson: one result line per row
+    """
+    format = format.lower()
+    if format not in ["columnar", "ndjson"]:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be: columnar or ndjson.")
+
+    try:
+        rows = _read_rows(await request.body(), request.headers.get("content-type", "application/json"))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse batch body: {e}")
+
+    if len(rows) > config.PLAN_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {config.PLAN_BATCH_MAX_ROWS} rows)")
+
+    profiles, row_numbers, columns, errors = await run_in_threadpool(_calculate_batch_rows, rows)
+    workout_plans = {goal: workout_plan_for(goal) for goal in GOALS}
+    lists = {name: values.tolist() for name, values in columns.items()}
+    menu_columns = {p["menu"]: get_menu(p["menu"]).columns for p in profiles}
+
+    if format == "ndjson":
+
+        def lines():
+            errors_by_row = {err["row"]: err for err in errors}
+            valid = iter(range(len(profiles)))
+            for i in range(len(rows)):
+                if i in errors_by_row:
+                    yield json.dumps({"row": i, "status": "invalid", "errors": errors_by_row[i]["detail"]}) + "\n"
+                    continue
+                j = next(valid)
+                result = {"row": i, "status": "ok"}
+                result.update({name: lists[name][j] for name in MACRO_COLUMNS})
+                result["menu"] = profiles[j]["menu"]
+                result["portions_g"] = {name: lists[name][j] for name in menu_columns[profiles[j]["menu"]]}
+                result["workout_plan"] = workout_plans[profiles[j]["goal"]]
+                yield json.dumps(result) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    # JSONResponse directly: skips jsonable_encoder walking every value
+    return JSONResponse({
+        "count": len(rows),
+        "valid": len(profiles),
+        "invalid": len(errors),
+        "columns": {
+            "row": row_numbers,
+            "goal": [p["goal"] for p in profiles],
+            "menu": [p["menu"] for p in profiles],
+            **lists,
+        },
+        "workout_plans": workout_plans,
+        "errors": errors,
+    })
@@ -1,92 +1,397 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, EmailStr, Field
-from typing import List
-from app.db import get_db_connection
-
-router = APIRouter(prefix="/users", tags=["Users"])
-
-
-# --- Pydantic Models ---
-class UserCreate(BaseModel):
-    email: EmailStr = Field(..., description="User email address")
-    age: int = Field(..., gt=0, description="Age of the user")
-    height_cm: float = Field(..., gt=0, description="Height in centimeters")
-    weight_kg: float = Field(..., gt=0, description="Weight in kilograms")
-    gender: str = Field(..., description="Gender: male or female")
-    activity_level: str = Field(..., description="Activity level: sedentary, light, moderate, active, very_active")
-    goal: str = Field(..., description="Goal: lose, gain, or maintain")
-
-
-class UserResponse(BaseModel):
-    id: int
-    email: EmailStr
-    age: int
-    height_cm: float
-    weight_kg: float
-    gender: str
-    activity_level: str
-    goal: str
-
-
-# --- Routes ---
-
-@router.post("/", response_model=UserResponse)
-def create_user(user: UserCreate):
-    """
-    👤 Create a new user in the database.
-    """
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    # Check if email already exists
-    cursor.execute("SELECT id FROM users WHERE email = %s", (user.email,))
-    existing = cursor.fetchone()
-    if existing:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    # Insert new user
-    cursor.execute(
-        """
-        INSERT INTO users (email, age, height_cm, weight_kg, gender, activity_level, goal)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """,
-        (
-            user.email,
-            user.age,
-            user.height_cm,
-            user.weight_kg,
-            user.gender,
-            user.activity_level,
-            user.goal,
-        ),
-    )
-    conn.commit()
-    new_id = cursor.lastrowid
-
-    # Retrieve the created user
-    cursor.execute(
-        "SELECT id, email, age, height_cm, weight_kg, gender, activity_level, goal FROM users WHERE id = %s",
-        (new_id,),
-    )
-    row = cursor.fetchone()
-    conn.close()
-
-    if not row:
-        raise HTTPException(status_code=500, detail="Failed to create user")
-
-    return row
-
-
-@router.get("/", response_model=List[UserResponse])
-def list_users():
-    """
-    📋 Get a list of all users in the database.
-    """
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, email, age, height_cm, weight_kg, gender, activity_level, goal FROM users")
-    users = cursor.fetchall()
-    conn.close()
-
-    return users
+import base64
+import binascii
+import codecs
+import csv
+import json
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, List, Optional, Tuple
+from app import config
+from app.db import get_db_connection, is_duplicate_key
+from app.services.plan_history import latest_plan, list_plans
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+
+# --- Pydantic Models ---
+class UserCreate(BaseModel):
+    email: EmailStr = Field(..., description="User email address")
+    age: int = Field(..., gt=0, description="Age of the user")
+    height_cm: float = Field(..., gt=0, description="Height in centimeters")
+    weight_kg: float = Field(..., gt=0, description="Weight in kilograms")
+    gender: str = Field(..., description="Gender: male or female")
+    activity_level: str = Field(..., description="Activity level: sedentary, light, moderate, active, very_active")
+    goal: str = Field(..., description="Goal: lose, gain, or maintain")
+
+
+class UserResponse(BaseModel):
+    id: int
+    email: EmailStr
+    age: int
+    height_cm: float
+    weight_kg: float
+    gender: str
+    activity_level: str
+    goal: str
+
+
+USER_COLUMNS = "id, email, age, height_cm, weight_kg, gender, activity_level, goal"
+INSERT_COLUMNS = "email, age, height_cm, weight_kg, gender, activity_level, goal"
+INSERT_USER = f"INSERT INTO users ({INSERT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+# Rows whose email already exists are skipped instead of failing the batch
+INSERT_USER_IGNORE = INSERT_USER.replace("INSERT INTO", "INSERT IGNORE INTO", 1)
+
+
+def _user_values(user: UserCreate) -> tuple:
+    return (user.email, user.age, user.height_cm, user.weight_kg, user.gender, user.activity_level, user.goal)
+
+
+# --- Keyset pagination helpers ---
+def _encode_token(kind: str, value: str) -> str:
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip("=")
+
+
+def _decode_token(token: str, expected_kind: str) -> str:
+    padded = token + "=" * (-len(token) % 4)
+    kind, value = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+    if kind != expected_kind:
+        raise ValueError(kind)
+    return value
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque page token for rows after last_id."""
+    return _encode_token("id", str(last_id))
+
+
+def decode_cursor(token: str) -> int:
+    try:
+        return int(_decode_token(token, "id"))
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+
+
+def encode_plan_cursor(created_at: str, plan_id: int) -> str:
+    """Opaque page token for plans older than (created_at, plan_id)."""
+    return _encode_token("plan", f"{created_at}|{plan_id}")
+
+
+def decode_plan_cursor(token: str) -> Tuple[str, int]:
+    try:
+        created_at, plan_id = _decode_token(token, "plan").rsplit("|", 1)
+        return created_at, int(plan_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+
+
+def _user_filters(goal: Optional[str], activity_level: Optional[str]):
+    """WHERE clauses + params for the optional filters (index-backed)."""
+    clauses, params = [], []
+    if goal:
+        clauses.append("goal = %s")
+        params.append(goal.lower())
+    if activity_level:
+        clauses.append("activity_level = %s")
+        params.append(activity_level.lower())
+    return clauses, params
+
+
+# --- Routes ---
+
+@router.post("/", response_model=UserResponse)
+def create_user(user: UserCreate):
+    """
+    👤 Create a new user in the database.
+    """
+    # Pooled connection: leaving the block returns it, even on errors
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        # One INSERT: the unique email index rejects duplicates, so there
+        # is no SELECT before it, and the new row is known without a read-back
+        try:
+            cursor.execute(INSERT_USER, _user_values(user))
+        except Exception as e:
+            if is_duplicate_key(e):
+                raise HTTPException(status_code=400, detail="Email already registered")
+            raise
+        conn.commit()
+        new_id = cursor.lastrowid
+
+    if not new_id:
+        raise HTTPException(status_code=500, detail="Failed to create user")
+
+    return {"id": new_id, **user.model_dump()}
+
+
+# --- Bulk import ---
+async def _body_lines(request: Request) -> AsyncIterator[str]:
+    """Lines of the request body as they arrive (the body is never held whole)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _upload_rows(request: Request, content_type: str) -> AsyncIterator:
+    """
+    Raw rows of a bulk upload: a dict per row, or the exception that
+    prevented parsing it (reported as an invalid row).
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        async for line in _body_lines(request):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"Invalid JSON: {e.msg}")
+    elif "csv" in content_type:
+        header = None
+        async for line in _body_lines(request):
+            if not line.strip():
+                continue
+            try:
+                values = next(csv.reader([line]))
+            except csv.Error as e:
+                yield e
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                yield ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            else:
+                yield dict(zip(header, values))
+    else:
+        rows = json.loads((await request.body()).decode("utf-8-sig"))
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of users")
+        for row in rows:
+            yield row
+
+
+def _validate_user(row) -> UserCreate:
+    if isinstance(row, Exception):
+        raise ValueError(str(row))
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    return UserCreate(**row)
+
+
+def _user_ids(cursor, emails: List[str]) -> dict:
+    """lower-cased email -> id for the given emails that exist."""
+    if not emails:
+        return {}
+    placeholders = ", ".join(["%s"] * len(emails))
+    cursor.execute(f"SELECT id, email FROM users WHERE email IN ({placeholders})", tuple(emails))
+    return {row["email"].lower(): row["id"] for row in cursor.fetchall()}
+
+
+def _insert_users(users: List[Tuple[int, UserCreate]]) -> List[dict]:
+    """
+    Insert one chunk in a single transaction and report every row as
+    created or duplicate, in three statements: the chunk's emails that
+    already exist, one multi-row INSERT IGNORE for the others, and the ids
+    afterwards. If the insert's rowcount shows a concurrent import took
+    some of those emails in between, the chunk is rolled back and redone
+    one row at a time, where each row's own rowcount decides.
+    """
+    # A repeated email within the upload is a duplicate of its first row
+    first = {}
+    for _, user in users:
+        first.setdefault(user.email.lower(), user)
+    emails = [user.email for user in first.values()]
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        existing = _user_ids(cursor, emails)
+        new = [user for key, user in first.items() if key not in existing]
+        created = set()
+        if new:
+            cursor.executemany(INSERT_USER_IGNORE, [_user_values(user) for user in new])
+            if cursor.rowcount == len(new):
+                created = {user.email.lower() for user in new}
+            else:
+                conn.rollback()
+                for user in new:
+                    cursor.execute(INSERT_USER_IGNORE, _user_values(user))
+                    if cursor.rowcount == 1:
+                        created.add(user.email.lower())
+        ids = _user_ids(cursor, emails)
+        conn.commit()
+
+    results = []
+    for row_number, user in users:
+        key = user.email.lower()
+        results.append({
+            "row": row_number,
+            "status": "created" if key in created and first[key] is user else "duplicate",
+            "email": user.email,
+            "id": ids.get(key),
+        })
+    return results
+
+
+@router.post("/bulk")
+async def bulk_create_users(request: Request):
+    """
+    📥 Create many users from one upload.
+    - Body: JSON array, NDJSON (application/x-ndjson) or CSV (text/csv)
+      with the same fields as POST /users; NDJSON and CSV are processed
+      while they stream in
+    - Valid rows are inserted in chunks of USER_BULK_CHUNK_SIZE, one
+      transaction each; existing emails are skipped, not errors
+    - Returns one result per row (numbered from 0): created (with id),
+      duplicate (with the existing id) or invalid (with errors). Rows
+      past USER_BULK_MAX_ROWS are not read ("truncated": true)
+    """
+    content_type = request.headers.get("content-type", "application/json")
+    if not any(kind in content_type for kind in ("json", "csv")):
+        raise HTTPException(status_code=415, detail="Body must be a JSON array, NDJSON or CSV")
+
+    results, chunk = [], []
+    count = 0
+    truncated = False
+    try:
+        async for row in _upload_rows(request, content_type):
+            if count >= config.USER_BULK_MAX_ROWS:
+                truncated = True
+                break
+            try:
+                chunk.append((count, _validate_user(row)))
+            except ValidationError as e:
+                results.append({"row": count, "status": "invalid", "errors": [err["msg"] for err in e.errors()]})
+            except (ValueError, TypeError) as e:
+                results.append({"row": count, "status": "invalid", "errors": [str(e)]})
+            count += 1
+
+            if len(chunk) >= config.USER_BULK_CHUNK_SIZE:
+                results += await run_in_threadpool(_insert_users, chunk)
+                chunk = []
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse bulk body: {e}")
+
+    if chunk:
+        results += await run_in_threadpool(_insert_users, chunk)
+    results.sort(key=lambda result: result["row"])
+
+    statuses = [result["status"] for result in results]
+    return JSONResponse({
+        "count": count,
+        "created": statuses.count("created"),
+        "duplicate": statuses.count("duplicate"),
+        "invalid": statuses.count("invalid"),
+        "truncated": truncated,
+        "results": results,
+    })
+
+
+@router.get("/", response_model=List[UserResponse])
+def list_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Max users per page"),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    goal: Optional[str] = Query(None, description="Filter by goal: lose, maintain or gain"),
+    activity_level: Optional[str] = Query(None, description="Filter by activity level"),
+):
+    """
+    📋 Get a page of users, ordered by id.
+    - Keyset pagination: pass the X-Next-Cursor header value as `after`
+      to get the next page (no header = last page)
+    - Optional goal / activity_level filters
+    """
+    clauses, params = _user_filters(goal, activity_level)
+    if after:
+        clauses.append("id > %s")
+        params.append(decode_cursor(after))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        # One extra row tells us whether there is a next page
+        cursor.execute(
+            f"SELECT {USER_COLUMNS} FROM users {where} ORDER BY id LIMIT %s",
+            (*params, limit + 1),
+        )
+        users = cursor.fetchall()
+
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(users[-1]["id"])
+
+    return users
+
+
+@router.get("/{user_id}/plans")
+def list_user_plans(
+    user_id: int,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Max plans per page"),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+):
+    """
+    🗂️ Get a page of a user's generated plans, newest first.
+    - Keyset pagination on (created_at, id): pass the X-Next-Cursor
+      header value as `after` to get the next page (no header = last page)
+    - Each plan has the request profile and the full response
+    """
+    plans, next_key = list_plans(user_id, limit, decode_plan_cursor(after) if after else None)
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_plan_cursor(*next_key)
+    return plans
+
+
+@router.get("/{user_id}/plans/latest")
+def latest_user_plan(user_id: int):
+    """
+    🕘 Get the user's most recent plan without generating a new one.
+    One lookup on the (user_id, created_at, id) index; plans are logged
+    write-behind, so a plan shows up here once it has been flushed.
+    """
+    plan = latest_plan(user_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="No plans for this user")
+    return plan
+
+
+@router.get("/export")
+def export_users(
+    goal: Optional[str] = Query(None, description="Filter by goal: lose, maintain or gain"),
+    activity_level: Optional[str] = Query(None, description="Filter by activity level"),
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Rows fetched per round trip"),
+):
+    """
+    📦 Stream every (matching) user as NDJSON, one JSON object per line.
+    Rows are read through an unbuffered server-side cursor in chunks, so
+    memory stays constant no matter how large the table is.
+    """
+    clauses, params = _user_filters(goal, activity_level)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        cursor.execute(f"SELECT {USER_COLUMNS} FROM users {where} ORDER BY id", tuple(params))
+    except Exception:
+        conn.close()
+        raise
+
+    def rows():
+        try:
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield "".join(json.dumps(row, default=str) + "\n" for row in chunk)
+        finally:
+            conn.close()
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
@@ -1,186 +1,594 @@
-import json
-import re
-from typing import Optional
-from llama_cpp import Llama
-from app.db import get_db_connection
-
-# ✅ Safely load the LLaMA model
-try:
-    llm = Llama(
-        model_path="data/llama-3.2-1b-instruct-q4_k_m.gguf",
-        n_ctx=2048,
-        n_threads=4  # better default for most CPUs
-    )
-    print("✅ LLaMA model loaded successfully.")
-except Exception as e:
-    print("❌ Failed to load LLaMA model:", e)
-    llm = None
-
-# --- Helper functions ---
-def calculate_bmr(age: int, height_cm: float, weight_kg: float, gender: str) -> float:
-    """Calculate Basal Metabolic Rate (BMR) using Mifflin-St Jeor Equation."""
-    if gender.lower() == "male":
-        return 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
-    return 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
-
-def get_activity_multiplier(level: str) -> float:
-    mapping = {
-        "sedentary": 1.2,
-        "light": 1.375,
-        "moderate": 1.55,
-        "active": 1.725,
-        "very_active": 1.9,
-    }
-    return mapping.get(level.lower(), 1.2)
-
-# --- Core AI Plan Generator ---
-def generate_plan(
-    age: int,
-    height_cm: float,
-    weight_kg: float,
-    gender: str,
-    activity_level: str,
-    goal: str,
-    user_id: Optional[int] = None
-) -> dict:
-    """Generate meal + workout plan with macros based on user details."""
-
-    # 1️⃣ Calculate macros
-    bmr = calculate_bmr(age, height_cm, weight_kg, gender)
-    tdee = bmr * get_activity_multiplier(activity_level)
-
-    if goal == "lose":
-        calories = tdee - 500
-    elif goal == "gain":
-        calories = tdee + 500
-    else:
-        calories = tdee
-
-    protein_g = weight_kg * 1.8
-    fat_g = weight_kg * 0.9
-    carbs_g = (calories - (protein_g * 4 + fat_g * 9)) / 4
-
-    macros = {
-        "calories": round(calories),
-        "protein_g": round(protein_g, 1),
-        "fat_g": round(fat_g, 1),
-        "carbs_g": round(carbs_g, 1),
-    }
-
-    # 2️⃣ Create prompt for LLaMA
-    prompt = f"""
-You are a professional AI fitness assistant.
-
-USER PROFILE:
-- Age: {age}
-- Gender: {gender}
-- Height: {height_cm} cm
-- Weight: {weight_kg} kg
-- Activity: {activity_level}
-- Goal: {goal}
-
-TASK:
-Generate a **7-day meal plan** and **7-day workout plan** tailored to the user's goal.
-
-Rules:
-- Each day must be different.
-- Meals: 3/day if lose or maintain, 4/day if gain.
-- Workouts: 3-5 exercises/day.
-- Focus on the goal (hypertrophy, fat loss, or balance).
-
-📤 Respond ONLY with valid JSON between BEGIN_JSON and END_JSON.
-Do not include explanations or comments.
-
-FORMAT:
-BEGIN_JSON
-{{
-  "meal_plan": [
-    {{
-      "day": 1,
-      "meals": [
-        {{"meal_time": "breakfast", "food": "Oats with berries"}}
-      ]
-    }}
-  ],
-  "workout_plan": [
-    {{
-      "day": 1,
-      "exercises": [
-        {{"name": "Squats", "sets": 3, "reps": "8-12"}}
-      ]
-    }}
-  ]
-}}
-END_JSON
-"""
-
-    # 3️⃣ Ask the model & parse JSON
-    def ask_model(prompt_text: str) -> Optional[dict]:
-        if llm is None:
-            return None
-        try:
-            output = llm(prompt_text, max_tokens=1400, temperature=0.4, stop=["</s>"])
-            raw_text = output["choices"][0]["text"].strip()
-            print("🔎 RAW MODEL OUTPUT:\n", raw_text)
-
-            # Extract JSON between markers
-            match = re.search(r'BEGIN_JSON(.*?)END_JSON', raw_text, re.S)
-            if not match:
-                return None
-
-            candidate = match.group(1).strip()
-            try:
-                return json.loads(candidate)
-            except json.JSONDecodeError:
-                candidate = candidate.replace("```", "").replace("\n", "").strip().rstrip(",")
-                return json.loads(candidate)
-        except Exception as e:
-            print("❌ LLaMA call failed:", e)
-            return None
-
-    ideas = ask_model(prompt)
-    if ideas is None:
-        retry_prompt = prompt + "\n⚠️ STRICT: Output must be valid JSON only."
-        ideas = ask_model(retry_prompt)
-
-    if ideas is None:
-        ideas = {"meal_plan": [], "workout_plan": [], "error": "Model output invalid – fallback used."}
-
-    # 4️⃣ Build final response
-    response_json = {
-        "macros": macros,
-        "meal_plan": ideas.get("meal_plan", []),
-        "workout_plan": ideas.get("workout_plan", []),
-        "duration_weeks": 8
-    }
-
-    # 5️⃣ Save result to database
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO model_requests (user_id, request_json, response_json, model_name)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (
-                user_id,
-                json.dumps({
-                    "age": age, "height_cm": height_cm, "weight_kg": weight_kg,
-                    "gender": gender, "activity_level": activity_level, "goal": goal
-                }),
-                json.dumps(response_json),
-                "Meta-Llama-3.2-1B-Instruct-Q4_K_M.gguf"
-            )
-        )
-        conn.commit()
-    except Exception as db_error:
-        print("⚠️ Failed to log model request to database:", db_error)
-    finally:
-        try:
-            cursor.close()
-            conn.close()
-        except:
-            pass
-
-    return response_json
+import logging
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+from app import config
+from app.services import metrics
+from app.services.inference_worker import QueueFullError
+from app.services.jobs import JobStore
+from app.services.llama_settings import load_settings
+from app.services.model_pool import build_inference_pool
+from app.services.nutrition import generate_meal_plan
+from app.services.plan_cache import plan_cache, profile_key
+from app.services.plan_codes import CompactPlanParser, expand_plan
+from app.services.plan_library import plan_library
+from app.services.plan_neighbors import plan_neighbors
+from app.services.plan_prompt import COMPACT_OUTPUT, PROMPT_PREFIX, build_prompt
+from app.services.prefix_cache import PrefixStateCache
+from app.services.request_log import request_log
+from app.services.singleflight import SingleFlight
+from app.services.plan_grammar import get_plan_grammar, meals_per_day_for
+from app.services.plan_stream import PLAN_SECTIONS, IncrementalPlanParser, has_days, merge_days, missing_days
+from app.services.workout import generate_workout_plan
+
+logger = logging.getLogger(__name__)
+
+# Order of the profile tuple passed between the plan helpers
+PROFILE_FIELDS = ("age", "height_cm", "weight_kg", "gender", "activity_level", "goal")
+
+# --- Helper functions ---
+def calculate_bmr(age: int, height_cm: float, weight_kg: float, gender: str) -> float:
+    """Calculate Basal Metabolic Rate (BMR) using Mifflin-St Jeor Equation."""
+    if gender.lower() == "male":
+        return 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
+    return 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
+
+def get_activity_multiplier(level: str) -> float:
+    mapping = {
+        "sedentary": 1.2,
+        "light": 1.375,
+        "moderate": 1.55,
+        "active": 1.725,
+        "very_active": 1.9,
+    }
+    return mapping.get(level.lower(), 1.2)
+
+MODEL_NAME = "Meta-Llama-3.2-1B-Instruct-Q4_K_M.gguf"
+# A compact plan is ~100 tokens; the JSON one needs up to ~1400 (LLM_MAX_TOKENS overrides)
+GENERATION_KWARGS = {
+    "max_tokens": load_settings().max_tokens or (300 if COMPACT_OUTPUT else 1400),
+    "temperature": 0.4,
+    "stop": ["</s>"],
+}
+STRICT_SUFFIX = (
+    "\n⚠️ STRICT: Output only the 7 code lines between BEGIN_PLAN and END_PLAN."
+    if COMPACT_OUTPUT else "\n⚠️ STRICT: Output must be valid JSON only."
+)
+
+# Decoding counters. "first_pass_failures" is how often the unconstrained
+# path would have re-sent the whole prompt with STRICT_SUFFIX.
+_decoding_lock = threading.Lock()
+_decoding_counts = {
+    "requests": 0,
+    "constrained": 0,
+    "first_pass_failures": 0,
+    "retries": 0,
+    "fallbacks": 0,
+    "json_failures": 0,
+    "partial_outputs": 0,
+    "continuations": 0,
+    "incomplete": 0,
+}
+
+# Prometheus metrics (GET /metrics)
+PLAN_STAGE_SECONDS = metrics.histogram(
+    "gym_ai_plan_stage_seconds", "Time spent in each plan generation stage", ["stage"]
+)
+PLAN_EVENTS = metrics.counter(
+    "gym_ai_plan_decoding_events_total", "Decoding events (requests, retries, fallbacks, json_failures, ...)", ["event"]
+)
+PLANS_SERVED = metrics.counter(
+    "gym_ai_plans_total", "Plans returned, by where the meal/workout part came from", ["source"]
+)
+LLM_TOKENS = metrics.counter("gym_ai_llm_tokens_total", "Tokens processed by the model", ["kind"])
+
+def _count(name: str) -> None:
+    with _decoding_lock:
+        _decoding_counts[name] += 1
+    PLAN_EVENTS.labels(event=name).inc()
+
+def _count_tokens(usage: Optional[dict]) -> None:
+    if usage:
+        LLM_TOKENS.labels(kind="prompt").inc(usage.get("prompt_tokens", 0))
+        LLM_TOKENS.labels(kind="completion").inc(usage.get("completion_tokens", 0))
+
+def decoding_stats() -> dict:
+    with _decoding_lock:
+        return {"constrained_decoding": config.LLM_CONSTRAINED_DECODING, **_decoding_counts}
+
+def generation_kwargs(goal: str, days: Optional[tuple] = None) -> dict:
+    """
+    Sampling options for a plan completion (grammar-constrained if
+    enabled), for all 7 days or only the given ones.
+    """
+    kwargs = dict(GENERATION_KWARGS)
+    if config.LLM_CONSTRAINED_DECODING:
+        grammar = get_plan_grammar(meals_per_day_for(goal), COMPACT_OUTPUT, days)
+        if grammar is not None:
+            kwargs["grammar"] = grammar
+    return kwargs
+
+def calculate_plan_macros(age: int, height_cm: float, weight_kg: float, gender: str, activity_level: str, goal: str) -> dict:
+    """Daily calorie + macro targets used in AI plans."""
+    bmr = calculate_bmr(age, height_cm, weight_kg, gender)
+    tdee = bmr * get_activity_multiplier(activity_level)
+
+    if goal == "lose":
+        calories = tdee - 500
+    elif goal == "gain":
+        calories = tdee + 500
+    else:
+        calories = tdee
+
+    protein_g = weight_kg * 1.8
+    fat_g = weight_kg * 0.9
+    carbs_g = (calories - (protein_g * 4 + fat_g * 9)) / 4
+
+    return {
+        "calories": round(calories),
+        "protein_g": round(protein_g, 1),
+        "fat_g": round(fat_g, 1),
+        "carbs_g": round(carbs_g, 1),
+    }
+
+def _build_prefix_cache(llm):
+    """KV reuse for PROMPT_PREFIX, per LLM_PREFIX_CACHE (snapshot | ram | off)."""
+    if config.LLM_PREFIX_CACHE == "off":
+        return None
+    if config.LLM_PREFIX_CACHE == "ram":
+        # llama_cpp keeps whole states keyed by tokens and restores the longest prefix
+        try:
+            from llama_cpp import LlamaRAMCache
+            llm.set_cache(LlamaRAMCache(capacity_bytes=config.LLM_RAM_CACHE_BYTES))
+        except Exception as e:
+            print("⚠️ LLaMA RAM cache unavailable:", e)
+        return None
+    return PrefixStateCache(llm, PROMPT_PREFIX, build_prompt(30, 175, 75, "male", "moderate", "maintain"))
+
+# ✅ LLM_INSTANCES model instances, each owned by one worker thread; every
+# completion goes to the least busy one
+inference_pool = build_inference_pool(prefix_cache_factory=_build_prefix_cache)
+
+# ✅ The LLaMA model is loaded on demand (see LLM_LOAD_MODE), not on import
+if config.LLM_LOAD_MODE == "eager":
+    inference_pool.load_now()
+
+def _usable(ideas: Optional[dict]) -> Optional[dict]:
+    """
+    ideas, or None when not a single day was produced in any section (7
+    finished meal days with no workout day yet are still worth keeping).
+    """
+    if not has_days(ideas):
+        return None
+    return ideas
+
+def parse_plan_output(raw_text: str) -> Optional[dict]:
+    """
+    meal_plan / workout_plan from a completion in the configured output
+    mode. Output cut off by max_tokens (or before the end marker) keeps
+    every day completed so far; None if no day was usable.
+    """
+    if COMPACT_OUTPUT:
+        return _usable(expand_plan(raw_text))
+    parser = IncrementalPlanParser()
+    parser.feed(raw_text)
+    return _usable(parser.result())
+
+def build_continuation_prompt(prompt: str, days: list) -> str:
+    """
+    The original prompt plus a request for only the given days. It starts
+    with the same tokens, so their KV state is reused.
+    """
+    listed = ", ".join(str(d) for d in days)
+    return prompt + f"\nThe other days are already planned. Output ONLY days {listed}, numbered {listed}, in the same FORMAT.\n"
+
+def ask_model(prompt_text: str, goal: str = "maintain", days: Optional[tuple] = None) -> Optional[dict]:
+    """
+    Run one completion and parse it (None if the model failed or no day
+    parsed). days limits the grammar to those days (continuations).
+    """
+    if not inference_pool.available():
+        return None
+    try:
+        with PLAN_STAGE_SECONDS.time(stage="model"):
+            output = inference_pool.complete(
+                prompt_text, timeout=config.INFERENCE_TIMEOUT, **generation_kwargs(goal, days)
+            )
+        _count_tokens(output.get("usage"))
+        choice = output["choices"][0]
+        if choice.get("finish_reason") == "length":
+            logger.info("Plan completion hit max_tokens; keeping the finished days")
+        raw_text = choice["text"].strip()
+        logger.debug("🔎 RAW MODEL OUTPUT:\n%s", raw_text)
+        with PLAN_STAGE_SECONDS.time(stage="parse"):
+            ideas = parse_plan_output(raw_text)
+    except QueueFullError:
+        # Backpressure must reach the route (503 + Retry-After)
+        raise
+    except Exception as e:
+        print("❌ LLaMA call failed:", e)
+        return None
+
+    if ideas is None:
+        _count("json_failures")
+    return ideas
+
+def _complete_missing_days(prompt: str, goal: str, ideas: dict) -> dict:
+    """
+    Regenerate only the days a truncated completion didn't finish, with a
+    continuation prompt (one extra call, a fraction of a full plan).
+    """
+    days = missing_days(ideas)
+    if not days:
+        return ideas
+
+    _count("partial_outputs")
+    _count("continuations")
+    with PLAN_STAGE_SECONDS.time(stage="continuation"):
+        try:
+            extra = ask_model(build_continuation_prompt(prompt, days), goal, tuple(days))
+        except QueueFullError:
+            # The finished days are still better than a 503 at this point
+            extra = None
+    ideas = merge_days(ideas, extra, days)
+    if missing_days(ideas):
+        _count("incomplete")
+    return ideas
+
+def _generate_ideas(prompt: str, goal: str) -> Optional[dict]:
+    """
+    First pass (grammar-constrained when enabled). Only unconstrained
+    output can fail to parse in a way a stricter prompt might fix, so the
+    STRICT retry is only used when no grammar was applied. Truncated
+    output keeps its finished days and only the rest is regenerated.
+    """
+    if not inference_pool.available():
+        return None
+
+    constrained = "grammar" in generation_kwargs(goal)
+    _count("requests")
+    if constrained:
+        _count("constrained")
+
+    ideas = ask_model(prompt, goal)
+    if ideas is None:
+        _count("first_pass_failures")
+        if not constrained:
+            _count("retries")
+            ideas = ask_model(prompt + STRICT_SUFFIX, goal)
+
+    if ideas is None:
+        _count("fallbacks")
+        return None
+    return _complete_missing_days(prompt, goal, ideas)
+
+def _fallback_ideas(goal: str) -> dict:
+    """The deterministic plan, for when the model can't produce one."""
+    return {
+        "meal_plan": generate_meal_plan(goal),
+        "workout_plan": generate_workout_plan(goal)["workout_plan"],
+        "error": "Model output invalid – fallback used.",
+    }
+
+def _remember_plan(cache_key: str, ideas: dict, profile: tuple) -> None:
+    if missing_days(ideas):
+        # Still incomplete after the continuation: serve it, don't keep it
+        return
+    plan_cache.set(cache_key, {
+        "meal_plan": ideas.get("meal_plan", []),
+        "workout_plan": ideas.get("workout_plan", []),
+    })
+    plan_neighbors.add(*profile, ideas)
+
+# ✅ Identical profiles generated at the same time share one inference
+plan_flights = SingleFlight(enabled=config.PLAN_COALESCE)
+
+def _generate_shared(cache_key: str, prompt: str, goal: str, profile: tuple) -> dict:
+    """Generate (and cache) the ideas for one profile key; run once per in-flight key."""
+    # A flight for this key may have just finished and filled the cache
+    ideas = plan_cache.get(cache_key)
+    if ideas is not None:
+        return ideas
+
+    ideas = _generate_ideas(prompt, goal)
+    if ideas is None:
+        return _fallback_ideas(goal)
+    _remember_plan(cache_key, ideas, profile)
+    return ideas
+
+def log_model_request(user_id: Optional[int], request_data: dict, response_json: dict) -> None:
+    """Queue a generated plan for model_requests (written in the background)."""
+    request_log.log(user_id, request_data, response_json, MODEL_NAME)
+
+# --- Core AI Plan Generator ---
+def generate_plan(
+    age: int,
+    height_cm: float,
+    weight_kg: float,
+    gender: str,
+    activity_level: str,
+    goal: str,
+    user_id: Optional[int] = None,
+    fresh: bool = False
+) -> dict:
+    """
+    Generate meal + workout plan with macros based on user details.
+    Plans come from the precomputed library, then the plan cache, then the
+    nearest similar profile's model plan, then the model; fresh=True always
+    asks the model (and refreshes the cache).
+    """
+
+    # 1️⃣ Calculate macros
+    with PLAN_STAGE_SECONDS.time(stage="macros"):
+        macros = calculate_plan_macros(age, height_cm, weight_kg, gender, activity_level, goal)
+
+    # 2️⃣ Create prompt for LLaMA
+    with PLAN_STAGE_SECONDS.time(stage="prompt"):
+        prompt = build_prompt(age, height_cm, weight_kg, gender, activity_level, goal)
+
+    # 3️⃣ Ask the model & parse JSON (timed per call in ask_model)
+    # Repeated and near-identical profiles are served from the plan cache /
+    # neighbour index (macros stay exact), and concurrent identical ones
+    # wait for the generation already running
+    profile = (age, height_cm, weight_kg, gender, activity_level, goal)
+    cache_key = profile_key(*profile)
+    ideas, source = (None, "model") if fresh else _lookup_ideas(profile, cache_key)
+    if ideas is None:
+        ideas, source = _model_ideas(profile, cache_key, prompt, fresh)
+
+    # 4️⃣ Build final response & 5️⃣ save it to the database
+    return _plan_response(macros, ideas, source, profile, user_id)
+
+def _lookup_ideas(profile: tuple, cache_key: str) -> Tuple[Optional[dict], str]:
+    """Library, then plan cache, then neighbour index: (ideas, source), no model call."""
+    with PLAN_STAGE_SECONDS.time(stage="lookup"):
+        ideas = plan_library.get(*profile)
+        if ideas is not None:
+            return ideas, "library"
+        ideas = plan_cache.get(cache_key)
+        if ideas is not None:
+            return ideas, "cache"
+        ideas = plan_neighbors.get(*profile)
+        if ideas is not None:
+            return ideas, "neighbor"
+    return None, "model"
+
+def _model_ideas(profile: tuple, cache_key: str, prompt: str, fresh: bool) -> Tuple[dict, str]:
+    """Generate with the model (coalesced unless fresh): (ideas, "model" or "fallback")."""
+    goal = profile[5]
+    if fresh:
+        ideas = _generate_ideas(prompt, goal)
+        if ideas is None:
+            ideas = _fallback_ideas(goal)
+        else:
+            _remember_plan(cache_key, ideas, profile)
+    else:
+        ideas = plan_flights.do(cache_key, _generate_shared, cache_key, prompt, goal, profile)
+    return ideas, "fallback" if "error" in ideas else "model"
+
+def _plan_response(macros: dict, ideas: dict, source: str, profile: tuple, user_id: Optional[int]) -> dict:
+    """The API response for a plan, queued for model_requests."""
+    PLANS_SERVED.labels(source=source).inc()
+    response_json = {
+        "macros": macros,
+        "meal_plan": ideas.get("meal_plan", []),
+        "workout_plan": ideas.get("workout_plan", []),
+        "duration_weeks": 8,
+        "source": source
+    }
+    with PLAN_STAGE_SECONDS.time(stage="log"):
+        log_model_request(user_id, dict(zip(PROFILE_FIELDS, profile)), response_json)
+    return response_json
+
+# --- Latency budget ---
+# Background model generations for budgeted requests, separate from the
+# POST /ai/jobs store; sized to what the inference queues can take, so a
+# job never waits here for a thread (0 = that default)
+plan_upgrades = JobStore(
+    config.PLAN_UPGRADE_WORKERS or len(inference_pool.workers) * (config.INFERENCE_QUEUE_SIZE + 1),
+    config.PLAN_UPGRADE_WORKERS or len(inference_pool.workers) * (config.INFERENCE_QUEUE_SIZE + 1),
+    config.JOB_RESULT_TTL,
+)
+_deadline_counts = {"requests": 0, "on_time": 0, "fallbacks": 0}
+
+def deadline_stats() -> dict:
+    with _decoding_lock:
+        return {"default_seconds": config.PLAN_DEADLINE_SECONDS, **_deadline_counts, "upgrades": plan_upgrades.stats()}
+
+def _count_deadline(name: str) -> None:
+    with _decoding_lock:
+        _deadline_counts[name] += 1
+
+def fallback_plan(age: int, height_cm: float, weight_kg: float, gender: str, activity_level: str, goal: str) -> dict:
+    """The deterministic plan: exact macros, template meals and workouts, no model."""
+    ideas = _fallback_ideas(goal)
+    return {
+        "macros": calculate_plan_macros(age, height_cm, weight_kg, gender, activity_level, goal),
+        "meal_plan": ideas["meal_plan"],
+        "workout_plan": ideas["workout_plan"],
+        "duration_weeks": 8,
+        "source": "fallback"
+    }
+
+def _generate_model_plan(profile: tuple, cache_key: str, user_id: Optional[int], fresh: bool) -> dict:
+    """Background half of generate_plan_within(): the model call and the response."""
+    ideas, source = _model_ideas(profile, cache_key, build_prompt(*profile), fresh)
+    return _plan_response(calculate_plan_macros(*profile), ideas, source, profile, user_id)
+
+def generate_plan_within(
+    deadline: float,
+    age: int,
+    height_cm: float,
+    weight_kg: float,
+    gender: str,
+    activity_level: str,
+    goal: str,
+    user_id: Optional[int] = None,
+    fresh: bool = False
+) -> dict:
+    """
+    generate_plan() with a latency budget. Library / cache / neighbour
+    hits are answered right away. Otherwise the model call runs in
+    plan_upgrades; if it isn't done after `deadline` seconds the
+    deterministic plan is returned instead, with "plan_id" set so the
+    client can fetch the model's plan from GET /ai/plans/{plan_id} once it
+    finishes (it is also cached and logged like any other plan).
+
+    Raises QueueFullError (-> 503) when no generation can be started, so a
+    fallback always comes with a plan_id unless the generation failed.
+    """
+    _count_deadline("requests")
+    profile = (age, height_cm, weight_kg, gender, activity_level, goal)
+    cache_key = profile_key(*profile)
+    if not fresh:
+        ideas, source = _lookup_ideas(profile, cache_key)
+        if ideas is not None:
+            _count_deadline("on_time")
+            return _plan_response(calculate_plan_macros(*profile), ideas, source, profile, user_id)
+
+    job = plan_upgrades.submit(
+        _generate_model_plan, profile, cache_key, user_id, fresh,
+        retry_after=inference_pool.retry_after()
+    )
+    job = plan_upgrades.wait(job["job_id"], timeout=deadline)
+
+    if job["state"] == "done":
+        _count_deadline("on_time")
+        return job["result"]
+    if job["state"] == "failed" and job["error_type"] == QueueFullError.__name__:
+        # The inference queue was full: no plan is coming, don't pretend one is
+        raise QueueFullError(job["error"], inference_pool.retry_after())
+
+    _count_deadline("fallbacks")
+    PLANS_SERVED.labels(source="fallback").inc()
+    plan = fallback_plan(*profile)
+    plan["plan_id"] = job["job_id"] if job["state"] in ("queued", "running") else None
+    return plan
+
+# --- Streaming variant ---
+STREAM_DAY_EVENTS = {"meal_plan": "meal_day", "workout_plan": "workout_day"}
+
+def generate_plan_stream(
+    age: int,
+    height_cm: float,
+    weight_kg: float,
+    gender: str,
+    activity_level: str,
+    goal: str,
+    user_id: Optional[int] = None,
+    fresh: bool = False
+) -> Iterator[dict]:
+    """
+    Same pipeline as generate_plan(), but returns an iterator of events:
+    "macros" first, then one "meal_day" / "workout_day" per finished day
+    while the model is still generating, and finally "done" with the full
+    response. The model request is queued before returning, so a full
+    queue raises QueueFullError here rather than mid-stream.
+    """
+    macros = calculate_plan_macros(age, height_cm, weight_kg, gender, activity_level, goal)
+    prompt = build_prompt(age, height_cm, weight_kg, gender, activity_level, goal)
+    cache_key = profile_key(age, height_cm, weight_kg, gender, activity_level, goal)
+    request_data = {
+        "age": age, "height_cm": height_cm, "weight_kg": weight_kg,
+        "gender": gender, "activity_level": activity_level, "goal": goal
+    }
+
+    cached = None
+    cached_source = None
+    if not fresh:
+        cached = plan_library.get(age, height_cm, weight_kg, gender, activity_level, goal)
+        cached_source = "library"
+        if cached is None:
+            cached = plan_cache.get(cache_key)
+            cached_source = "cache"
+        if cached is None:
+            cached = plan_neighbors.get(age, height_cm, weight_kg, gender, activity_level, goal)
+            cached_source = "neighbor"
+    chunks = None
+    stream_kwargs = {}
+    if cached is None and inference_pool.available():
+        stream_kwargs = generation_kwargs(goal)
+        chunks = inference_pool.stream(prompt, **stream_kwargs)
+        _count("requests")
+        if "grammar" in stream_kwargs:
+            _count("constrained")
+
+    def events() -> Iterator[dict]:
+        yield {"event": "macros", "data": macros}
+
+        ideas = cached
+        if ideas is not None:
+            for section, event in STREAM_DAY_EVENTS.items():
+                for day in ideas.get(section, []):
+                    yield {"event": event, "data": day}
+        else:
+            if chunks is not None:
+                parser = CompactPlanParser() if COMPACT_OUTPUT else IncrementalPlanParser()
+                tokens = 0
+                started = time.perf_counter()
+                try:
+                    for chunk in chunks:
+                        tokens += 1
+                        for section, day in parser.feed(chunk["choices"][0]["text"]):
+                            yield {"event": STREAM_DAY_EVENTS[section], "data": day}
+                        if parser.finished:
+                            break
+                except Exception as e:
+                    print("❌ LLaMA stream failed:", e)
+                finally:
+                    chunks.close()
+                    # Streamed chunks are one token each; prompt tokens aren't reported
+                    LLM_TOKENS.labels(kind="completion").inc(tokens)
+                    PLAN_STAGE_SECONDS.observe(time.perf_counter() - started, stage="stream")
+                ideas = _usable(parser.result())
+                if ideas is None:
+                    _count("json_failures")
+
+            if ideas is None and chunks is not None:
+                _count("first_pass_failures")
+                if "grammar" not in stream_kwargs:
+                    # Nothing usable streamed: one non-streamed strict retry
+                    _count("retries")
+                    try:
+                        ideas = ask_model(prompt + STRICT_SUFFIX, goal)
+                    except QueueFullError:
+                        ideas = None
+                if ideas is not None:
+                    for section, event in STREAM_DAY_EVENTS.items():
+                        for day in ideas.get(section, []):
+                            yield {"event": event, "data": day}
+
+            if ideas is not None and missing_days(ideas):
+                # Truncated: stream the regenerated days once they arrive
+                streamed = {(section, day.get("day")) for section in PLAN_SECTIONS for day in ideas.get(section, [])}
+                ideas = _complete_missing_days(prompt, goal, ideas)
+                for section, event in STREAM_DAY_EVENTS.items():
+                    for day in ideas.get(section, []):
+                        if (section, day.get("day")) not in streamed:
+                            yield {"event": event, "data": day}
+
+            if ideas is None:
+                if chunks is not None:
+                    _count("fallbacks")
+                ideas = _fallback_ideas(goal)
+            else:
+                _remember_plan(cache_key, ideas, (age, height_cm, weight_kg, gender, activity_level, goal))
+
+        if ideas is cached:
+            source = cached_source
+        else:
+            source = "fallback" if "error" in ideas else "model"
+        PLANS_SERVED.labels(source=source).inc()
+
+        response_json = {
+            "macros": macros,
+            "meal_plan": ideas.get("meal_plan", []),
+            "workout_plan": ideas.get("workout_plan", []),
+            "duration_weeks": 8,
+            "source": source
+        }
+        with PLAN_STAGE_SECONDS.time(stage="log"):
+            log_model_request(user_id, request_data, response_json)
+        yield {"event": "done", "data": response_json}
+
+    return events()
@@ -0,0 +1,351 @@
+"""
+Batch Plan Generation
+---------------------
+Offline CLI that generates AI plans for a whole client list: profiles
+are streamed from a JSONL file, fanned out over a process pool (one
+model instance per process, each running generate_plan()), and written
+to an output JSONL as they finish.
+
+Input lines are JSON objects with the /ai/generate fields (age,
+height_cm, weight_kg, gender, activity_level, goal), either at the top
+level or under "profile", plus an optional "id" and "user_id" that are
+carried into the output. Each output line has the input line number
+("line"), "id", "status" (ok | invalid | error), and either "plan" or
+"error".
+
+The output file is the checkpoint: it is fsynced every
+--checkpoint-every results, and a restarted run (--resume) skips every
+line already in it (a torn last line from a kill is dropped). Progress
+with throughput and ETA is printed every --report-every seconds.
+
+A worker process that dies (e.g. killed for running out of memory)
+breaks the whole pool: finished results are kept, a new pool is started
+and the profiles that were in flight are submitted again. A profile in
+flight during MAX_LINE_CRASHES breaks is written as an error; after
+MAX_POOL_RESTARTS the run stops and the rest is left for --resume.
+
+Usage:
+    python -m app.services.batch_generate --input clients.jsonl --output plans.jsonl --processes 4
+    python -m app.services.batch_generate --input clients.jsonl --output plans.jsonl --processes 4 --resume
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional, Set, Tuple
+
+from app import config
+
+PROFILE_FIELDS = ("age", "height_cm", "weight_kg", "gender", "activity_level", "goal")
+# New pools started after a worker process died, before the run gives up
+MAX_POOL_RESTARTS = 3
+# Breaks a profile may be in flight for before it is written as an error
+MAX_LINE_CRASHES = 2
+
+
+def read_profiles(path: str) -> Iterator[Tuple[int, object]]:
+    """(line number, raw record or parse error) for every non-empty line, streamed."""
+    with open(path, encoding="utf-8-sig") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, ValueError(f"Invalid JSON: {e.msg}")
+
+
+def parse_profile(record) -> dict:
+    """The generate_plan() arguments from one input record (ValueError if unusable)."""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Line must be a JSON object")
+    profile = record.get("profile", record)
+    if not isinstance(profile, dict):
+        raise ValueError("'profile' must be an object")
+    missing = [name for name in PROFILE_FIELDS if name not in profile]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    try:
+        return {
+            "age": int(profile["age"]),
+            "height_cm": float(profile["height_cm"]),
+            "weight_kg": float(profile["weight_kg"]),
+            "gender": str(profile["gender"]).lower(),
+            "activity_level": str(profile["activity_level"]).lower(),
+            "goal": str(profile["goal"]).lower(),
+        }
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid profile value: {e}")
+
+
+def completed_lines(path: str) -> Set[int]:
+    """
+    Input line numbers already in an output file. A torn last line (the
+    run was killed mid-write) is cut off so appending starts clean.
+    """
+    done: Set[int] = set()
+    if not os.path.exists(path):
+        return done
+
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                if not raw.endswith(b"\n"):
+                    raise ValueError("torn line")
+                done.add(json.loads(raw)["line"])
+            except (ValueError, KeyError, TypeError):
+                break
+            good_bytes += len(raw)
+    if good_bytes < os.path.getsize(path):
+        print(f"⚠️ Dropping an incomplete record at the end of {path}")
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+def count_lines(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+# --- Worker processes ---
+_fresh = False
+
+
+def _init_worker(counter, processes: int, pin: bool, fresh: bool) -> None:
+    """Runs once per process: give it its own cores (if pinning)."""
+    global _fresh
+    _fresh = fresh
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    if pin and hasattr(os, "sched_setaffinity"):
+        from app.services.model_pool import partition_cores
+
+        os.sched_setaffinity(0, partition_cores(processes)[index])
+
+
+def _generate(line_no: int, record_id, user_id: Optional[int], profile: dict) -> dict:
+    # Imported in the worker: the model instance belongs to this process
+    from app.services.ai_model import generate_plan
+
+    started = time.perf_counter()
+    result = {"line": line_no, "id": record_id}
+    try:
+        plan = generate_plan(**profile, user_id=user_id, fresh=_fresh)
+        result.update(status="ok", plan=plan)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+def run_batch(input_path: str, output_path: str, processes: int = 1, threads: Optional[int] = None,
+              resume: bool = False, fresh: bool = False, pin: bool = False, log_requests: bool = False,
+              checkpoint_every: int = 50, report_every: float = 10.0) -> dict:
+    """Generate a plan for every profile in input_path not yet in output_path."""
+    processes = max(1, processes)
+    if os.path.exists(output_path) and not resume:
+        raise FileExistsError(f"{output_path} exists; pass --resume to continue it")
+    done_before = completed_lines(output_path) if resume else set()
+    total = count_lines(input_path)
+    todo = total - len(done_before)
+    print(f"🏗️ {todo} of {total} profiles to generate with {processes} processes"
+          + (f" ({len(done_before)} already done)" if done_before else ""))
+
+    # Children read these when they import app.config: one model instance
+    # each, sharing the thread budget, and no DB logging unless asked
+    os.environ["LLM_INSTANCES"] = "1"
+    os.environ["LLM_TOTAL_THREADS"] = str(max(1, (threads or config.LLM_TOTAL_THREADS) // processes))
+    os.environ["LLM_LOAD_MODE"] = "lazy"
+    os.environ["LLM_PIN_CORES"] = "1" if pin else "0"
+    if not log_requests:
+        os.environ["REQUEST_LOG_BUFFER"] = "0"
+
+    counts = {"ok": 0, "invalid": 0, "error": 0}
+    started = time.perf_counter()
+    last_report = started
+    unsynced = 0
+    context = multiprocessing.get_context("spawn")
+    counter = context.Value("i", 0)
+
+    def new_pool() -> ProcessPoolExecutor:
+        # Worker indexes (for core pinning) start over in every pool
+        with counter.get_lock():
+            counter.value = 0
+        return ProcessPoolExecutor(
+            max_workers=processes, mp_context=context,
+            initializer=_init_worker, initargs=(counter, processes, pin, fresh),
+        )
+
+    jobs = {}       # future -> (line, id, user_id, profile)
+    crashes = {}    # line -> pool breaks it was in flight for
+    lost = []       # jobs to submit again once a new pool is up
+    restarts = 0
+    aborted = False
+    executor = new_pool()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(result: dict) -> None:
+            nonlocal unsynced
+            out.write(json.dumps(result, default=str) + "\n")
+            counts[result["status"]] += 1
+            unsynced += 1
+            if unsynced >= checkpoint_every:
+                out.flush()
+                os.fsync(out.fileno())
+                unsynced = 0
+
+        def report(final: bool = False) -> None:
+            done = sum(counts.values())
+            elapsed = time.perf_counter() - started
+            rate = counts["ok"] / elapsed if elapsed else 0.0
+            eta = _format_eta((todo - done) / rate) if rate and not final else "-"
+            print(f"⏳ {done}/{todo} ({counts['ok']} ok, {counts['invalid']} invalid, {counts['error']} failed) "
+                  f"{rate:.2f} plans/s, ETA {eta}")
+
+        def lose(job) -> None:
+            crashes[job[0]] = crashes.get(job[0], 0) + 1
+            if crashes[job[0]] >= MAX_LINE_CRASHES:
+                write({"line": job[0], "id": job[1], "status": "error",
+                       "error": "Worker process died (e.g. out of memory)"})
+            else:
+                lost.append(job)
+
+        def collect(finished) -> bool:
+            """Write finished results; False when the pool broke under any of them."""
+            broken = False
+            for future in finished:
+                job = jobs.pop(future)
+                try:
+                    write(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    lose(job)
+            return not broken
+
+        def recover() -> bool:
+            """Replace a broken pool and resubmit its jobs (False once out of restarts)."""
+            nonlocal executor, restarts
+            # Every other job of the broken pool fails right away too
+            collect(wait(list(jobs))[0])
+            executor.shutdown(wait=True, cancel_futures=True)
+            out.flush()
+            os.fsync(out.fileno())
+            if restarts >= MAX_POOL_RESTARTS:
+                return False
+            restarts += 1
+            print(f"⚠️ A worker process died; restarting the pool ({restarts}/{MAX_POOL_RESTARTS}) "
+                  f"and retrying {len(lost)} profiles")
+            executor = new_pool()
+            for job in lost:
+                jobs[executor.submit(_generate, *job)] = job
+            lost.clear()
+            return True
+
+        def submit(job) -> bool:
+            try:
+                jobs[executor.submit(_generate, *job)] = job
+            except BrokenProcessPool:
+                lost.append(job)
+                return recover()
+            return True
+
+        try:
+            # Keep every process busy without reading the whole input up front
+            max_pending = processes * 2
+            for line_no, record in read_profiles(input_path):
+                if line_no in done_before:
+                    continue
+                try:
+                    profile = parse_profile(record)
+                except ValueError as e:
+                    write({"line": line_no, "id": record.get("id") if isinstance(record, dict) else None,
+                           "status": "invalid", "error": str(e)})
+                    continue
+
+                if len(jobs) >= max_pending:
+                    finished, _ = wait(list(jobs), return_when=FIRST_COMPLETED)
+                    if not collect(finished) and not recover():
+                        aborted = True
+                        break
+                if not submit((line_no, record.get("id"), record.get("user_id"), profile)):
+                    aborted = True
+                    break
+
+                if time.perf_counter() - last_report >= report_every:
+                    report()
+                    last_report = time.perf_counter()
+
+            while jobs and not aborted:
+                finished, _ = wait(list(jobs), timeout=report_every, return_when=FIRST_COMPLETED)
+                if not collect(finished) and not recover():
+                    aborted = True
+                report()
+        finally:
+            executor.shutdown(wait=not aborted, cancel_futures=True)
+            out.flush()
+            os.fsync(out.fileno())
+
+    report(final=True)
+    elapsed = time.perf_counter() - started
+    unfinished = todo - sum(counts.values())
+    if aborted:
+        print(f"❌ Worker processes kept dying; stopped with {unfinished} profiles left for --resume")
+    return {
+        "total": total,
+        "skipped": len(done_before),
+        **counts,
+        "unfinished": unfinished,
+        "restarts": restarts,
+        "seconds": round(elapsed, 1),
+        "plans_per_second": round(counts["ok"] / elapsed, 3) if elapsed else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate AI plans for a JSONL file of profiles")
+    parser.add_argument("--input", required=True, help="JSONL with one profile per line")
+    parser.add_argument("--output", required=True, help="JSONL results (also the checkpoint)")
+    parser.add_argument("--processes", type=int, default=config.LLM_INSTANCES,
+                        help="Worker processes, one model instance each")
+    parser.add_argument("--threads", type=int, help="Total inference threads, split across processes "
+                                                    "(default LLM_TOTAL_THREADS)")
+    parser.add_argument("--resume", action="store_true", help="Skip lines already in --output")
+    parser.add_argument("--fresh", action="store_true", help="Bypass the plan library and cache")
+    parser.add_argument("--pin", action="store_true", help="Pin each process to its own cores")
+    parser.add_argument("--log-requests", action="store_true", help="Also write plans to model_requests")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="fsync the output every N results")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    try:
+        result = run_batch(
+            args.input, args.output, args.processes, args.threads, args.resume, args.fresh,
+            args.pin, args.log_requests, args.checkpoint_every, args.report_every,
+        )
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(f"✅ Done: {result['ok']} generated, {result['invalid']} invalid, {result['error']} failed, "
+          f"{result['skipped']} skipped in {result['seconds']} s ({result['plans_per_second']} plans/s)")
+    if result["unfinished"]:
+        print(f"⚠️ {result['unfinished']} profiles not generated; rerun with --resume")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
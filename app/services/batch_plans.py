@@ -0,0 +1,79 @@
+"""
+Batch Plan Service
+------------------
+Vectorized version of /plans/calculate for large rosters. Macros are
+computed for every profile at once with NumPy array operations, using the
+same formulas as calculate_macros() in app.services.nutrition. Portions
+come from the portion solver, one matrix pass per menu used in the batch.
+
+Usage:
+    from app.services.batch_plans import calculate_batch
+
+    result = calculate_batch(profiles)   # list of validated dicts
+    result["bmr"], result["breakfast_oats_g"], ...   # NumPy arrays
+"""
+
+import numpy as np
+
+from app.services.nutrition import ACTIVITY_MULTIPLIERS
+from app.services.portions import DEFAULT_MENU, get_menu
+
+MACRO_COLUMNS = ("bmr", "tdee", "calories", "protein_g", "fat_g", "carbs_g")
+
+_GOAL_CALORIE_OFFSET = {"lose": -500.0, "maintain": 0.0, "gain": 500.0}
+_GOAL_PROTEIN_PER_KG = {"lose": 2.2, "maintain": 1.8, "gain": 2.0}
+
+
+def calculate_batch(profiles: list) -> dict:
+    """
+    Compute macros + portion grams for many profiles in one pass.
+
+    Args:
+        profiles (list[dict]): validated rows with age, height_cm, weight_kg,
+            gender, activity_level, goal and optionally menu (lower-cased)
+
+    Returns:
+        dict: column name -> NumPy array (one value per profile). Portion
+        columns cover every menu in the batch; foods that are not on a
+        row's menu are 0 for that row.
+    """
+    age = np.fromiter((p["age"] for p in profiles), dtype=np.float64, count=len(profiles))
+    height = np.fromiter((p["height_cm"] for p in profiles), dtype=np.float64, count=len(profiles))
+    weight = np.fromiter((p["weight_kg"] for p in profiles), dtype=np.float64, count=len(profiles))
+    is_male = np.array([p["gender"] == "male" for p in profiles], dtype=bool)
+    multiplier = np.array([ACTIVITY_MULTIPLIERS[p["activity_level"]] for p in profiles], dtype=np.float64)
+    offset = np.array([_GOAL_CALORIE_OFFSET[p["goal"]] for p in profiles], dtype=np.float64)
+    protein_per_kg = np.array([_GOAL_PROTEIN_PER_KG[p["goal"]] for p in profiles], dtype=np.float64)
+
+    # 1️⃣ BMR (Mifflin-St Jeor)
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(is_male, 5.0, -161.0)
+    # 2️⃣ TDEE  3️⃣ Goal adjustment
+    tdee = bmr * multiplier
+    calories = tdee + offset
+    # 4️⃣ Macronutrients
+    protein_g = weight * protein_per_kg
+    fat_g = (0.25 * calories) / 9
+    carbs_g = (calories - (protein_g * 4 + fat_g * 9)) / 4
+
+    columns = {
+        "bmr": np.round(bmr, 2),
+        "tdee": np.round(tdee, 2),
+        "calories": np.round(calories, 2),
+        "protein_g": np.round(protein_g, 2),
+        "fat_g": np.round(fat_g, 2),
+        "carbs_g": np.round(carbs_g, 2),
+    }
+
+    # 🍱 Portions: all rows of the same menu solved in one pass
+    targets = np.column_stack([columns["calories"], columns["protein_g"], columns["fat_g"], columns["carbs_g"]])
+    menus = np.array([p.get("menu", DEFAULT_MENU) for p in profiles])
+    for name in dict.fromkeys(menus.tolist()):
+        menu = get_menu(name)
+        rows = menus == name
+        grams = menu.solve(targets[rows])
+        for i, column in enumerate(menu.columns):
+            if column not in columns:
+                columns[column] = np.zeros(len(profiles), dtype=np.int64)
+            columns[column][rows] = grams[:, i]
+
+    return columns
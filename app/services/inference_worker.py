@@ -0,0 +1,289 @@
+"""
+Inference Worker
+----------------
+A single background thread that loads and owns the LLaMA model. Every
+completion goes through its bounded queue, so concurrent requests never
+touch the (non thread-safe) llama instance at the same time, and callers
+get an immediate QueueFullError instead of piling up until they time out.
+
+Usage:
+    from app.services.inference_worker import InferenceWorker, QueueFullError
+
+    worker = InferenceWorker(model_loader, max_queue=8)
+    output = worker.complete(prompt, max_tokens=1400)
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Iterator, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when work is rejected because a bounded queue is full."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Queue marker asking the worker to load the model ahead of any request
+_LOAD = object()
+
+
+class _StreamSink:
+    """Hands streamed chunks from the worker thread to the caller."""
+
+    _DONE = object()
+
+    def __init__(self):
+        self.chunks: "queue.Queue" = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def drain(self, chunks) -> None:
+        """Runs on the worker thread: forward chunks until done or cancelled."""
+        try:
+            for chunk in chunks:
+                if self.cancelled.is_set():
+                    break
+                self.chunks.put(chunk)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            self.chunks.put(self._DONE)
+
+    def iterate(self, future: Future) -> Iterator[dict]:
+        try:
+            while True:
+                try:
+                    chunk = self.chunks.get(timeout=0.5)
+                except queue.Empty:
+                    # Worker failed (or the request was cancelled) before draining
+                    if future.done() and self.chunks.empty():
+                        future.result()
+                        return
+                    continue
+                if chunk is self._DONE:
+                    future.result()  # re-raise a mid-stream model error
+                    return
+                yield chunk
+        finally:
+            self.cancelled.set()
+            future.cancel()
+
+
+class InferenceWorker:
+    """Serializes all model calls onto one dedicated thread."""
+
+    def __init__(
+        self,
+        loader,
+        max_queue: int = 8,
+        name: str = "inference-worker",
+        prefix_cache_factory: Optional[Callable] = None,
+        warmup: bool = False,
+        cpu_affinity: Optional[set] = None,
+    ):
+        # ModelLoader; the model is loaded on this worker's own thread
+        self.loader = loader
+        self.model = None
+        # Optional model -> PrefixStateCache, primed on the worker thread too
+        self.prefix_cache_factory = prefix_cache_factory
+        self.prefix_cache = None
+        self.warmup = warmup
+        # CPU cores for this worker thread (and the llama threads it spawns)
+        self.cpu_affinity = cpu_affinity
+        self.max_queue = max_queue
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._busy = False
+        # Exponential moving average of seconds per completion (for Retry-After)
+        self.avg_seconds = 20.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def retry_after(self) -> int:
+        """Rough seconds until a new request could be picked up."""
+        return max(1, math.ceil(self.pending * self.avg_seconds))
+
+    def submit(self, prompt: str, **kwargs) -> Future:
+        """Queue a completion and return a Future for its output."""
+        return self._enqueue(prompt, kwargs, None)
+
+    def _enqueue(self, prompt: str, kwargs: dict, sink: Optional["_StreamSink"]) -> Future:
+        if not self.loader.available():
+            raise RuntimeError("LLaMA model is not loaded.")
+        if self._stopping.is_set():
+            raise RuntimeError("Inference worker is shutting down.")
+
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((future, prompt, kwargs, sink))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError("Inference queue is full, try again later.", self.retry_after())
+        return future
+
+    def complete(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> dict:
+        """Submit a completion and block until it finishes."""
+        future = self.submit(prompt, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Drop it if it never started; a running call can't be interrupted
+            future.cancel()
+            raise
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[dict]:
+        """
+        Queue a streamed completion (llama_cpp stream=True).
+
+        The request is queued immediately (so QueueFullError is raised
+        here, not on first iteration) and the returned iterator yields
+        the model's chunks as the worker produces them. Closing the
+        iterator early stops generation after the current token.
+        """
+        sink = _StreamSink()
+        future = self._enqueue(prompt, dict(kwargs, stream=True), sink)
+        return sink.iterate(future)
+
+    def _prime(self, prompt: Optional[str] = None) -> None:
+        """Load the cached prompt-prefix state (never fails a request)."""
+        if self.prefix_cache is None:
+            return
+        try:
+            if prompt is None:
+                self.prefix_cache.warm()
+            else:
+                self.prefix_cache.prepare(prompt)
+        except Exception as e:
+            print("⚠️ Prompt prefix cache unavailable:", e)
+            self.prefix_cache = None
+
+    def preload(self) -> None:
+        """Ask the worker thread to load the model now (non-blocking)."""
+        try:
+            self._queue.put_nowait(_LOAD)
+        except queue.Full:
+            # Queued generations will load the model first anyway
+            pass
+
+    def _ensure_model(self):
+        """Load the model (and its prefix cache / warmup) on first use."""
+        if self.model is None:
+            self.model = self.loader.load()
+            if self.model is None:
+                raise RuntimeError(f"LLaMA model is not loaded: {self.loader.error}")
+            if self.prefix_cache_factory is not None:
+                self.prefix_cache = self.prefix_cache_factory(self.model)
+            if self.warmup:
+                self.loader.warmup()
+            self._prime()
+        return self.model
+
+    @property
+    def pending(self) -> int:
+        """Queued + running requests (used for least-busy routing)."""
+        return self.queue_depth + (1 if self._busy else 0)
+
+    def _pin(self) -> None:
+        if not self.cpu_affinity:
+            return
+        try:
+            # pid 0 = the calling thread on Linux; threads it creates inherit the mask
+            os.sched_setaffinity(0, self.cpu_affinity)
+        except (AttributeError, OSError) as e:
+            print("⚠️ Could not pin inference worker to cores:", e)
+
+    def _run(self) -> None:
+        self._pin()
+        if self.loader.state == "ready":
+            self._ensure_model()
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if item is _LOAD:
+                try:
+                    self._ensure_model()
+                except RuntimeError:
+                    pass
+                continue
+            future, prompt, kwargs, sink = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self._busy = True
+            started = time.perf_counter()
+            try:
+                self._ensure_model()
+                self._prime(prompt)
+                result = self.model(prompt, **kwargs)
+                if sink is not None:
+                    result = sink.drain(result)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                future.set_exception(e)
+            else:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.completed += 1
+                    self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+                future.set_result(result)
+            finally:
+                self._busy = False
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Fail the queued requests (so their callers return at once), let
+        the running one finish, then stop the worker thread. Never blocks
+        longer than timeout, even with a full queue.
+        """
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None or item is _LOAD:
+                continue
+            future = item[0]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Inference worker is shutting down."))
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model_state": self.loader.state,
+                "cpu_affinity": sorted(self.cpu_affinity) if self.cpu_affinity else None,
+                "busy": self._busy,
+                "queue_depth": self.queue_depth,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_seconds": round(self.avg_seconds, 3),
+                "prefix_cache": self.prefix_cache.stats() if self.prefix_cache is not None else None,
+            }
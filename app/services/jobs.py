@@ -0,0 +1,136 @@
+"""
+Plan Job Service
+----------------
+Runs slow plan generations in the background so the HTTP request can
+return a job id right away. Clients poll the job until it is done.
+
+The number of pending jobs is bounded; when it is reached, submit()
+raises QueueFullError and the route answers 429 with Retry-After.
+Finished jobs are kept for a limited time, then forgotten. wait() lets
+a request block on a job for a bounded time (see PLAN_DEADLINE_SECONDS).
+
+Usage:
+    from app.services.jobs import job_store
+
+    job = job_store.submit(generate_plan, age, height_cm, ...)
+    job_store.get(job["job_id"])
+    job_store.wait(job["job_id"], timeout=2.0)   # state may still be running
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from app import config
+from app.services.inference_worker import QueueFullError
+
+
+class JobStore:
+    """In-memory registry of background jobs and their results."""
+
+    def __init__(self, workers: int, max_pending: int, result_ttl: float):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-job")
+        self._jobs: dict = {}
+        self._futures: dict = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    def _pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["state"] in ("queued", "running"))
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
+
+    def submit(self, fn: Callable, *args, retry_after: int = 5, **kwargs) -> dict:
+        """Schedule fn(*args, **kwargs) and return the new job's public view."""
+        with self._lock:
+            self._purge_expired()
+            if self._pending() >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError("Too many pending plan jobs, try again later.", retry_after)
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "state": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "error_type": None,
+            }
+            self._jobs[job_id] = job
+            self.submitted += 1
+
+        future = self._executor.submit(self._run, job, fn, args, kwargs)
+        with self._lock:
+            self._futures[job_id] = future
+        return self._view(job)
+
+    def _run(self, job: dict, fn: Callable, args: tuple, kwargs: dict) -> None:
+        job["state"] = "running"
+        job["started_at"] = time.time()
+        try:
+            job["result"] = fn(*args, **kwargs)
+            job["state"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["error_type"] = type(e).__name__
+            job["state"] = "failed"
+        finally:
+            job["finished_at"] = time.time()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return self._view(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Block until the job finishes or timeout seconds pass, then return its view."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            wait([future], timeout=timeout)
+        return self.get(job_id)
+
+    @staticmethod
+    def _view(job: dict) -> dict:
+        return dict(job)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        # Jobs that never started won't run now: don't leave them "queued"
+        with self._lock:
+            now = time.time()
+            for job in self._jobs.values():
+                if job["state"] == "queued":
+                    job["state"] = "failed"
+                    job["error"] = "Server shutting down."
+                    job["finished_at"] = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._pending(),
+                "max_pending": self.max_pending,
+                "tracked": len(self._jobs),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
+
+
+job_store = JobStore(config.JOB_WORKERS, config.JOB_MAX_PENDING, config.JOB_RESULT_TTL)
@@ -0,0 +1,310 @@
+"""
+LLaMA Runtime Settings
+----------------------
+One place for the llama_cpp runtime parameters that used to be
+hardcoded: context size, batch size, threads, mmap/mlock and the
+completion token limit.
+
+Each value comes from, in order of precedence:
+    1. its environment variable (LLM_N_CTX, LLM_N_BATCH, ...)
+    2. the JSON file at LLM_SETTINGS_PATH
+    3. the autotune cache (threads and batch only, LLM_AUTOTUNE=cached|force)
+    4. the built-in default
+
+Autotune microbenchmarks prompt evaluation and generation on this host
+for candidate thread counts and batch sizes (within one instance's
+share of the cores, one model load per candidate) and caches the
+winners in LLM_AUTOTUNE_PATH, keyed by a host + model fingerprint, so
+later starts reuse them. It runs on the first model load when the cache
+is missing or stale, or ahead of time with the CLI.
+
+Usage:
+    from app.services.llama_settings import load_settings, tuned_settings
+
+    load_settings().max_tokens           # no benchmarking, safe at import time
+    Llama(**tuned_settings().llama_kwargs(n_threads=4))
+
+    python -m app.services.llama_settings --show
+    python -m app.services.llama_settings --autotune
+"""
+
+import argparse
+import json
+import os
+import platform
+import threading
+import time
+from typing import Optional
+
+from app import config
+
+# Name -> (type, built-in default). n_threads None = LLM_TOTAL_THREADS
+# split across instances; max_tokens None = the output mode's default
+FIELDS = {
+    "n_ctx": (int, 2048),
+    "n_batch": (int, 512),
+    "n_threads": (int, None),
+    "n_threads_batch": (int, None),
+    "use_mmap": (bool, True),
+    "use_mlock": (bool, False),
+    "max_tokens": (int, None),
+}
+ENV_VALUES = {
+    "n_ctx": "LLM_N_CTX",
+    "n_batch": "LLM_N_BATCH",
+    "n_threads": "LLM_THREADS",
+    "n_threads_batch": "LLM_THREADS_BATCH",
+    "use_mmap": "LLM_USE_MMAP",
+    "use_mlock": "LLM_USE_MLOCK",
+    "max_tokens": "LLM_MAX_TOKENS",
+}
+TUNED_FIELDS = ("n_threads", "n_threads_batch", "n_batch")
+AUTOTUNE_MODES = ("off", "cached", "force")
+
+BATCH_CANDIDATES = (128, 256, 512, 1024)
+GENERATION_TOKENS = 32
+
+
+class LlamaSettings:
+    """Resolved runtime parameters, plus where each one came from."""
+
+    def __init__(self):
+        self.sources = {}
+        for name, (_, default) in FIELDS.items():
+            setattr(self, name, default)
+            self.sources[name] = "default"
+
+    def update(self, values: dict, source: str) -> None:
+        for name, value in values.items():
+            if name not in FIELDS:
+                raise ValueError(f"Unknown LLaMA setting '{name}'. Must be: {', '.join(FIELDS)}.")
+            if value is None:
+                continue
+            kind = FIELDS[name][0]
+            if kind is bool and isinstance(value, str):
+                value = value.strip().lower() in ("1", "true", "yes", "on")
+            setattr(self, name, kind(value))
+            self.sources[name] = source
+
+    def threads_for(self, split_threads: int) -> int:
+        """Per-instance n_threads: the setting, or the pool's LLM_TOTAL_THREADS split."""
+        return self.n_threads or split_threads
+
+    def llama_kwargs(self, n_threads: int) -> dict:
+        """Keyword arguments for llama_cpp.Llama()."""
+        threads = self.threads_for(n_threads)
+        return {
+            "n_ctx": self.n_ctx,
+            "n_batch": self.n_batch,
+            "n_threads": threads,
+            "n_threads_batch": self.n_threads_batch or threads,
+            "use_mmap": self.use_mmap,
+            "use_mlock": self.use_mlock,
+        }
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+def _env_values() -> dict:
+    return {name: getattr(config, env_name) for name, env_name in ENV_VALUES.items()}
+
+
+def _file_values(path: str) -> dict:
+    if not path:
+        return {}
+    with open(path) as f:
+        values = json.load(f)
+    if not isinstance(values, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    return values
+
+
+# --- Autotune ---
+def process_cores() -> int:
+    """
+    Cores the whole process may use. Asked for the main thread (pid), not
+    the caller: tuning runs on an inference worker thread that is already
+    pinned to its own instance's share (LLM_PIN_CORES).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(os.getpid()))
+    return os.cpu_count() or 1
+
+
+def host_fingerprint() -> dict:
+    """What the tuned values depend on; a different fingerprint means re-tune."""
+    try:
+        stat = os.stat(config.LLM_MODEL_PATH)
+        model = {"path": os.path.abspath(config.LLM_MODEL_PATH), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+    except OSError:
+        model = {"path": os.path.abspath(config.LLM_MODEL_PATH)}
+    try:
+        import llama_cpp
+        llama_version = llama_cpp.__version__
+    except ImportError:
+        llama_version = None
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cores": process_cores(),
+        "instances": config.LLM_INSTANCES,
+        "model": model,
+        "llama_cpp": llama_version,
+    }
+
+
+def read_autotune_cache(path: str) -> Optional[dict]:
+    """Cached tuned values if they were measured for this host and model."""
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("fingerprint") != host_fingerprint():
+        return None
+    return cached.get("settings")
+
+
+def thread_candidates(max_threads: int) -> list:
+    candidates = {t for t in (1, 2, 4, 6, 8, 12, 16, 24, 32, 48, 64) if t <= max_threads}
+    candidates.add(max_threads)
+    return sorted(candidates)
+
+
+def _benchmark(llm, tokens: list) -> dict:
+    """Prompt-eval and single-token generation throughput, in tokens/s."""
+    llm.reset()
+    started = time.perf_counter()
+    llm.eval(tokens)
+    prompt_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    token = tokens[-1]
+    for _ in range(GENERATION_TOKENS):
+        llm.eval([token])
+    generation_seconds = time.perf_counter() - started
+    return {
+        "prompt_tps": round(len(tokens) / prompt_seconds, 1),
+        "generation_tps": round(GENERATION_TOKENS / generation_seconds, 1),
+    }
+
+
+def autotune(settings: Optional["LlamaSettings"] = None, path: Optional[str] = None) -> dict:
+    """
+    Measure this host, write the cache and return the tuned values
+    (n_threads for generation, n_threads_batch for prompt eval, n_batch).
+    """
+    from llama_cpp import Llama
+
+    from app.services.plan_prompt import build_prompt
+
+    settings = settings or load_settings()
+    path = path or config.LLM_AUTOTUNE_PATH
+    fingerprint = host_fingerprint()
+    max_threads = max(1, fingerprint["cores"] // max(1, config.LLM_INSTANCES))
+    prompt = build_prompt(30, 175, 75, "male", "moderate", "maintain")
+    base = settings.llama_kwargs(max_threads)
+    started = time.perf_counter()
+    print(f"⏱️ Autotuning LLaMA on {fingerprint['cores']} cores ({max_threads} per instance)...")
+
+    def load(**overrides):
+        return Llama(model_path=config.LLM_MODEL_PATH, verbose=False, **dict(base, **overrides))
+
+    # 1️⃣ Threads: fixed at context creation (like n_batch), so one load per
+    # candidate; the weights stay mmap'd, so reloads are cheap
+    threads = {}
+    tokens = None
+    for t in thread_candidates(max_threads):
+        llm = load(n_threads=t, n_threads_batch=t)
+        if tokens is None:
+            tokens = llm.tokenize(prompt.encode("utf-8"))[: settings.n_ctx - GENERATION_TOKENS - 1]
+        threads[t] = _benchmark(llm, tokens)
+        print(f"   threads={t}: {threads[t]['prompt_tps']} prompt tok/s, {threads[t]['generation_tps']} gen tok/s")
+        del llm
+    n_threads = max(threads, key=lambda t: threads[t]["generation_tps"])
+    n_threads_batch = max(threads, key=lambda t: threads[t]["prompt_tps"])
+
+    # 2️⃣ Batch size: fixed at context creation, so one load per candidate
+    batches = {}
+    for n_batch in [b for b in BATCH_CANDIDATES if b <= settings.n_ctx]:
+        llm = load(n_threads=n_threads, n_threads_batch=n_threads_batch, n_batch=n_batch)
+        batches[n_batch] = _benchmark(llm, tokens)
+        print(f"   n_batch={n_batch}: {batches[n_batch]['prompt_tps']} prompt tok/s")
+        del llm
+    n_batch = max(batches, key=lambda b: batches[b]["prompt_tps"])
+
+    tuned = {"n_threads": n_threads, "n_threads_batch": n_threads_batch, "n_batch": n_batch}
+    report = {
+        "fingerprint": fingerprint,
+        "settings": tuned,
+        "measurements": {"threads": threads, "n_batch": batches},
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"✅ Autotuned in {report['seconds']} s: {tuned} (cached in {path})")
+    return tuned
+
+
+# --- Resolution ---
+def load_settings(tuned: Optional[dict] = None) -> LlamaSettings:
+    """Defaults < autotune cache < settings file < environment. Never benchmarks."""
+    if config.LLM_AUTOTUNE not in AUTOTUNE_MODES:
+        raise ValueError(f"Invalid LLM_AUTOTUNE. Must be: {', '.join(AUTOTUNE_MODES)}.")
+    settings = LlamaSettings()
+    if tuned is None and config.LLM_AUTOTUNE != "off":
+        tuned = read_autotune_cache(config.LLM_AUTOTUNE_PATH)
+    if tuned:
+        settings.update({name: tuned.get(name) for name in TUNED_FIELDS}, "autotune")
+    settings.update(_file_values(config.LLM_SETTINGS_PATH), "file")
+    settings.update(_env_values(), "env")
+    return settings
+
+
+_tune_lock = threading.Lock()
+_tuned: Optional[LlamaSettings] = None
+
+
+def tuned_settings() -> LlamaSettings:
+    """
+    Settings for loading a model: like load_settings(), but with
+    LLM_AUTOTUNE on it first tunes this host when the cache is missing
+    or stale ("cached") or on every start ("force"). Runs at most once
+    per process; other instances wait for it.
+    """
+    global _tuned
+    with _tune_lock:
+        if _tuned is not None:
+            return _tuned
+        tuned = None
+        if config.LLM_AUTOTUNE == "force" or (
+            config.LLM_AUTOTUNE == "cached" and read_autotune_cache(config.LLM_AUTOTUNE_PATH) is None
+        ):
+            try:
+                tuned = autotune()
+            except Exception as e:
+                print("⚠️ LLaMA autotune failed, using configured settings:", e)
+        _tuned = load_settings(tuned)
+        return _tuned
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show or autotune the LLaMA runtime settings")
+    parser.add_argument("--autotune", action="store_true", help="Benchmark this host and update the cache")
+    parser.add_argument("--show", action="store_true", help="Print the effective settings and their sources")
+    args = parser.parse_args()
+
+    tuned = autotune() if args.autotune else None
+    if args.show or not args.autotune:
+        settings = load_settings(tuned)
+        print(json.dumps({name: {"value": value, "source": settings.sources[name]}
+                          for name, value in settings.to_dict().items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Model Loader
+------------
+Loads the LLaMA model on demand instead of at import time, so workers
+that only serve /users and /plans start instantly and never map the GGUF.
+
+LLM_LOAD_MODE decides when the model is loaded:
+    - "lazy"    on the first generation request (default)
+    - "startup" in the background from the FastAPI startup hook
+    - "eager"   while app.services.ai_model is imported (old behaviour)
+
+Each model instance in the inference pool has its own ModelLoader. The
+load runs on that instance's worker thread (or the importing thread for
+"eager"); this module only tracks its state. A failed load is retried
+by the next load() once its cooldown (LLM_LOAD_RETRY_SECONDS, doubled
+per consecutive failure) is over.
+
+Usage:
+    from app.services.model_loader import ModelLoader
+
+    loader = ModelLoader(n_threads=4)
+    llm = loader.load()        # blocks until loaded (None if it failed)
+    loader.status()            # for /health/ready
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from app import config
+
+
+def create_llama(n_threads: int = 4):
+    """
+    Default factory: the real llama_cpp model, with the runtime settings
+    from app.services.llama_settings (see LLM_SPECULATIVE for drafts).
+    """
+    from llama_cpp import Llama
+
+    from app.services.llama_settings import tuned_settings
+    from app.services.speculative import build_draft_model
+
+    # With use_mmap (the default) the weights are mapped read-only: every
+    # instance (and forked worker) shares the same page-cache pages
+    kwargs = tuned_settings().llama_kwargs(n_threads)
+    return Llama(
+        model_path=config.LLM_MODEL_PATH,
+        **kwargs,
+        draft_model=build_draft_model(n_threads=kwargs["n_threads"])
+    )
+
+
+class ModelLoader:
+    """Thread-safe holder for one model instance and its load state."""
+
+    def __init__(self, factory: Callable = create_llama, **model_kwargs):
+        self._factory = factory
+        self.model_kwargs = model_kwargs
+        self._lock = threading.Lock()
+        self.model = None
+        self.state = "not_loaded"   # not_loaded | loading | ready | failed
+        self.error: Optional[str] = None
+        self.failures = 0
+        self._retry_at = 0.0
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+    def set_factory(self, factory: Callable) -> None:
+        """Swap the model factory (e.g. a fake model for benchmarks)."""
+        with self._lock:
+            self._factory = factory
+            self.model = None
+            self.state = "not_loaded"
+            self.error = None
+            self.failures = 0
+
+    def retry_in(self) -> float:
+        """Seconds until a failed load may be retried (0 = now or not failed)."""
+        if self.state != "failed":
+            return 0.0
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def available(self) -> bool:
+        """False while a failed load is still cooling down."""
+        return self.state != "failed" or self.retry_in() == 0
+
+    def load(self):
+        """Load the model if needed and return it (None if loading failed)."""
+        with self._lock:
+            if self.state == "ready" or not self.available():
+                return self.model
+
+            self.state = "loading"
+            started = time.perf_counter()
+            try:
+                self.model = self._factory(**self.model_kwargs)
+                self.state = "ready"
+                self.error = None
+                self.failures = 0
+                print("✅ LLaMA model loaded successfully.")
+            except Exception as e:
+                self.model = None
+                self.error = str(e)
+                self.state = "failed"
+                self.failures += 1
+                cooldown = min(
+                    config.LLM_LOAD_RETRY_SECONDS * 2 ** (self.failures - 1),
+                    config.LLM_LOAD_RETRY_MAX_SECONDS,
+                )
+                self._retry_at = time.monotonic() + cooldown
+                print(f"❌ Failed to load LLaMA model (retrying in {cooldown:.0f}s):", e)
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            return self.model
+
+    def warmup(self) -> None:
+        """Run one tiny generation so the first real request isn't the slow one."""
+        if self.model is None:
+            return
+        started = time.perf_counter()
+        try:
+            self.model("Hello", max_tokens=8, temperature=0.0)
+        except Exception as e:
+            print("⚠️ LLaMA warmup failed:", e)
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            **self.model_kwargs,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "failures": self.failures,
+            "retry_in_seconds": round(self.retry_in(), 1),
+        }
+
@@ -0,0 +1,178 @@
+"""
+Inference Pool
+--------------
+Runs N independent model instances, each on its own InferenceWorker
+thread with n_threads = LLM_TOTAL_THREADS // LLM_INSTANCES, so a
+many-core host generates several plans at once instead of one.
+
+- Requests go to the least busy instance (queued + running). If its
+  queue is full, the next one is tried, and QueueFullError is raised only
+  when every instance is full.
+- LLM_PIN_CORES gives each instance its own disjoint set of cores.
+- Weights are mmap'd (see create_llama), so all instances, and forked
+  uvicorn workers, share one copy of the GGUF in the page cache. Each
+  instance only adds its own KV cache.
+
+llama_cpp releases the GIL while it evaluates, so threads are enough to
+keep all instances busy.
+
+Usage:
+    from app.services.model_pool import build_inference_pool
+
+    pool = build_inference_pool()
+    pool.complete(prompt, max_tokens=1400)
+"""
+
+import itertools
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Iterator, List, Optional
+
+from app import config
+from app.services.inference_worker import InferenceWorker, QueueFullError
+from app.services.model_loader import ModelLoader, create_llama
+
+
+def partition_cores(instances: int, cores: Optional[List[int]] = None) -> List[set]:
+    """Split the available cores into `instances` disjoint, contiguous sets."""
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    per_instance = max(1, len(cores) // instances)
+    return [
+        set(cores[i * per_instance:(i + 1) * per_instance]) or {cores[i % len(cores)]}
+        for i in range(instances)
+    ]
+
+
+class InferencePool:
+    """Least-busy router over several InferenceWorkers."""
+
+    def __init__(self, workers: List[InferenceWorker]):
+        self.workers = workers
+        self._rotation = itertools.cycle(range(len(workers)))
+        self._lock = threading.Lock()
+
+    def _by_load(self) -> List[InferenceWorker]:
+        # Rotate the starting point so equally idle instances share the work
+        with self._lock:
+            start = next(self._rotation)
+        ordered = self.workers[start:] + self.workers[:start]
+        return sorted(ordered, key=lambda worker: worker.pending)
+
+    def _dispatch(self, call: Callable):
+        retry_after = None
+        for worker in self._by_load():
+            try:
+                return call(worker)
+            except QueueFullError as e:
+                retry_after = e.retry_after if retry_after is None else min(retry_after, e.retry_after)
+        raise QueueFullError("Inference queue is full, try again later.", retry_after or 1)
+
+    def submit(self, prompt: str, **kwargs) -> Future:
+        return self._dispatch(lambda worker: worker.submit(prompt, **kwargs))
+
+    def complete(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> dict:
+        future = self.submit(prompt, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[dict]:
+        return self._dispatch(lambda worker: worker.stream(prompt, **kwargs))
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(worker.queue_depth for worker in self.workers)
+
+    def retry_after(self) -> int:
+        return min(worker.retry_after() for worker in self.workers)
+
+    def available(self) -> bool:
+        return any(worker.loader.available() for worker in self.workers)
+
+    def load_now(self) -> None:
+        """Load every instance on the calling thread (eager mode)."""
+        for worker in self.workers:
+            worker.loader.load()
+
+    def preload(self) -> None:
+        """Ask every instance to load in the background."""
+        for worker in self.workers:
+            worker.preload()
+
+    def retry_failed(self) -> None:
+        """Reload, in the background, instances whose failed load may be retried."""
+        for worker in self.workers:
+            if worker.loader.state == "failed" and worker.loader.available():
+                worker.preload()
+
+    def set_model_factory(self, factory: Callable) -> None:
+        """Use another model factory (e.g. a fake model in benchmarks)."""
+        for worker in self.workers:
+            worker.loader.set_factory(factory)
+            worker.model = None
+            worker.prefix_cache = None
+
+    def model_status(self) -> dict:
+        """Aggregated load state for /health/ready."""
+        instances = [worker.loader.status() for worker in self.workers]
+        states = {instance["state"] for instance in instances}
+        if len(states) == 1:
+            state = states.pop()
+        elif "ready" in states:
+            state = "ready"
+        elif "loading" in states:
+            state = "loading"
+        else:
+            state = "not_loaded"
+
+        return {
+            "state": state,
+            "load_mode": config.LLM_LOAD_MODE,
+            "speculative": config.LLM_SPECULATIVE,
+            "autotune": config.LLM_AUTOTUNE,
+            "model_path": config.LLM_MODEL_PATH,
+            "model_file_present": os.path.exists(config.LLM_MODEL_PATH),
+            "instances": instances,
+        }
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def stats(self) -> dict:
+        workers = [worker.stats() for worker in self.workers]
+        return {
+            "instances": len(workers),
+            "queue_depth": sum(w["queue_depth"] for w in workers),
+            "completed": sum(w["completed"] for w in workers),
+            "failed": sum(w["failed"] for w in workers),
+            "rejected": sum(w["rejected"] for w in workers),
+            "workers": workers,
+        }
+
+
+def build_inference_pool(
+    prefix_cache_factory: Optional[Callable] = None,
+    factory: Callable = create_llama,
+) -> InferencePool:
+    """Pool sized from config: LLM_INSTANCES x (LLM_TOTAL_THREADS / LLM_INSTANCES)."""
+    instances = max(1, config.LLM_INSTANCES)
+    n_threads = max(1, config.LLM_TOTAL_THREADS // instances)
+    core_sets = partition_cores(instances) if config.LLM_PIN_CORES else [None] * instances
+
+    workers = [
+        InferenceWorker(
+            ModelLoader(factory, n_threads=n_threads),
+            max_queue=config.INFERENCE_QUEUE_SIZE,
+            name=f"inference-worker-{i}",
+            prefix_cache_factory=prefix_cache_factory,
+            warmup=config.LLM_WARMUP,
+            cpu_affinity=core_sets[i],
+        )
+        for i in range(instances)
+    ]
+    return InferencePool(workers)
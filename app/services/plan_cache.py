@@ -0,0 +1,236 @@
+"""
+Plan Cache Service
+------------------
+Caches the model-generated part of a plan (meal_plan + workout_plan)
+keyed on a normalized user profile, so repeated profiles skip inference.
+
+Two tiers:
+    1. In-process LRU with TTL (per worker, fastest).
+    2. Optional SQLite file shared by every worker on the host. An entry
+       keeps the expiry it was written with (a disk hit doesn't extend
+       it), and expired rows are deleted on read and periodically on write.
+
+Macros are never cached: they are cheap and always recomputed exactly,
+which is what makes bucketed keys safe.
+
+Usage:
+    from app.services.plan_cache import plan_cache, profile_key
+
+    key = profile_key(age, height_cm, weight_kg, gender, activity_level, goal)
+    ideas = plan_cache.get(key)
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app import config
+
+
+def _bucket(value: float, step: float) -> float:
+    """Snap a value to the nearest multiple of step (step <= 0 keeps it)."""
+    if step and step > 0:
+        return round(round(value / step) * step, 1)
+    return round(value, 1)
+
+
+def profile_key(
+    age: int,
+    height_cm: float,
+    weight_kg: float,
+    gender: str,
+    activity_level: str,
+    goal: str,
+    age_step: Optional[int] = None,
+    height_step: Optional[float] = None,
+    weight_step: Optional[float] = None,
+) -> str:
+    """
+    Build a stable cache key from a user profile.
+
+    Strings are lower-cased and numbers are rounded (or bucketed when a
+    step is configured), so equivalent profiles map to the same key.
+    """
+    age_step = config.PLAN_CACHE_BUCKET_AGE if age_step is None else age_step
+    height_step = config.PLAN_CACHE_BUCKET_HEIGHT if height_step is None else height_step
+    weight_step = config.PLAN_CACHE_BUCKET_WEIGHT if weight_step is None else weight_step
+
+    return "|".join([
+        str(int(_bucket(age, age_step))),
+        f"{_bucket(height_cm, height_step):.1f}",
+        f"{_bucket(weight_kg, weight_step):.1f}",
+        gender.strip().lower(),
+        activity_level.strip().lower(),
+        goal.strip().lower(),
+    ])
+
+
+class DiskPlanCache:
+    """SQLite-backed tier that several uvicorn workers can share."""
+
+    # Writes between sweeps of expired rows
+    PURGE_EVERY = 100
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plan_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[dict, Optional[float]]]:
+        """(value, expires_at as a time.time() timestamp or None), or None if missing / expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM plan_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] < now:
+                self._conn.execute("DELETE FROM plan_cache WHERE cache_key = ? AND expires_at < ?", (key, now))
+                self._conn.commit()
+                return None
+        if row is None:
+            return None
+        value, expires_at = row
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: dict) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM plan_cache WHERE expires_at < ?", (now,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM plan_cache")
+            self._conn.commit()
+
+
+class PlanCache:
+    """Bounded LRU with TTL in front of an optional shared disk tier."""
+
+    def __init__(self, max_size: int, ttl: float, disk: Optional[DiskPlanCache] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk = disk
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._items[key]
+
+        if self.disk is not None:
+            try:
+                entry = self.disk.get(key)
+            except sqlite3.Error as e:
+                print("⚠️ Plan cache disk read failed:", e)
+                entry = None
+            if entry is not None:
+                value, disk_expires_at = entry
+                # Promote with the remaining lifetime, not a fresh TTL
+                expires_at = None if disk_expires_at is None else now + (disk_expires_at - time.time())
+                self._store(key, value, expires_at)
+                with self._lock:
+                    self.disk_hits += 1
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        self._store(key, copy.deepcopy(value), expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                print("⚠️ Plan cache disk write failed:", e)
+
+    def _store(self, key: str, value: dict, expires_at: Optional[float]) -> None:
+        """expires_at is a time.monotonic() deadline (None = never)."""
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "disk_tier": self.disk is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _build_default_cache() -> PlanCache:
+    disk = None
+    if config.PLAN_CACHE_SIZE > 0 and config.PLAN_CACHE_PATH:
+        try:
+            disk = DiskPlanCache(config.PLAN_CACHE_PATH, config.PLAN_CACHE_TTL)
+        except sqlite3.Error as e:
+            print("⚠️ Plan cache disk tier disabled:", e)
+    return PlanCache(config.PLAN_CACHE_SIZE, config.PLAN_CACHE_TTL, disk)
+
+
+plan_cache = _build_default_cache()
@@ -0,0 +1,148 @@
+"""
+Compact Plan Codes
+------------------
+Compact output mode (LLM_OUTPUT_MODE=compact). Instead of writing the
+whole plan JSON, the model writes one short line per day. The line holds
+codes from the meal catalog (app.services.nutrition.MEAL_CATALOG) and the
+exercise catalog (app.services.workout.EXERCISE_CATALOG):
+
+    BEGIN_PLAN
+    1: B2 L1 D4 | E1 E3 E5 E19
+    2: B5 L3 D1 | E2 E4 E17
+    ...
+    7: B1 L6 D2 | E16 E20 E23
+    END_PLAN
+
+Meal codes are the meal time letter plus the position in that meal
+time's list (B = breakfast, L = lunch, D = dinner, S = snack). Exercise
+codes are E plus the catalog position. The server expands the codes into
+the usual meal_plan / workout_plan shape, so responses don't change. A
+plan is roughly a tenth of the output tokens of the JSON format. The
+catalog listing makes the prompt longer, but it is part of the static
+prefix that the prefix cache evaluates once.
+
+Usage:
+    from app.services.plan_codes import expand_plan, CompactPlanParser
+
+    ideas = expand_plan(completion_text)   # None if no day line parsed
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from app.services.nutrition import MEAL_CATALOG
+from app.services.workout import EXERCISE_CATALOG
+
+START_MARKER = "BEGIN_PLAN"
+END_MARKER = "END_PLAN"
+DAYS = 7
+
+MEAL_LETTERS = {"breakfast": "B", "lunch": "L", "dinner": "D", "snack": "S"}
+MEAL_TIMES_BY_LETTER = {letter: meal_time for meal_time, letter in MEAL_LETTERS.items()}
+
+_DAY_LINE = re.compile(r"^\s*(\d+)\s*:(.*?)\|(.*)$")
+_MEAL_CODE = re.compile(r"\b([BLDS])(\d+)\b")
+_EXERCISE_CODE = re.compile(r"\bE(\d+)\b")
+
+
+def _exercise_text(exercise: dict) -> str:
+    amount = exercise.get("reps") or exercise.get("duration")
+    return f'{exercise["name"]} {exercise["sets"]}x{amount}'
+
+
+def catalog_prompt() -> str:
+    """Catalog listing for the prompt, one "CODE description" per line."""
+    lines = ["MEALS:"]
+    for meal_time, letter in MEAL_LETTERS.items():
+        lines += [f"{letter}{i} {food}" for i, food in enumerate(MEAL_CATALOG[meal_time], start=1)]
+    lines.append("EXERCISES:")
+    lines += [f"E{i} {_exercise_text(e)}" for i, e in enumerate(EXERCISE_CATALOG, start=1)]
+    return "\n".join(lines)
+
+
+def expand_day(line: str) -> Optional[Tuple[dict, dict]]:
+    """(meal day, workout day) for one "N: meals | exercises" line, or None."""
+    match = _DAY_LINE.match(line)
+    if match is None:
+        return None
+    day = int(match.group(1))
+
+    meals = []
+    for letter, number in _MEAL_CODE.findall(match.group(2)):
+        meal_time = MEAL_TIMES_BY_LETTER[letter]
+        foods = MEAL_CATALOG[meal_time]
+        if 1 <= int(number) <= len(foods):
+            meals.append({"meal_time": meal_time, "food": foods[int(number) - 1]})
+
+    exercises = [
+        dict(EXERCISE_CATALOG[int(number) - 1])
+        for number in _EXERCISE_CODE.findall(match.group(3))
+        if 1 <= int(number) <= len(EXERCISE_CATALOG)
+    ]
+
+    if not meals or not exercises:
+        return None
+    return {"day": day, "meals": meals}, {"day": day, "exercises": exercises}
+
+
+class CompactPlanParser:
+    """
+    Streaming parser for compact output, with the same interface as
+    IncrementalPlanParser: feed() returns the days completed by each
+    chunk (a day is complete at the end of its line).
+    """
+
+    def __init__(self):
+        self.days = {"meal_plan": [], "workout_plan": []}
+        self.finished = False
+        self._started = False
+        self._buffer = ""
+        self._seen = set()
+
+    def feed(self, text: str) -> List[Tuple[str, dict]]:
+        if self.finished or not text:
+            return []
+        self._buffer += text
+        completed = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            completed += self._line(line)
+            if self.finished:
+                break
+        if not self.finished and self._started and END_MARKER in self._buffer:
+            # The end marker is the last thing generated, with no newline after it
+            self.finished = True
+        return completed
+
+    def _line(self, line: str) -> List[Tuple[str, dict]]:
+        if not self._started:
+            self._started = START_MARKER in line
+            return []
+        if END_MARKER in line:
+            self.finished = True
+            return []
+
+        parsed = expand_day(line)
+        if parsed is None or parsed[0]["day"] in self._seen:
+            return []
+        self._seen.add(parsed[0]["day"])
+        meal_day, workout_day = parsed
+        self.days["meal_plan"].append(meal_day)
+        self.days["workout_plan"].append(workout_day)
+        return [("meal_plan", meal_day), ("workout_plan", workout_day)]
+
+    def result(self) -> Optional[dict]:
+        """The expanded plan (None if no day line parsed)."""
+        if not self.days["meal_plan"]:
+            return None
+        return {section: list(days) for section, days in self.days.items()}
+
+
+def expand_plan(text: str) -> Optional[dict]:
+    """Expand a whole compact completion into meal_plan / workout_plan."""
+    parser = CompactPlanParser()
+    if START_MARKER not in text:
+        # Tolerate a missing start marker: treat every line as a candidate
+        parser._started = True
+    parser.feed(text + "\n")
+    return parser.result()
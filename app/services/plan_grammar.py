@@ -0,0 +1,148 @@
+"""
+Plan Grammar
+------------
+GBNF grammar for constrained decoding of AI plans. It only admits the
+exact output format generate_plan() parses:
+
+    BEGIN_JSON
+    {"meal_plan": [7 days], "workout_plan": [7 days]}
+    END_JSON
+
+with days numbered 1-7, a fixed number of meals per day (3, or 4 when
+gaining), 3-5 exercises per day and known meal_time values. Because
+llama.cpp can only sample tokens the grammar allows, the output always
+parses on the first pass.
+
+Usage:
+    from app.services.plan_grammar import get_plan_grammar
+
+    grammar = get_plan_grammar(meals_per_day=3)   # None if unsupported
+    llm(prompt, grammar=grammar)
+"""
+
+from functools import lru_cache
+from typing import Optional, Tuple
+
+MEAL_TIMES = ("breakfast", "lunch", "dinner", "snack")
+DAYS = 7
+ALL_DAYS = tuple(range(1, DAYS + 1))
+MIN_EXERCISES = 3
+MAX_EXERCISES = 5
+
+
+def _literal(text: str) -> str:
+    """GBNF literal for text (quotes and backslashes escaped)."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _key(name: str) -> str:
+    return _literal(f'"{name}":') + " ws"
+
+
+def _sep() -> str:
+    return '"," ws'
+
+
+def meals_per_day_for(goal: str) -> int:
+    """Meals per day the prompt asks for (4 when gaining, else 3)."""
+    return 4 if goal == "gain" else 3
+
+
+def build_plan_grammar(meals_per_day: int, days: Optional[Tuple[int, ...]] = None) -> str:
+    """
+    Return the GBNF source for a plan with the given meals per day, for
+    days 1-7 or only the given days (continuations of truncated output).
+    """
+    days = days or ALL_DAYS
+    meals = f" {_sep()} ".join(["meal"] * meals_per_day)
+    required = f" {_sep()} ".join(["exercise"] * MIN_EXERCISES)
+    optional = f"( {_sep()} exercise )?" * (MAX_EXERCISES - MIN_EXERCISES)
+
+    rules = [
+        f'root ::= {_literal("BEGIN_JSON" + chr(10))} plan {_literal(chr(10) + "END_JSON")}',
+        "plan ::= \"{\" ws "
+        + _key("meal_plan") + ' "[" ws '
+        + f" {_sep()} ".join(f"meal-day-{d}" for d in days)
+        + ' ws "]" ' + _sep() + " "
+        + _key("workout_plan") + ' "[" ws '
+        + f" {_sep()} ".join(f"workout-day-{d}" for d in days)
+        + ' ws "]" ws "}"',
+    ]
+    for d in days:
+        rules.append(
+            f'meal-day-{d} ::= "{{" ws {_key("day")} "{d}" {_sep()} '
+            f'{_key("meals")} "[" ws {meals} ws "]" ws "}}"'
+        )
+        rules.append(
+            f'workout-day-{d} ::= "{{" ws {_key("day")} "{d}" {_sep()} '
+            f'{_key("exercises")} "[" ws {required} {optional} ws "]" ws "}}"'
+        )
+
+    meal_times = " | ".join(_literal(f'"{t}"') for t in MEAL_TIMES)
+    rules += [
+        f'meal ::= "{{" ws {_key("meal_time")} meal-time {_sep()} {_key("food")} string ws "}}"',
+        f"meal-time ::= {meal_times}",
+        f'exercise ::= "{{" ws {_key("name")} string {_sep()} {_key("sets")} [1-9] {_sep()} '
+        f'{_key("reps")} string ws "}}"',
+        'string ::= "\\"" char char* "\\""',
+        'char ::= [^"\\\\\\x00-\\x1f] | "\\\\" ["\\\\/bfnrt]',
+        'ws ::= " "?',
+    ]
+    return "\n".join(rules) + "\n"
+
+
+def build_compact_grammar(meals_per_day: int, days: Optional[Tuple[int, ...]] = None) -> str:
+    """
+    GBNF source for compact output (see app.services.plan_codes): one
+    "N: <meal codes> | <exercise codes>" line per day, with one code per
+    meal time in order and only codes that exist in the catalogs.
+    """
+    days = days or ALL_DAYS
+    from app.services.nutrition import MEAL_CATALOG
+    from app.services.plan_codes import END_MARKER, MEAL_LETTERS, START_MARKER
+    from app.services.workout import EXERCISE_CATALOG
+
+    meal_times = list(MEAL_LETTERS)[:meals_per_day]
+    meals = ' " " '.join(f"{t}-code" for t in meal_times)
+    optional = '( " " exercise-code )?' * (MAX_EXERCISES - MIN_EXERCISES)
+
+    rules = [
+        f"root ::= {_literal(START_MARKER + chr(10))} "
+        + " ".join(f'day-{d} "\\n"' for d in days)
+        + f" {_literal(END_MARKER)}",
+    ]
+    for d in days:
+        rules.append(
+            f'day-{d} ::= "{d}: " {meals} " |" '
+            + ' " " exercise-code' * MIN_EXERCISES + f" {optional}"
+        )
+    for meal_time in meal_times:
+        codes = " | ".join(
+            _literal(f"{MEAL_LETTERS[meal_time]}{i}") for i in range(1, len(MEAL_CATALOG[meal_time]) + 1)
+        )
+        rules.append(f"{meal_time}-code ::= {codes}")
+    rules.append(
+        "exercise-code ::= " + " | ".join(_literal(f"E{i}") for i in range(1, len(EXERCISE_CATALOG) + 1))
+    )
+    return "\n".join(rules) + "\n"
+
+
+@lru_cache(maxsize=None)
+def get_plan_grammar(meals_per_day: int, compact: bool = False, days: Optional[Tuple[int, ...]] = None):
+    """
+    Compiled LlamaGrammar for the plan format (JSON or compact codes),
+    built once per meal count and day subset. Returns None when llama_cpp
+    has no grammar support.
+    """
+    try:
+        from llama_cpp import LlamaGrammar
+    except ImportError:
+        return None
+
+    try:
+        build = build_compact_grammar if compact else build_plan_grammar
+        source = build(meals_per_day, days)
+        return LlamaGrammar.from_string(source, verbose=False)
+    except Exception as e:
+        print("⚠️ Plan grammar could not be compiled, constrained decoding disabled:", e)
+        return None
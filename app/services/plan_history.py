@@ -0,0 +1,128 @@
+"""
+Plan History
+------------
+Compressed storage and read-back of generated plans in `model_requests`.
+
+Payloads (request_json / response_json) are stored as zlib-compressed
+JSON with a small preset dictionary of the keys and values every plan
+repeats, behind a magic prefix. decode_payload() also reads rows written
+before compression (plain JSON text), so old and new rows mix freely.
+
+History is read newest first with keyset pagination on the
+(user_id, created_at, id) index from sql/002_model_requests_history.sql,
+so a user's latest plan is a single index lookup. It is always read from
+the database (not a per-process cache), so every worker sees the same
+plan.
+
+Usage:
+    from app.services.plan_history import encode_payload, decode_payload, latest_plan, list_plans
+
+    blob = encode_payload(response_json)
+    decode_payload(blob) == response_json
+    page, next_key = list_plans(user_id, limit=20)
+    latest_plan(user_id)   # None if the user has no plans
+"""
+
+import json
+import zlib
+from typing import Optional, Tuple, Union
+
+from app import config
+from app.db import get_db_connection
+
+# v1 = zlib with ZDICT_V1. Never change a published dictionary: add a new
+# version instead, or old rows stop decoding
+MAGIC_V1 = b"GYMZ1"
+
+# Strings that appear in almost every payload (later bytes match best)
+ZDICT_V1 = (
+    '{"age": , "height_cm": , "weight_kg": , "gender": "male", "female", "other", '
+    '"activity_level": "sedentary", "light", "moderate", "active", "very_active", '
+    '"goal": "lose", "maintain", "gain", "user_id": '
+    '"macros": {"calories": , "protein_g": , "fat_g": , "carbs_g": }, "duration_weeks": 8'
+    '"sets": 3, "sets": 4, "reps": "8-12"}, {"name": "duration": "'
+    '"workout_plan": [{"day": 1, "exercises": [{"name": "'
+    '"meal_plan": [{"day": 1, "meals": [{"meal_time": "breakfast", "food": "'
+    '"}, {"meal_time": "lunch", "food": "'
+    '"}, {"meal_time": "dinner", "food": "'
+    '"}, {"meal_time": "snack", "food": "'
+    '"}]}, {"day": '
+).encode("utf-8")
+
+HISTORY_COLUMNS = "id, user_id, request_json, response_json, model_name, created_at"
+
+
+def encode_payload(data) -> bytes:
+    """Compact JSON, zlib-compressed with the v1 dictionary."""
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    compressor = zlib.compressobj(config.PLAN_HISTORY_COMPRESSION, zdict=ZDICT_V1)
+    return MAGIC_V1 + compressor.compress(raw) + compressor.flush()
+
+
+def decode_payload(value: Union[bytes, bytearray, memoryview, str, None]):
+    """Inverse of encode_payload(); plain JSON (legacy rows) is parsed as-is."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    value = bytes(value)
+    if value.startswith(MAGIC_V1):
+        decompressor = zlib.decompressobj(zdict=ZDICT_V1)
+        return json.loads(decompressor.decompress(value[len(MAGIC_V1):]) + decompressor.flush())
+    return json.loads(value.decode("utf-8"))
+
+
+def _format_timestamp(value) -> Optional[str]:
+    """MySQL returns datetimes, SQLite strings: always "YYYY-MM-DD HH:MM:SS"."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _record(row: dict) -> dict:
+    return {
+        "id": row["id"],
+        "created_at": _format_timestamp(row["created_at"]),
+        "model_name": row["model_name"],
+        "request": decode_payload(row["request_json"]),
+        "response": decode_payload(row["response_json"]),
+    }
+
+
+def list_plans(
+    user_id: int, limit: int = 20, after: Optional[Tuple[str, int]] = None
+) -> Tuple[list, Optional[Tuple[str, int]]]:
+    """
+    One page of a user's plans, newest first, and the (created_at, id)
+    key of the last row when there is a next page.
+    """
+    clauses, params = ["user_id = %s"], [user_id]
+    if after is not None:
+        created_at, last_id = after
+        # Row-value comparison spelled out so both MySQL and SQLite use the index range
+        clauses.append("(created_at < %s OR (created_at = %s AND id < %s))")
+        params += [created_at, created_at, last_id]
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        # One extra row tells us whether there is a next page
+        cursor.execute(
+            f"SELECT {HISTORY_COLUMNS} FROM model_requests WHERE {' AND '.join(clauses)} "
+            "ORDER BY created_at DESC, id DESC LIMIT %s",
+            (*params, limit + 1),
+        )
+        rows = cursor.fetchall()
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = (_format_timestamp(rows[-1]["created_at"]), rows[-1]["id"])
+    return [_record(row) for row in rows], next_key
+
+
+def latest_plan(user_id: int) -> Optional[dict]:
+    """The user's most recent plan (one index lookup), or None."""
+    plans, _ = list_plans(user_id, limit=1)
+    return plans[0] if plans else None
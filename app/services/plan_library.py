@@ -0,0 +1,333 @@
+"""
+Plan Library
+------------
+Precomputed model plans for a bounded grid of profiles, built offline and
+served from a memory-mapped file, so most /ai/generate requests never
+touch the model.
+
+The grid is every gender x activity level x goal, combined with bucketed
+age, height and weight (e.g. ages 20, 30, ... 70). A profile snaps to the
+nearest grid point. Profiles outside the grid (or cells the build could
+not fill) fall through to the plan cache and the model. Only
+meal_plan / workout_plan are stored; macros are always recomputed exactly.
+
+File layout (little-endian):
+    b"GYMPLIB1" | uint32 header length | header JSON (grid definition)
+    | uint64 offsets[cells + 1] | plan JSON blobs
+
+Cell i is blob[offsets[i]:offsets[i + 1]] (empty = no plan), so a lookup
+is one index computation and one slice of the mapping.
+
+Usage:
+    python -m app.services.plan_library --out data/plan_library.bin
+
+    from app.services.plan_library import plan_library
+    ideas = plan_library.get(age, height_cm, weight_kg, gender, activity_level, goal)
+"""
+
+import argparse
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from app import config
+from app.services.nutrition import ACTIVITY_MULTIPLIERS, GENDERS, GOALS
+
+MAGIC = b"GYMPLIB1"
+
+# (start, step, count) for the numeric axes
+DEFAULT_GRID = {
+    "age": (20, 10, 6),          # 20..70
+    "height_cm": (150, 10, 6),   # 150..200
+    "weight_kg": (50, 10, 9),    # 50..130
+}
+
+
+class PlanGrid:
+    """Maps a profile to a flat cell index (and back)."""
+
+    def __init__(self, age, height_cm, weight_kg, genders=GENDERS,
+                 activity_levels=tuple(ACTIVITY_MULTIPLIERS), goals=GOALS):
+        self.genders = list(genders)
+        self.activity_levels = list(activity_levels)
+        self.goals = list(goals)
+        self.numeric = {"age": tuple(age), "height_cm": tuple(height_cm), "weight_kg": tuple(weight_kg)}
+        self.shape = (
+            len(self.genders), len(self.activity_levels), len(self.goals),
+            age[2], height_cm[2], weight_kg[2],
+        )
+        self.cells = int(np.prod(self.shape))
+
+    @classmethod
+    def from_header(cls, header: dict) -> "PlanGrid":
+        return cls(
+            header["age"], header["height_cm"], header["weight_kg"],
+            header["genders"], header["activity_levels"], header["goals"],
+        )
+
+    def header(self) -> dict:
+        return {
+            "genders": self.genders,
+            "activity_levels": self.activity_levels,
+            "goals": self.goals,
+            **{name: list(axis) for name, axis in self.numeric.items()},
+        }
+
+    @staticmethod
+    def _axis_index(value: float, axis) -> Optional[int]:
+        start, step, count = axis
+        i = int(round((value - start) / step))
+        return i if 0 <= i < count else None
+
+    def index(self, age, height_cm, weight_kg, gender, activity_level, goal) -> Optional[int]:
+        """Flat cell index, or None when the profile is outside the grid."""
+        try:
+            categorical = (
+                self.genders.index(gender),
+                self.activity_levels.index(activity_level),
+                self.goals.index(goal),
+            )
+        except ValueError:
+            return None
+
+        numeric = tuple(
+            self._axis_index(value, self.numeric[name])
+            for name, value in (("age", age), ("height_cm", height_cm), ("weight_kg", weight_kg))
+        )
+        if None in numeric:
+            return None
+        return int(np.ravel_multi_index(categorical + numeric, self.shape))
+
+    def profiles(self):
+        """Yield (index, profile dict) for every cell, in index order."""
+        axes = [
+            [start + step * i for i in range(count)]
+            for start, step, count in self.numeric.values()
+        ]
+        cells = itertools.product(self.genders, self.activity_levels, self.goals, *axes)
+        for i, (gender, activity_level, goal, age, height_cm, weight_kg) in enumerate(cells):
+            yield i, {
+                "age": int(age), "height_cm": float(height_cm), "weight_kg": float(weight_kg),
+                "gender": gender, "activity_level": activity_level, "goal": goal,
+            }
+
+
+class PlanLibrary:
+    """Read-only, memory-mapped plan library (empty when no file is configured)."""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.grid: Optional[PlanGrid] = None
+        self.built_at: Optional[float] = None
+        self._mmap = None
+        self._offsets = None
+        self._blob_start = 0
+        self.hits = 0
+        self.misses = 0
+        self.out_of_grid = 0
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            try:
+                self._open(path)
+            except (OSError, ValueError) as e:
+                print("⚠️ Plan library unavailable:", e)
+                self._close()
+
+    def _open(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a plan library file")
+        (header_len,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mmap[header_start:header_start + header_len])
+
+        self.grid = PlanGrid.from_header(header)
+        self.built_at = header.get("built_at")
+        offsets_start = header_start + header_len
+        # Zero-copy view over the mapping
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=self.grid.cells + 1, offset=offsets_start)
+        self._blob_start = offsets_start + self._offsets.nbytes
+
+    def _close(self) -> None:
+        self._offsets = None
+        self.grid = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.grid is not None
+
+    def cell(self, index: int) -> Optional[dict]:
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        if start == end:
+            return None
+        return json.loads(self._mmap[self._blob_start + start:self._blob_start + end])
+
+    def get(self, age, height_cm, weight_kg, gender, activity_level, goal) -> Optional[dict]:
+        """meal_plan + workout_plan for the nearest grid point, or None."""
+        if not self.enabled:
+            return None
+
+        index = self.grid.index(age, height_cm, weight_kg, gender, activity_level, goal)
+        ideas = self.cell(index) if index is not None else None
+        with self._lock:
+            if index is None:
+                self.out_of_grid += 1
+            elif ideas is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return ideas
+
+    def stats(self) -> dict:
+        with self._lock:
+            filled = 0
+            if self.enabled:
+                filled = int(np.count_nonzero(np.diff(self._offsets)))
+            return {
+                "enabled": self.enabled,
+                "path": self.path or None,
+                "built_at": self.built_at,
+                "cells": self.grid.cells if self.enabled else 0,
+                "filled": filled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "out_of_grid": self.out_of_grid,
+            }
+
+
+def write_library(path: str, grid: PlanGrid, plans: dict) -> None:
+    """Write {cell index: ideas} to path atomically (tmp file + rename)."""
+    header = json.dumps(dict(grid.header(), built_at=time.time(), model=config.LLM_MODEL_PATH)).encode()
+    blobs = [
+        json.dumps(plans[i], separators=(",", ":")).encode() if i in plans else b""
+        for i in range(grid.cells)
+    ]
+    offsets = np.zeros(grid.cells + 1, dtype="<u8")
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(offsets.tobytes())
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+def build_library(path: str, grid: PlanGrid, workers: int = 1, resume: bool = False,
+                  checkpoint_every: int = 100) -> dict:
+    """
+    Run the model for every empty grid cell and write the library.
+
+    With resume, complete cells already in an existing file with the
+    same grid are kept. The file is rewritten every `checkpoint_every` new
+    plans, so an interrupted build loses little work. A cell whose plan is
+    still missing days (after the continuation and one more attempt) is
+    left empty: the library is served before the model, so an incomplete
+    week would be served for good.
+    """
+    # Imported here: the server imports this module through ai_model
+    from app.services.ai_model import _generate_ideas, build_prompt
+    from app.services.plan_stream import missing_days
+
+    plans = {}
+    if resume and os.path.exists(path):
+        existing = PlanLibrary(path)
+        # Compare both headers as written to disk (JSON), not as parsed
+        if existing.enabled and existing.grid.header() == json.loads(json.dumps(grid.header())):
+            plans = {
+                i: plan for i, plan in ((i, existing.cell(i)) for i in range(grid.cells))
+                if plan is not None and not missing_days(plan)
+            }
+            print(f"✅ Resuming: {len(plans)} of {grid.cells} cells already built")
+        existing._close()
+
+    todo = [(i, profile) for i, profile in grid.profiles() if i not in plans]
+    failed = 0
+    incomplete = 0
+    started = time.perf_counter()
+
+    def run(item):
+        i, profile = item
+        prompt = build_prompt(**profile)
+        ideas = _generate_ideas(prompt, profile["goal"])
+        if ideas is not None and missing_days(ideas):
+            ideas = _generate_ideas(prompt, profile["goal"])
+        return i, ideas
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for done, (i, ideas) in enumerate(executor.map(run, todo), start=1):
+            if ideas is None:
+                failed += 1
+            elif missing_days(ideas):
+                incomplete += 1
+            else:
+                plans[i] = {"meal_plan": ideas.get("meal_plan", []), "workout_plan": ideas.get("workout_plan", [])}
+            if done % checkpoint_every == 0:
+                write_library(path, grid, plans)
+                rate = done / (time.perf_counter() - started)
+                print(f"⏳ {done}/{len(todo)} cells ({rate:.2f}/s, {failed} failed, {incomplete} incomplete)")
+
+    write_library(path, grid, plans)
+    return {
+        "cells": grid.cells,
+        "filled": len(plans),
+        "generated": len(todo) - failed - incomplete,
+        "failed": failed,
+        "incomplete": incomplete,
+    }
+
+
+def _number(text: str):
+    """Whole numbers stay ints, so "20:10:6" matches DEFAULT_GRID exactly."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _axis(text: str):
+    start, step, count = text.split(":")
+    return _number(start), _number(step), int(count)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the precomputed plan library")
+    parser.add_argument("--out", default=config.PLAN_LIBRARY_PATH or "data/plan_library.bin")
+    parser.add_argument("--age", type=_axis, default=DEFAULT_GRID["age"], help="start:step:count")
+    parser.add_argument("--height", type=_axis, default=DEFAULT_GRID["height_cm"], help="start:step:count")
+    parser.add_argument("--weight", type=_axis, default=DEFAULT_GRID["weight_kg"], help="start:step:count")
+    parser.add_argument("--workers", type=int, default=config.LLM_INSTANCES,
+                        help="Concurrent generations (match LLM_INSTANCES)")
+    parser.add_argument("--resume", action="store_true", help="Keep cells already in --out")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    args = parser.parse_args()
+
+    grid = PlanGrid(args.age, args.height, args.weight)
+    print(f"🏗️ Building {grid.cells} cells into {args.out}")
+    result = build_library(args.out, grid, args.workers, args.resume, args.checkpoint_every)
+    print(f"✅ Done: {result['filled']}/{result['cells']} cells filled, {result['failed']} failed, "
+          f"{result['incomplete']} incomplete (left empty)")
+
+
+plan_library = PlanLibrary(config.PLAN_LIBRARY_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Plan Neighbour Index
+--------------------
+Serves a previously generated model plan to a *similar* profile, so
+requests that miss the exact-match plan cache can still skip inference
+(a plan made for 70.2 kg is fine for 70.8 kg).
+
+Profiles are partitioned by (gender, activity_level, goal); inside a
+partition each plan is a point of normalized features
+(age / PLAN_NEIGHBORS_AGE_SCALE, height / ..., weight / ...), so a
+distance of 1.0 means "one scale unit away" on a single axis. A lookup
+is a brute-force NumPy distance over its partition; the nearest plan is
+used when it is within PLAN_NEIGHBORS_MAX_DISTANCE.
+
+The index is updated incrementally as the model produces plans, and can
+be warmed from the most recent rows of `model_requests` at startup.
+Each partition keeps at most PLAN_NEIGHBORS_PARTITION_SIZE plans (oldest
+overwritten first). Only meal_plan / workout_plan are stored; macros are
+always recomputed exactly for the requesting profile.
+
+Usage:
+    from app.services.plan_neighbors import plan_neighbors
+
+    plan_neighbors.add(age, height_cm, weight_kg, gender, activity_level, goal, ideas)
+    ideas = plan_neighbors.get(age, height_cm, weight_kg, gender, activity_level, goal)
+    plan_neighbors.warm(rows=5000)   # from model_requests
+"""
+
+import copy
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app import config
+from app.db import get_db_connection
+from app.services.plan_history import decode_payload
+from app.services.plan_stream import missing_days
+
+# Plans closer than this are the same profile: replace instead of adding
+SAME_PROFILE = 1e-6
+
+
+class _Partition:
+    """Fixed-capacity ring of feature rows and their plans."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.features = np.empty((min(capacity, 64), 3), dtype=np.float32)
+        self.plans: list = []
+        self._next = 0   # slot the next plan goes to once full
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def nearest(self, point: np.ndarray) -> Tuple[int, float]:
+        deltas = self.features[:len(self.plans)] - point
+        distances = np.einsum("ij,ij->i", deltas, deltas)
+        index = int(np.argmin(distances))
+        return index, float(np.sqrt(distances[index]))
+
+    def add(self, point: np.ndarray, plan: dict) -> None:
+        if self.plans:
+            index, distance = self.nearest(point)
+            if distance < SAME_PROFILE:
+                self.plans[index] = plan
+                return
+
+        if len(self.plans) < self.capacity:
+            if len(self.plans) == len(self.features):
+                grown = np.empty((min(self.capacity, len(self.features) * 2), 3), dtype=np.float32)
+                grown[:len(self.features)] = self.features
+                self.features = grown
+            self.features[len(self.plans)] = point
+            self.plans.append(plan)
+            return
+
+        self.features[self._next] = point
+        self.plans[self._next] = plan
+        self._next = (self._next + 1) % self.capacity
+
+
+class PlanNeighbors:
+    """kNN (k = 1) over past plans, one partition per categorical profile."""
+
+    def __init__(self, max_distance: float, partition_size: int,
+                 scales: Tuple[float, float, float] = (5.0, 5.0, 2.5)):
+        self.max_distance = max_distance
+        self.partition_size = partition_size
+        self.scales = np.asarray(scales, dtype=np.float32)
+        self._partitions: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self._hit_distance = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_distance > 0 and self.partition_size > 0
+
+    def _point(self, age: float, height_cm: float, weight_kg: float) -> np.ndarray:
+        return np.asarray((age, height_cm, weight_kg), dtype=np.float32) / self.scales
+
+    @staticmethod
+    def _partition_key(gender: str, activity_level: str, goal: str) -> tuple:
+        return gender.strip().lower(), activity_level.strip().lower(), goal.strip().lower()
+
+    def get(self, age: int, height_cm: float, weight_kg: float,
+            gender: str, activity_level: str, goal: str) -> Optional[dict]:
+        """The nearest stored plan within max_distance, or None."""
+        if not self.enabled:
+            return None
+        point = self._point(age, height_cm, weight_kg)
+        with self._lock:
+            partition = self._partitions.get(self._partition_key(gender, activity_level, goal))
+            if partition is not None and len(partition):
+                index, distance = partition.nearest(point)
+                if distance <= self.max_distance:
+                    self.hits += 1
+                    self._hit_distance += distance
+                    return copy.deepcopy(partition.plans[index])
+            self.misses += 1
+        return None
+
+    def add(self, age: int, height_cm: float, weight_kg: float,
+            gender: str, activity_level: str, goal: str, ideas: dict) -> bool:
+        """Index a complete model plan for this profile (False if it was not indexed)."""
+        if not self.enabled or missing_days(ideas):
+            return False
+        plan = {"meal_plan": ideas.get("meal_plan", []), "workout_plan": ideas.get("workout_plan", [])}
+        point = self._point(age, height_cm, weight_kg)
+        key = self._partition_key(gender, activity_level, goal)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None:
+                partition = self._partitions[key] = _Partition(self.partition_size)
+            partition.add(point, copy.deepcopy(plan))
+            self.added += 1
+        return True
+
+    def warm(self, rows: int) -> int:
+        """
+        Index the model plans among the newest `rows` rows of model_requests.
+        Only rows with source "model" count: plans served from the library,
+        cache, index or fallback (and rows logged before responses carried
+        a source) are skipped, so neighbours never drift from what the model
+        wrote for a real profile. Returns the number of plans indexed.
+        """
+        if not self.enabled or rows <= 0:
+            return 0
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT request_json, response_json FROM model_requests ORDER BY id DESC LIMIT %s", (rows,)
+            )
+            records = cursor.fetchall()
+
+        indexed = 0
+        # Oldest first, so the newest plan wins when a partition is full
+        for record in reversed(records):
+            try:
+                request = decode_payload(record["request_json"])
+                response = decode_payload(record["response_json"])
+                # Only rows the model wrote; legacy rows without a source
+                # (and fallbacks, which carry "error") are never trusted
+                if response.get("source") != "model" or "error" in response:
+                    continue
+                indexed += self.add(
+                    request["age"], request["height_cm"], request["weight_kg"],
+                    request["gender"], request["activity_level"], request["goal"], response,
+                )
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+        return indexed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": sum(len(p) for p in self._partitions.values()),
+                "partitions": len(self._partitions),
+                "partition_size": self.partition_size,
+                "max_distance": self.max_distance,
+                "added": self.added,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "mean_hit_distance": round(self._hit_distance / self.hits, 4) if self.hits else None,
+            }
+
+
+plan_neighbors = PlanNeighbors(
+    config.PLAN_NEIGHBORS_MAX_DISTANCE,
+    config.PLAN_NEIGHBORS_PARTITION_SIZE,
+    (config.PLAN_NEIGHBORS_AGE_SCALE, config.PLAN_NEIGHBORS_HEIGHT_SCALE, config.PLAN_NEIGHBORS_WEIGHT_SCALE),
+)
@@ -0,0 +1,102 @@
+"""
+Plan Prompt
+-----------
+The prompt asking the model for a 7-day meal + workout plan, in the
+configured output mode (LLM_OUTPUT_MODE). Kept apart from ai_model so
+tools that only need the prompt text (the autotuner, benchmarks) don't
+build the inference pool by importing it.
+
+Usage:
+    from app.services.plan_prompt import PROMPT_PREFIX, build_prompt
+
+    prompt = build_prompt(30, 175, 75, "male", "moderate", "maintain")
+"""
+
+from app import config
+from app.services.plan_codes import catalog_prompt
+
+COMPACT_OUTPUT = config.LLM_OUTPUT_MODE == "compact"
+
+# Static part of the prompt: identical for every request, so its KV state
+# is evaluated once and reused (see PrefixStateCache). Only the USER
+# PROFILE block after it is evaluated per request.
+JSON_PROMPT_PREFIX = """
+You are a professional AI fitness assistant.
+
+TASK:
+Generate a **7-day meal plan** and **7-day workout plan** tailored to the user's goal.
+
+Rules:
+- Each day must be different.
+- Meals: 3/day if lose or maintain, 4/day if gain.
+- Workouts: 3-5 exercises/day.
+- Focus on the goal (hypertrophy, fat loss, or balance).
+
+📤 Respond ONLY with valid JSON between BEGIN_JSON and END_JSON.
+Do not include explanations or comments.
+
+FORMAT:
+BEGIN_JSON
+{
+  "meal_plan": [
+    {
+      "day": 1,
+      "meals": [
+        {"meal_time": "breakfast", "food": "Oats with berries"}
+      ]
+    }
+  ],
+  "workout_plan": [
+    {
+      "day": 1,
+      "exercises": [
+        {"name": "Squats", "sets": 3, "reps": "8-12"}
+      ]
+    }
+  ]
+}
+END_JSON
+"""
+
+# LLM_OUTPUT_MODE=compact: the model only picks catalog codes (see
+# app.services.plan_codes); the catalog listing is part of the static prefix
+COMPACT_PROMPT_PREFIX = """
+You are a professional AI fitness assistant.
+
+TASK:
+Pick a **7-day meal plan** and **7-day workout plan** tailored to the user's goal,
+using only the codes from the catalog below.
+
+Rules:
+- Each day must be different.
+- Meals: B, L, D codes per day if lose or maintain; B, L, D, S if gain.
+- Workouts: 3-5 exercise codes/day.
+- Focus on the goal (hypertrophy, fat loss, or balance).
+
+""" + catalog_prompt() + """
+
+📤 Respond ONLY with one line per day between BEGIN_PLAN and END_PLAN:
+day number, meal codes, "|", exercise codes. No explanations or comments.
+
+FORMAT:
+BEGIN_PLAN
+1: B1 L2 D3 | E1 E4 E19
+...
+7: B6 L1 D2 | E16 E20 E23
+END_PLAN
+"""
+
+# The cached prefix ends after "USER PROFILE:\n": splitting right after the
+# format block would put "\n\n" (one token) across the boundary
+PROMPT_PREFIX = (COMPACT_PROMPT_PREFIX if COMPACT_OUTPUT else JSON_PROMPT_PREFIX) + "\nUSER PROFILE:\n"
+
+
+def build_prompt(age: int, height_cm: float, weight_kg: float, gender: str, activity_level: str, goal: str) -> str:
+    """Prompt asking LLaMA for the 7-day meal + workout plan (JSON or compact codes)."""
+    return PROMPT_PREFIX + f"""- Age: {age}
+- Gender: {gender}
+- Height: {height_cm} cm
+- Weight: {weight_kg} kg
+- Activity: {activity_level}
+- Goal: {goal}
+"""
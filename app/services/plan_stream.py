@@ -0,0 +1,206 @@
+"""
+Incremental Plan Parser
+-----------------------
+Parses the model's BEGIN_JSON ... END_JSON output while it is still
+being generated and reports every day object in "meal_plan" and
+"workout_plan" as soon as its closing brace arrives.
+
+The parser only tracks string/escape state and bracket depth, so each
+fed character is processed once; finished days are decoded on their own
+with json.loads.
+
+Output cut off by max_tokens still yields every completed day, even
+when one section never started; missing_days() and merge_days() let the
+caller regenerate only the rest of each section.
+
+Usage:
+    from app.services.plan_stream import IncrementalPlanParser, missing_days
+
+    parser = IncrementalPlanParser()
+    for text in chunks:
+        for section, day in parser.feed(text):
+            ...
+    missing_days(parser.result())   # e.g. [6, 7] when truncated
+"""
+
+import json
+import re
+from typing import List, Optional, Sequence, Tuple
+
+PLAN_SECTIONS = ("meal_plan", "workout_plan")
+PLAN_DAYS = tuple(range(1, 8))
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def loads_lenient(text: str):
+    """json.loads that also tolerates trailing commas and code fences."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        cleaned = text.replace("```", "").strip().rstrip(",")
+        return json.loads(_TRAILING_COMMA.sub(r"\1", cleaned))
+
+
+class IncrementalPlanParser:
+    """Streaming extractor for completed plan days."""
+
+    START_MARKER = "BEGIN_JSON"
+    END_MARKER = "END_JSON"
+
+    def __init__(self, sections: Tuple[str, ...] = PLAN_SECTIONS):
+        self.sections = sections
+        self.days = {section: [] for section in sections}
+        self.finished = False
+        self._pending = ""       # text seen before the start marker
+        self._buffer = ""        # JSON text after the start marker
+        self._pos = 0            # next index of _buffer to scan
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._section: Optional[str] = None
+        self._day_start: Optional[int] = None
+
+    @property
+    def json_text(self) -> str:
+        """Raw JSON text between the markers seen so far."""
+        end = self._buffer.find(self.END_MARKER)
+        return (self._buffer if end == -1 else self._buffer[:end]).strip()
+
+    def feed(self, text: str) -> List[Tuple[str, dict]]:
+        """Consume more model output and return newly completed days."""
+        if self.finished or not text:
+            return []
+
+        if not self._started:
+            self._pending += text
+            idx = self._pending.find(self.START_MARKER)
+            if idx == -1:
+                # Keep only a tail long enough to hold a split marker
+                self._pending = self._pending[-len(self.START_MARKER):]
+                return []
+            self._started = True
+            text = self._pending[idx + len(self.START_MARKER):]
+            self._pending = ""
+
+        self._buffer += text
+        return self._scan()
+
+    def _scan(self) -> List[Tuple[str, dict]]:
+        events = []
+        buf = self._buffer
+
+        while self._pos < len(buf):
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = buf[self._string_start:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2 and ch == "[":
+                    self._section = self._last_key if self._last_key in self.sections else None
+                elif self._depth == 3 and ch == "{" and self._section:
+                    self._day_start = i
+            elif ch in "}]":
+                if self._depth == 3 and ch == "}" and self._day_start is not None:
+                    day = self._decode(buf[self._day_start:i + 1])
+                    self._day_start = None
+                    if day is not None:
+                        self.days[self._section].append(day)
+                        events.append((self._section, day))
+                elif self._depth == 2 and ch == "]":
+                    self._section = None
+                self._depth -= 1
+                if self._depth == 0:
+                    self.finished = True
+                    break
+            elif ch == "E" and self._depth == 0 and buf.startswith(self.END_MARKER, i):
+                self.finished = True
+                break
+
+        return events
+
+    @staticmethod
+    def _decode(text: str) -> Optional[dict]:
+        try:
+            value = loads_lenient(text)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    def result(self) -> Optional[dict]:
+        """
+        Best-effort final plan: the full JSON if it parses, otherwise the
+        days that were completed (None if nothing usable was produced).
+        """
+        if self.json_text:
+            try:
+                value = loads_lenient(self.json_text)
+                if isinstance(value, dict):
+                    return value
+            except json.JSONDecodeError:
+                pass
+        if any(self.days.values()):
+            return {section: list(days) for section, days in self.days.items()}
+        return None
+
+
+def _days(ideas: dict, section: str) -> list:
+    days = ideas.get(section) if isinstance(ideas, dict) else None
+    return [day for day in days if isinstance(day, dict)] if isinstance(days, list) else []
+
+
+def _day_order(day: dict) -> int:
+    number = day.get("day")
+    return number if isinstance(number, int) else len(PLAN_DAYS) + 1
+
+
+def has_days(ideas: Optional[dict]) -> bool:
+    """True when any section has at least one parsed day."""
+    return bool(ideas) and any(_days(ideas, section) for section in PLAN_SECTIONS)
+
+
+def missing_days(ideas: Optional[dict]) -> List[int]:
+    """Days 1-7 not yet present in both meal_plan and workout_plan."""
+    if not ideas:
+        return list(PLAN_DAYS)
+    present = [{day.get("day") for day in _days(ideas, section)} for section in PLAN_SECTIONS]
+    return [d for d in PLAN_DAYS if not all(d in numbers for numbers in present)]
+
+
+def merge_days(ideas: dict, extra: Optional[dict], days: Sequence[int]) -> dict:
+    """
+    Add the requested days from a continuation (extra) to a partial plan.
+    Days already present are kept; the result is ordered by day.
+    """
+    merged = {}
+    for section in PLAN_SECTIONS:
+        existing = _days(ideas, section)
+        present = {day.get("day") for day in existing}
+        new = _days(extra, section)
+        if new and not any(day.get("day") in days for day in new):
+            # Unconstrained continuations may number their days from 1 again
+            new = [dict(day, day=number) for day, number in zip(new, days)]
+        for day in new:
+            if day.get("day") in days and day["day"] not in present:
+                present.add(day["day"])
+                existing.append(day)
+        merged[section] = sorted(existing, key=_day_order)
+    return merged
@@ -0,0 +1,185 @@
+"""
+Portion Solver
+--------------
+Picks meal portions (grams of each food) that hit a profile's calorie,
+protein, fat and carb targets, instead of fixed percentage splits.
+
+Foods come from a table with kcal and macros per 100 g
+(app/data/foods.csv). Menus (app/data/menus.json) list the meals of a
+day, each meal's share of the daily targets, and the foods it may use.
+
+Each meal is solved with non-negative least squares. The nutrient errors
+are weighted into kcal (protein x4, fat x9, carbs x4), so they are
+comparable. A meal has only a handful of foods, so the exact NNLS
+optimum is found by trying every subset of foods. Each subset uses a
+pseudo-inverse precomputed at load time. The subset with the smallest
+residual and all portions >= 0 wins. The empty subset never does, and
+every meal keeps at least 1 g of its main food after rounding, so no
+meal line comes out empty. Solving is a few small matrix products per
+meal, for one profile or a whole batch at once.
+
+Usage:
+    from app.services.portions import portion_grams, format_meal_plan, get_menu
+
+    grams = portion_grams(macros, menu="vegetarian")   # {"breakfast_oats_g": 80, ...}
+    format_meal_plan(grams, menu="vegetarian")         # ["🍳 Breakfast: 80g oats + ...", ...]
+    get_menu("default").solve(targets)                 # (n, foods) grams for n profiles
+"""
+
+import csv
+import itertools
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from app import config
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_MENU = "default"
+
+NUTRIENTS = ("kcal", "protein_g", "fat_g", "carbs_g")
+# Errors measured in kcal: 1 g protein = 4 kcal, fat = 9, carbs = 4
+_NUTRIENT_WEIGHTS = np.array([1.0, 4.0, 9.0, 4.0])
+
+
+class FoodTable:
+    """Foods as a (foods x nutrients) per-gram matrix."""
+
+    def __init__(self, keys: List[str], names: List[str], per_100g: np.ndarray):
+        self.keys = keys
+        self.names = dict(zip(keys, names))
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.per_gram = per_100g / 100.0
+
+    @classmethod
+    def load(cls, path: str) -> "FoodTable":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return cls(
+            [row["key"] for row in rows],
+            [row["name"] for row in rows],
+            np.array([[float(row[n]) for n in NUTRIENTS] for row in rows]),
+        )
+
+
+class MealSolver:
+    """Exact NNLS for one meal, over all subsets of its foods."""
+
+    # Rows solved per chunk (bounds the (subsets x rows x foods) temporaries)
+    CHUNK = 16384
+
+    def __init__(self, foods: FoodTable, keys: List[str]):
+        self.keys = keys
+        # Weighted nutrients x foods
+        self.matrix = _NUTRIENT_WEIGHTS[:, None] * foods.per_gram[[foods.index[k] for k in keys]].T
+
+        # One padded pseudo-inverse per non-empty subset: (subsets, nutrients, foods),
+        # zero for foods outside the subset, so every subset is solved in one matmul
+        subsets = [
+            cols
+            for size in range(1, len(keys) + 1)
+            for cols in itertools.combinations(range(len(keys)), size)
+        ]
+        self.pinv = np.zeros((len(subsets), len(NUTRIENTS), len(keys)))
+        for i, cols in enumerate(subsets):
+            self.pinv[i][:, list(cols)] = np.linalg.pinv(self.matrix[:, list(cols)]).T
+
+    def solve(self, targets: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            targets: (n, 4) kcal / protein / fat / carbs for this meal
+
+        Returns:
+            (n, foods) grams >= 0, at least one of them > 0 per row
+            (unless the targets are all 0)
+        """
+        if len(targets) > self.CHUNK:
+            return np.vstack([
+                self.solve(targets[i:i + self.CHUNK]) for i in range(0, len(targets), self.CHUNK)
+            ])
+
+        b = targets * _NUTRIENT_WEIGHTS
+        x = b[None] @ self.pinv                            # (subsets, n, foods)
+        residual = x @ self.matrix.T - b[None]             # (subsets, n, nutrients)
+        error = np.einsum("snj,snj->sn", residual, residual)
+        error[(x < -1e-9).any(axis=2)] = np.inf            # infeasible: negative grams
+
+        # Single-food subsets are always feasible (non-negative nutrients and
+        # targets), so every row has a best non-empty subset; x = 0 (an empty
+        # meal) is never picked even when it would fit better
+        best = error.argmin(axis=0)
+        rows = np.arange(len(b))
+        return np.clip(x[best, rows], 0.0, None)
+
+
+class Menu:
+    """A day's meals, their share of the daily targets and their foods."""
+
+    def __init__(self, name: str, meals: list, foods: FoodTable):
+        self.name = name
+        self.meals = [
+            (meal["meal"], meal["label"], float(meal["share"]), MealSolver(foods, meal["foods"]))
+            for meal in meals
+        ]
+        self.food_names = foods.names
+        self.columns = [f"{meal}_{food}_g" for meal, _, _, solver in self.meals for food in solver.keys]
+
+    def solve(self, targets: np.ndarray) -> np.ndarray:
+        """(n, 4) daily targets -> (n, len(columns)) whole grams."""
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        meals = []
+        for _, _, share, solver in self.meals:
+            exact = solver.solve(targets * share)
+            grams = np.rint(exact)
+            # Tiny portions can all round to 0: keep 1 g of the meal's main food
+            empty = np.flatnonzero(~(grams > 0).any(axis=1))
+            grams[empty, exact[empty].argmax(axis=1)] = 1
+            meals.append(grams)
+        return np.hstack(meals).astype(np.int64)
+
+
+def _load_menus() -> Dict[str, Menu]:
+    foods = FoodTable.load(config.FOODS_PATH or os.path.join(DATA_DIR, "foods.csv"))
+    with open(config.MENUS_PATH or os.path.join(DATA_DIR, "menus.json"), encoding="utf-8") as f:
+        menus = json.load(f)
+    return {name: Menu(name, meals, foods) for name, meals in menus.items()}
+
+
+MENUS = _load_menus()
+
+
+def get_menu(name: str = DEFAULT_MENU) -> Menu:
+    menu = MENUS.get(name.lower())
+    if menu is None:
+        raise ValueError(f"Invalid menu. Must be: {', '.join(MENUS)}.")
+    return menu
+
+
+def macro_targets(macros: dict) -> np.ndarray:
+    """Daily kcal / protein / fat / carbs from calculate_macros() output."""
+    return np.array([macros["calories"], macros["protein_g"], macros["fat_g"], macros["carbs_g"]], dtype=np.float64)
+
+
+def portion_grams(macros: dict, menu: str = DEFAULT_MENU) -> dict:
+    """
+    Grams of each food for the daily targets, keyed "<meal>_<food>_g"
+    (e.g. "breakfast_oats_g").
+    """
+    selected = get_menu(menu)
+    return dict(zip(selected.columns, selected.solve(macro_targets(macros))[0].tolist()))
+
+
+def format_meal_plan(grams: dict, menu: str = DEFAULT_MENU) -> list:
+    """Human-readable meal lines from portion_grams() output (0 g foods left out)."""
+    selected = get_menu(menu)
+    meal_plan = []
+    for meal, label, _, solver in selected.meals:
+        items = [
+            f"{grams[f'{meal}_{food}_g']}g {selected.food_names[food]}"
+            for food in solver.keys
+            if grams[f"{meal}_{food}_g"] > 0
+        ]
+        meal_plan.append(f"{label}: {' + '.join(items)}")
+    return meal_plan
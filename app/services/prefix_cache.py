@@ -0,0 +1,112 @@
+"""
+Prompt Prefix Cache
+-------------------
+Keeps the evaluated KV state of the static part of the plan prompt (role,
+task, rules and format example) so each request only evaluates its own
+USER PROFILE tokens.
+
+llama_cpp already skips tokens that match what is currently in the KV
+cache. This class makes sure that match always covers the whole static
+prefix: it evaluates the prefix once, snapshots the state with
+save_state(), and restores the snapshot whenever another prompt (retry,
+continuation, warmup...) has replaced it.
+
+The prefix must end on a token boundary of the full prompt (a token
+merged across the split, such as "\n\n", would never match). Given a
+sample prompt, warm() checks that and only snapshots the tokens the
+prefix and the prompt actually share.
+
+All methods must run on the thread that owns the model.
+
+Usage:
+    from app.services.prefix_cache import PrefixStateCache
+
+    cache = PrefixStateCache(llm, PROMPT_PREFIX, sample_prompt=build_prompt(...))
+    cache.prepare(prompt)   # right before llm(prompt, ...)
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class PrefixStateCache:
+    """Snapshot/restore of the model state for one fixed prompt prefix."""
+
+    def __init__(self, model, prefix: str, sample_prompt: Optional[str] = None):
+        self.model = model
+        self.prefix = prefix
+        self.sample_prompt = sample_prompt
+        self._tokens: Optional[list] = None
+        self._state = None
+        self._lock = threading.Lock()
+        self.warm_seconds = 0.0
+        self.restored = 0
+        self.resident = 0
+        self.bypassed = 0
+        self.trimmed_tokens = 0
+
+    def warm(self) -> None:
+        """Evaluate the prefix once and keep a snapshot of the state."""
+        started = time.perf_counter()
+        tokens = self.model.tokenize(self.prefix.encode("utf-8"))
+        trimmed = 0
+        if self.sample_prompt is not None:
+            sample = self.model.tokenize(self.sample_prompt.encode("utf-8"))
+            shared = 0
+            while shared < min(len(tokens), len(sample)) and tokens[shared] == sample[shared]:
+                shared += 1
+            if shared < len(tokens):
+                trimmed = len(tokens) - shared
+                print(f"⚠️ Prompt prefix does not end on a token boundary; caching {shared} of {len(tokens)} tokens")
+                tokens = tokens[:shared]
+        self.model.reset()
+        self.model.eval(tokens)
+        state = self.model.save_state()
+        with self._lock:
+            self._tokens = tokens
+            self._state = state
+            self.trimmed_tokens = trimmed
+            self.warm_seconds = time.perf_counter() - started
+
+    def _prefix_resident(self) -> bool:
+        """True when the model's KV cache already starts with the prefix."""
+        n = len(self._tokens)
+        n_tokens = getattr(self.model, "n_tokens", 0)
+        if n_tokens < n:
+            return False
+        return list(self.model.input_ids[:n]) == self._tokens
+
+    def prepare(self, prompt: str) -> None:
+        """Make sure the prefix state is loaded before running prompt."""
+        if not prompt.startswith(self.prefix):
+            with self._lock:
+                self.bypassed += 1
+            return
+
+        if self._state is None:
+            self.warm()
+            with self._lock:
+                self.resident += 1
+            return
+
+        if self._prefix_resident():
+            with self._lock:
+                self.resident += 1
+            return
+
+        self.model.load_state(self._state)
+        with self._lock:
+            self.restored += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "warmed": self._state is not None,
+                "prefix_tokens": len(self._tokens) if self._tokens else 0,
+                "trimmed_tokens": self.trimmed_tokens,
+                "warm_seconds": round(self.warm_seconds, 3),
+                "resident": self.resident,
+                "restored": self.restored,
+                "bypassed": self.bypassed,
+            }
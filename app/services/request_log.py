@@ -0,0 +1,149 @@
+"""
+Model Request Log
+-----------------
+Write-behind logging of generated plans into `model_requests`.
+
+log() only appends to an in-memory buffer and returns immediately. A
+background thread serializes and compresses the rows (see
+app.services.plan_history) and inserts them with executemany()
+once `batch_size` rows are waiting or `flush_interval` seconds have
+passed. So a slow or unavailable database never adds latency to plan
+generation. When the buffer is full (e.g. during a DB outage), new rows
+are dropped and counted instead of blocking requests.
+
+Usage:
+    from app.services.request_log import request_log
+
+    request_log.log(user_id, request_data, response_json, model_name)
+    request_log.close()   # on shutdown: flush what is left
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from app import config
+from app.db import get_db_connection
+from app.services.plan_history import encode_payload
+
+INSERT_SQL = """
+    INSERT INTO model_requests (user_id, request_json, response_json, model_name)
+    VALUES (%s, %s, %s, %s)
+"""
+
+
+class RequestLogWriter:
+    """Buffered, batched writer for model_requests rows."""
+
+    def __init__(self, max_buffer: int = 10000, batch_size: int = 100, flush_interval: float = 1.0):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self.buffered = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.payload_bytes = 0
+        self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, user_id: Optional[int], request_data: dict, response_json: dict, model_name: str) -> bool:
+        """Queue one row; returns False if it had to be dropped."""
+        with self._cond:
+            if self._stopping or len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return False
+            self._buffer.append((user_id, request_data, response_json, model_name))
+            self.buffered += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _take_batch(self) -> list:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take_batch()
+                stopping = self._stopping
+
+            if batch and not self._flush(batch):
+                with self._cond:
+                    if stopping:
+                        # Shutting down and the DB is still failing: give up on these
+                        self.dropped += len(batch)
+                    else:
+                        # Put rows back (oldest first) as far as the buffer allows
+                        room = self.max_buffer - len(self._buffer)
+                        keep = batch[:max(room, 0)]
+                        self.dropped += len(batch) - len(keep)
+                        self._buffer.extendleft(reversed(keep))
+                if not stopping:
+                    time.sleep(self.flush_interval)
+
+            if stopping:
+                with self._cond:
+                    if not self._buffer:
+                        return
+
+    def _flush(self, batch: list) -> bool:
+        rows = [
+            (user_id, encode_payload(request_data), encode_payload(response_json), model_name)
+            for user_id, request_data, response_json, model_name in batch
+        ]
+        payload_bytes = sum(len(row[1]) + len(row[2]) for row in rows)
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.executemany(INSERT_SQL, rows)
+            conn.commit()
+        except Exception as db_error:
+            with self._cond:
+                self.failed_flushes += 1
+            print("⚠️ Failed to log model requests to database:", db_error)
+            return False
+        finally:
+            if conn is not None:
+                conn.close()
+
+        with self._cond:
+            self.flushed += len(rows)
+            self.payload_bytes += payload_bytes
+        return True
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """Stop accepting rows and drain the buffer to the database."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._buffer),
+                "max_buffer": self.max_buffer,
+                "buffered": self.buffered,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "failed_flushes": self.failed_flushes,
+                "payload_bytes": self.payload_bytes,
+            }
+
+
+request_log = RequestLogWriter(
+    max_buffer=config.REQUEST_LOG_BUFFER,
+    batch_size=config.REQUEST_LOG_BATCH_SIZE,
+    flush_interval=config.REQUEST_LOG_FLUSH_INTERVAL,
+)
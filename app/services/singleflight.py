@@ -0,0 +1,85 @@
+"""
+Singleflight
+------------
+Collapses concurrent calls for the same key into one execution. The first
+caller (the leader) runs the function. Callers that arrive with the same
+key while it is still running wait for it and get the same result (or
+the same exception) instead of running it again.
+
+Used to keep a burst of identical /ai/generate requests (e.g. a cohort
+signing up together) from each running its own model inference.
+
+Usage:
+    from app.services.singleflight import SingleFlight
+
+    flights = SingleFlight()
+    ideas = flights.do(cache_key, generate, prompt, goal)
+    flights.stats()   # leaders / coalesced / in_flight
+"""
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-key in-flight call registry."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs), or wait for the call already running for key."""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking waiters, so later callers start fresh
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            }
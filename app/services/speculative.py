@@ -0,0 +1,83 @@
+"""
+Speculative Decoding
+--------------------
+Optional draft models for llama_cpp speculative decoding (LLM_SPECULATIVE).
+A draft proposes the next few tokens cheaply. The main model checks all
+of them in one batched eval and keeps the longest prefix it agrees with,
+so output is unchanged and only the number of sequential evals drops.
+
+Plan output repeats itself a lot (the same JSON keys, day blocks and
+meal_time strings seven times), so drafts are accepted often.
+
+Modes:
+    - "off"            plain decoding (default)
+    - "prompt_lookup"  llama_cpp LlamaPromptLookupDecoding: copies the
+                       continuation of the last matching n-gram from the
+                       prompt + output so far (no extra model)
+    - "draft"          a small GGUF with the same tokenizer
+                       (LLM_DRAFT_MODEL_PATH), decoded greedily
+
+With a draft model llama_cpp keeps logits for every position
+(logits_all), which costs n_ctx x vocab floats of RAM per instance.
+
+Usage:
+    from app.services.speculative import build_draft_model
+
+    Llama(model_path=..., draft_model=build_draft_model(n_threads=4))
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from app import config
+
+MODES = ("off", "prompt_lookup", "draft")
+
+
+class DraftModelDecoding:
+    """Greedy drafts from a small GGUF, callable like llama_cpp's LlamaDraftModel."""
+
+    def __init__(self, model, num_pred_tokens: int = 10):
+        self.model = model
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        drafted = []
+        # generate() reuses the draft's KV cache for the common prefix, so
+        # each call only evaluates the tokens accepted since the last one
+        for token in self.model.generate(list(map(int, input_ids)), top_k=1, temp=0.0):
+            drafted.append(token)
+            if len(drafted) >= self.num_pred_tokens:
+                break
+        return np.array(drafted, dtype=np.intc)
+
+
+def build_draft_model(mode: Optional[str] = None, n_threads: int = 4):
+    """The draft model for LLM_SPECULATIVE (None when off)."""
+    mode = (mode or config.LLM_SPECULATIVE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Invalid LLM_SPECULATIVE. Must be: {', '.join(MODES)}.")
+    if mode == "off":
+        return None
+
+    if mode == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        return LlamaPromptLookupDecoding(
+            max_ngram_size=config.LLM_DRAFT_NGRAM,
+            num_pred_tokens=config.LLM_DRAFT_TOKENS,
+        )
+
+    if not config.LLM_DRAFT_MODEL_PATH:
+        raise ValueError("LLM_SPECULATIVE=draft needs LLM_DRAFT_MODEL_PATH.")
+    from llama_cpp import Llama
+
+    from app.services.llama_settings import load_settings
+
+    draft = Llama(
+        model_path=config.LLM_DRAFT_MODEL_PATH,
+        **load_settings().llama_kwargs(n_threads),
+        verbose=False,
+    )
+    return DraftModelDecoding(draft, num_pred_tokens=config.LLM_DRAFT_TOKENS)
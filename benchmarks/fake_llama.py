@@ -0,0 +1,135 @@
+"""
+Fake LLaMA
+----------
+Deterministic stand-in for llama_cpp.Llama used by the load tests. It
+replays recorded completions (benchmarks/fixtures/plan_outputs.json) with
+a configurable prompt-processing delay and per-token delay, so the whole
+API can be benchmarked without the GGUF and with repeatable timings.
+
+Supports what the app calls: __call__(prompt, max_tokens=..., stream=...),
+with OpenAI-style choices/usage in the result and one chunk per token
+when streaming. Extra kwargs (grammar, temperature, ...) are ignored.
+
+Usage:
+    from benchmarks.fake_llama import FakeLlama, load_recordings
+
+    llm = FakeLlama(load_recordings(), prompt_ms=200, token_ms=20)
+    inference_pool.set_model_factory(lambda **kw: llm)
+"""
+
+import itertools
+import json
+import os
+import re
+import threading
+import time
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "plan_outputs.json")
+
+# Rough llama tokenization: ~4 characters per token, whitespace kept
+_TOKEN_RE = re.compile(r"\s*\S{1,4}|\s+")
+
+
+def load_recordings(path: str = FIXTURE) -> dict:
+    """
+    Recorded outputs by key ("gain" for 4-meal plans, "default" otherwise;
+    "compact_gain" / "compact" for LLM_OUTPUT_MODE=compact prompts).
+    """
+    with open(path) as f:
+        return json.load(f)["outputs"]
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(text)
+
+
+def recording_key(prompt: str) -> str:
+    key = "gain" if "- Goal: gain" in prompt else "default"
+    if "BEGIN_PLAN" in prompt:
+        return "compact" if key == "default" else "compact_gain"
+    return key
+
+
+class FakeLlama:
+    def __init__(self, recordings: dict, prompt_ms: float = 0.0, token_ms: float = 0.0):
+        self.recordings = {key: itertools.cycle(texts) for key, texts in recordings.items()}
+        self.prompt_seconds = prompt_ms / 1000
+        self.token_seconds = token_ms / 1000
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _next_output(self, prompt: str) -> str:
+        key = recording_key(prompt)
+        if key not in self.recordings:
+            key = "compact" if key == "compact_gain" and "compact" in self.recordings else "default"
+        with self._lock:
+            self.calls += 1
+            return next(self.recordings[key])
+
+    def __call__(self, prompt: str, max_tokens: int = 256, stream: bool = False, **kwargs):
+        tokens = tokenize(self._next_output(prompt))[:max_tokens]
+        usage = {
+            "prompt_tokens": len(tokenize(prompt)),
+            "completion_tokens": len(tokens),
+            "total_tokens": len(tokenize(prompt)) + len(tokens),
+        }
+        finish_reason = "length" if len(tokens) == max_tokens else "stop"
+        if stream:
+            return self._stream(tokens, finish_reason)
+
+        time.sleep(self.prompt_seconds + self.token_seconds * len(tokens))
+        return {
+            "object": "text_completion",
+            "choices": [{"index": 0, "text": "".join(tokens), "finish_reason": finish_reason}],
+            "usage": usage,
+        }
+
+    def _stream(self, tokens: list, finish_reason: str):
+        time.sleep(self.prompt_seconds)
+        for i, token in enumerate(tokens):
+            time.sleep(self.token_seconds)
+            yield {
+                "object": "text_completion",
+                "choices": [{
+                    "index": 0,
+                    "text": token,
+                    "finish_reason": finish_reason if i == len(tokens) - 1 else None,
+                }],
+            }
+
+
+class RecordingLlama:
+    """Wraps a real model and keeps its completions for later replay."""
+
+    def __init__(self, llm):
+        self._llm = llm
+        self.outputs = {"default": [], "gain": [], "compact": [], "compact_gain": []}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+    def _keep(self, prompt: str, text: str) -> None:
+        with self._lock:
+            self.outputs[recording_key(prompt)].append(text)
+
+    def __call__(self, prompt: str, stream: bool = False, **kwargs):
+        if not stream:
+            output = self._llm(prompt, **kwargs)
+            self._keep(prompt, output["choices"][0]["text"])
+            return output
+        return self._record_stream(prompt, self._llm(prompt, stream=True, **kwargs))
+
+    def _record_stream(self, prompt: str, chunks):
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk["choices"][0]["text"])
+                yield chunk
+        finally:
+            self._keep(prompt, "".join(parts))
+
+    def save(self, path: str) -> None:
+        outputs = {key: texts for key, texts in self.outputs.items() if texts}
+        with open(path, "w") as f:
+            json.dump({"description": "Recorded with benchmarks/load_test.py --record", "outputs": outputs}, f, indent=2)
@@ -0,0 +1,310 @@
+"""
+Load Test
+---------
+Drives the API in-process (Starlette TestClient, no server needed) with
+concurrent requests and reports latency percentiles and throughput for:
+
+    plans_calculate   POST /plans/calculate
+    users_list        GET  /users?limit=50 (SQLite seeded with --users rows)
+    ai_generate       GET  /ai/generate (distinct profiles, plan cache and neighbours off)
+    ai_stream         the /ai/generate/stream pipeline, time to first streamed day
+    llm_stream        the inference pool directly: time to first token, tokens/s
+
+Two modes:
+    --mode fake   FakeLlama replaying recorded outputs with --prompt-ms /
+                  --token-ms latency (deterministic, runs anywhere)
+    --mode real   the GGUF at LLM_MODEL_PATH (skipped if the file is missing)
+
+The database is always a throwaway SQLite file (DB_BACKEND=sqlite).
+Results are written as JSON; --baseline compares against an earlier run
+and exits 1 when p95 or throughput regress by more than --tolerance.
+
+Usage:
+    python benchmarks/load_test.py --mode fake --requests 200 --concurrency 8 --output bench.json
+    python benchmarks/load_test.py --mode fake --baseline bench.json
+    python benchmarks/load_test.py --mode real --scenarios llm_stream,ai_generate --requests 10 --record out.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("plans_calculate", "users_list", "ai_generate", "ai_stream", "llm_stream")
+GENDERS = ("male", "female", "other")
+ACTIVITY_LEVELS = ("sedentary", "light", "moderate", "active", "very_active")
+GOALS = ("lose", "maintain", "gain")
+
+
+def random_profile(rng: random.Random) -> dict:
+    # Fractional weights keep every profile (and plan cache key) distinct
+    return {
+        "age": rng.randint(18, 70),
+        "height_cm": round(rng.uniform(150, 200), 1),
+        "weight_kg": round(rng.uniform(50, 130), 2),
+        "gender": rng.choice(GENDERS),
+        "activity_level": rng.choice(ACTIVITY_LEVELS),
+        "goal": rng.choice(GOALS),
+    }
+
+
+def prepare_environment(args) -> str:
+    """Point the app at a throwaway SQLite DB before anything imports it."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="gym-ai-bench-"), "bench.sqlite3")
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = db_path
+    os.environ["PLAN_LIBRARY_PATH"] = ""
+    if not args.cache:
+        os.environ["PLAN_CACHE_SIZE"] = "0"
+        os.environ["PLAN_CACHE_PATH"] = ""
+        os.environ["PLAN_COALESCE"] = "0"
+        # Neighbour reuse is a cache too: keep it from hiding model latency
+        os.environ["PLAN_NEIGHBORS_MAX_DISTANCE"] = "0"
+    if args.mode == "fake":
+        # The fake model has no KV state to snapshot
+        os.environ["LLM_PREFIX_CACHE"] = "off"
+        os.environ["LLM_LOAD_MODE"] = "lazy"
+    return db_path
+
+
+def seed_users(count: int, rng: random.Random) -> None:
+    from app.db import get_db_connection
+
+    rows = []
+    for i in range(count):
+        p = random_profile(rng)
+        rows.append((f"bench{i}@example.com", p["age"], p["height_cm"], p["weight_kg"],
+                     p["gender"], p["activity_level"], p["goal"]))
+    with get_db_connection() as conn:
+        conn.cursor().executemany(
+            "INSERT INTO users (email, age, height_cm, weight_kg, gender, activity_level, goal) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+        conn.commit()
+
+
+# --- Scenarios: each call returns a sample dict (or raises) ---
+
+def plans_calculate(client, rng):
+    p = random_profile(rng)
+    response = client.post("/plans/calculate", json=p)
+    return {"status": response.status_code}
+
+
+def users_list(client, rng):
+    response = client.get("/users/", params={"limit": 50, "goal": rng.choice(GOALS)})
+    return {"status": response.status_code}
+
+
+def ai_generate(client, rng):
+    response = client.get("/ai/generate", params=random_profile(rng))
+    return {"status": response.status_code}
+
+
+def ai_stream(client, rng):
+    # TestClient buffers streamed bodies, so time the event iterator that
+    # /ai/generate/stream sends (everything but the HTTP framing)
+    from app.services.ai_model import generate_plan_stream
+
+    started = time.perf_counter()
+    first_day = None
+    for item in generate_plan_stream(**random_profile(rng)):
+        if first_day is None and item["event"] in ("meal_day", "workout_day"):
+            first_day = time.perf_counter() - started
+    return {"status": 200, "ttft": first_day}
+
+
+def llm_stream(client, rng):
+    from app.services.ai_model import build_prompt, inference_pool
+
+    p = random_profile(rng)
+    started = time.perf_counter()
+    first = None
+    tokens = 0
+    for _ in inference_pool.stream(build_prompt(**p), max_tokens=1400, temperature=0.7):
+        tokens += 1
+        if first is None:
+            first = time.perf_counter()
+    done = time.perf_counter()
+    tokens_per_second = (tokens - 1) / (done - first) if tokens > 1 and done > first else None
+    return {"status": 200, "ttft": first - started if first else None, "tokens": tokens, "tokens_per_s": tokens_per_second}
+
+
+def _ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+
+def run_scenario(name: str, client, requests: int, concurrency: int, seed: int) -> dict:
+    fn = globals()[name]
+
+    def one(i):
+        rng = random.Random(seed * 100003 + i)
+        started = time.perf_counter()
+        try:
+            sample = fn(client, rng)
+        except Exception as e:
+            sample = {"status": type(e).__name__}
+        sample["latency"] = time.perf_counter() - started
+        return sample
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [s for s in samples if s["status"] == 200]
+    latencies = [s["latency"] for s in ok]
+    ttft = [s["ttft"] for s in ok if s.get("ttft") is not None]
+    tokens_per_s = [s["tokens_per_s"] for s in ok if s.get("tokens_per_s") is not None]
+    statuses = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": len(ok),
+        "errors": requests - len(ok),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "p50_ms": _ms(latencies, 50),
+        "p95_ms": _ms(latencies, 95),
+        "p99_ms": _ms(latencies, 99),
+        "ttft_p50_ms": _ms(ttft, 50),
+        "ttft_p95_ms": _ms(ttft, 95),
+        "tokens_per_s": round(float(np.mean(tokens_per_s)), 2) if tokens_per_s else None,
+    }
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """Regressions against a previous results file (same scenarios)."""
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        before = baseline.get(r["scenario"])
+        if before is None:
+            continue
+        if before.get("p95_ms") and r["p95_ms"] and r["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['scenario']}: p95 {before['p95_ms']} -> {r['p95_ms']} ms")
+        if before.get("rps") and r["rps"] is not None and r["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']}: rps {before['rps']} -> {r['rps']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency / throughput benchmark for the API")
+    parser.add_argument("--mode", choices=("fake", "real"), default="fake")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=5000, help="Users seeded into SQLite")
+    parser.add_argument("--prompt-ms", type=float, default=200, help="Fake model prompt latency")
+    parser.add_argument("--token-ms", type=float, default=2, help="Fake model per-token latency")
+    parser.add_argument("--recordings", help="Recorded outputs for the fake model (default: fixtures)")
+    parser.add_argument("--record", help="Real mode: save the model's completions here for replay")
+    parser.add_argument("--cache", action="store_true", help="Keep the plan cache, neighbour reuse and coalescing on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    prepare_environment(args)
+
+    from fastapi.testclient import TestClient
+    from app import config
+    from app.services.ai_model import inference_pool
+    from app.services.plan_neighbors import plan_neighbors
+    from benchmarks.fake_llama import FakeLlama, RecordingLlama, load_recordings
+
+    recorders = []
+    if args.mode == "fake":
+        recordings = load_recordings(args.recordings) if args.recordings else load_recordings()
+        inference_pool.set_model_factory(lambda **kw: FakeLlama(recordings, args.prompt_ms, args.token_ms))
+    else:
+        if not os.path.exists(config.LLM_MODEL_PATH):
+            print(f"⚠️ {config.LLM_MODEL_PATH} not found, skipping real-model benchmark")
+            sys.exit(0)
+        if args.record:
+            from app.services.model_loader import create_llama
+
+            def recording_factory(**kw):
+                recorder = RecordingLlama(create_llama(**kw))
+                recorders.append(recorder)
+                return recorder
+            inference_pool.set_model_factory(recording_factory)
+
+    import main as app_main
+
+    seed_users(args.users, random.Random(args.seed))
+
+    results = []
+    with TestClient(app_main.app) as client:
+        for name in scenarios:
+            hits_before = plan_neighbors.stats()["hits"]
+            result = run_scenario(name, client, args.requests, args.concurrency, args.seed)
+            # Requests answered from a neighbour's plan instead of the model
+            result["neighbor_hits"] = plan_neighbors.stats()["hits"] - hits_before
+            results.append(result)
+            print(f"{name:>16}: {result['ok']}/{result['requests']} ok  {result['rps']} req/s  "
+                  f"p50 {result['p50_ms']}  p95 {result['p95_ms']}  p99 {result['p99_ms']} ms"
+                  + (f"  ttft p50 {result['ttft_p50_ms']} ms" if result["ttft_p50_ms"] is not None else "")
+                  + (f"  {result['tokens_per_s']} tok/s" if result["tokens_per_s"] is not None else "")
+                  + (f"  {result['neighbor_hits']} neighbour hits" if result["neighbor_hits"] else ""))
+
+    if recorders:
+        merged = RecordingLlama(None)
+        for recorder in recorders:
+            for key, texts in recorder.outputs.items():
+                merged.outputs[key].extend(texts)
+        merged.save(args.record)
+
+    report = {
+        "benchmark": "load_test",
+        "mode": args.mode,
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "prompt_ms": args.prompt_ms if args.mode == "fake" else None,
+            "token_ms": args.token_ms if args.mode == "fake" else None,
+            "llm_instances": config.LLM_INSTANCES,
+            "llm_total_threads": config.LLM_TOTAL_THREADS,
+            "plan_cache": args.cache,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print("❌ Regression:", line)
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
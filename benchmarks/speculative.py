@@ -0,0 +1,138 @@
+"""
+Speculative Decoding Benchmark
+------------------------------
+Generates plans for a fixed set of standard profiles with each
+LLM_SPECULATIVE mode and compares completion tokens/s against plain
+decoding. Uses the real GGUF at LLM_MODEL_PATH (skipped if missing).
+The "draft" mode also needs --draft-model (or LLM_DRAFT_MODEL_PATH).
+
+Sampling is greedy by default (--temperature 0), so every mode should
+produce the same text; "same_output" in the results checks that.
+
+Usage:
+    python benchmarks/speculative.py --modes off,prompt_lookup --runs 2 --output spec.json
+    python benchmarks/speculative.py --modes off,draft --draft-model data/draft.gguf
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STANDARD_PROFILES = (
+    {"age": 25, "height_cm": 180, "weight_kg": 75, "gender": "male", "activity_level": "moderate", "goal": "gain"},
+    {"age": 34, "height_cm": 165, "weight_kg": 68, "gender": "female", "activity_level": "light", "goal": "lose"},
+    {"age": 45, "height_cm": 175, "weight_kg": 90, "gender": "male", "activity_level": "sedentary", "goal": "lose"},
+    {"age": 29, "height_cm": 170, "weight_kg": 62, "gender": "female", "activity_level": "active", "goal": "maintain"},
+)
+
+
+def run_mode(mode: str, runs: int, temperature: float, n_threads: int) -> dict:
+    from llama_cpp import Llama
+
+    from app import config
+    from app.services.ai_model import build_prompt, generation_kwargs
+    from app.services.llama_settings import load_settings
+    from app.services.speculative import build_draft_model
+
+    llm = Llama(
+        model_path=config.LLM_MODEL_PATH,
+        **load_settings().llama_kwargs(n_threads),
+        verbose=False,
+        draft_model=build_draft_model(mode, n_threads=n_threads),
+    )
+
+    texts = []
+    tokens = 0
+    seconds = 0.0
+    for _ in range(runs):
+        for profile in STANDARD_PROFILES:
+            kwargs = dict(generation_kwargs(profile["goal"]), temperature=temperature)
+            prompt = build_prompt(**profile)
+            # Evaluate the prompt first so only decoding is timed
+            llm(prompt, max_tokens=1, temperature=temperature)
+            started = time.perf_counter()
+            output = llm(prompt, **kwargs)
+            seconds += time.perf_counter() - started
+            tokens += output["usage"]["completion_tokens"]
+            texts.append(output["choices"][0]["text"])
+
+    del llm
+    gc.collect()
+    return {
+        "mode": mode,
+        "completions": len(texts),
+        "completion_tokens": tokens,
+        "seconds": round(seconds, 3),
+        "tokens_per_s": round(tokens / seconds, 2) if seconds else None,
+        "texts": texts,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Speculative decoding tokens/s benchmark")
+    parser.add_argument("--modes", default="off,prompt_lookup", help="Comma-separated LLM_SPECULATIVE modes")
+    parser.add_argument("--runs", type=int, default=1, help="Passes over the standard profiles")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--draft-model", help="Draft GGUF for the draft mode")
+    parser.add_argument("--draft-tokens", type=int, help="Tokens proposed per draft")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.draft_model:
+        os.environ["LLM_DRAFT_MODEL_PATH"] = args.draft_model
+    if args.draft_tokens:
+        os.environ["LLM_DRAFT_TOKENS"] = str(args.draft_tokens)
+    # Settings are read at import; keep the app from loading its own model
+    os.environ["LLM_LOAD_MODE"] = "lazy"
+
+    from app import config
+    from app.services.speculative import MODES
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    if not os.path.exists(config.LLM_MODEL_PATH):
+        print(f"⚠️ {config.LLM_MODEL_PATH} not found, skipping speculative decoding benchmark")
+        sys.exit(0)
+
+    results = [run_mode(mode, args.runs, args.temperature, args.threads) for mode in modes]
+
+    baseline = results[0]
+    for r in results:
+        r["speedup"] = (
+            round(r["tokens_per_s"] / baseline["tokens_per_s"], 2)
+            if r["tokens_per_s"] and baseline["tokens_per_s"] else None
+        )
+        r["same_output"] = r["texts"] == baseline["texts"]
+        print(f"{r['mode']:>14}: {r['completion_tokens']} tokens in {r['seconds']} s  "
+              f"{r['tokens_per_s']} tok/s  x{r['speedup']} vs {baseline['mode']}"
+              + ("" if r["same_output"] else "  (output differs)"))
+
+    if args.output:
+        report = {
+            "benchmark": "speculative",
+            "settings": {
+                "runs": args.runs,
+                "temperature": args.temperature,
+                "threads": args.threads,
+                "profiles": len(STANDARD_PROFILES),
+                "draft_tokens": config.LLM_DRAFT_TOKENS,
+                "draft_ngram": config.LLM_DRAFT_NGRAM,
+                "output_mode": config.LLM_OUTPUT_MODE,
+            },
+            "results": [{k: v for k, v in r.items() if k != "texts"} for r in results],
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
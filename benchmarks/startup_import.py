@@ -0,0 +1,75 @@
+"""
+Startup Benchmark
+-----------------
+Measures how long `import main` takes (and the peak RSS it leaves
+behind) with the model loaded lazily versus at import time, i.e. what
+every uvicorn worker pays before it can serve its first request.
+
+Each sample runs in a fresh interpreter so nothing is cached between runs.
+
+Usage:
+    python benchmarks/startup_import.py --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+from app.services.ai_model import inference_pool
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "model_state": inference_pool.model_status()["state"],
+}))
+"""
+
+
+def measure(mode: str, runs: int) -> dict:
+    env = dict(os.environ, LLM_LOAD_MODE=mode)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    seconds = [s["seconds"] for s in samples]
+    return {
+        "mode": mode,
+        "runs": runs,
+        "median_seconds": round(statistics.median(seconds), 4),
+        "min_seconds": round(min(seconds), 4),
+        "max_rss_mb": round(max(s["max_rss_mb"] for s in samples), 1),
+        "model_state": samples[-1]["model_state"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time benchmark with and without the model")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = [measure(mode, args.runs) for mode in ("lazy", "eager")]
+    for r in results:
+        print(f"{r['mode']:>6}: median {r['median_seconds']:.3f}s  "
+              f"min {r['min_seconds']:.3f}s  rss {r['max_rss_mb']:.0f} MB  model={r['model_state']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "startup_import", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,60 @@
-from fastapi import FastAPI
-from app.routes import users, plans, ai
-from fastapi.middleware.cors import CORSMiddleware
-
-app = FastAPI()
-
-# ✅ Add this middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],  # frontend URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(users.router)
-app.include_router(plans.router)
-app.include_router(ai.router)
-
-@app.get("/")
-def root():
-    return {"message": "Gym AI Backend running"}
+import logging
+import threading
+from fastapi import FastAPI
+from app import config
+from app.routes import users, plans, ai, health, metrics
+from app.services.ai_model import inference_pool, plan_upgrades
+from app.services.jobs import job_store
+from app.services.plan_neighbors import plan_neighbors
+from app.services.request_log import request_log
+from fastapi.middleware.cors import CORSMiddleware
+
+logging.basicConfig(level=config.LOG_LEVEL)
+
+app = FastAPI()
+
+# ✅ Add this middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173"],  # frontend URL
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(users.router)
+app.include_router(plans.router)
+app.include_router(ai.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
+
+
+@app.on_event("startup")
+def startup():
+    # Load the model in the background; /health/ready reports when it's done
+    if config.LLM_LOAD_MODE == "startup":
+        inference_pool.preload()
+    # Index recent model plans for nearest-neighbour reuse, also in the background
+    if plan_neighbors.enabled and config.PLAN_NEIGHBORS_WARM_ROWS > 0:
+        threading.Thread(target=_warm_plan_neighbors, name="plan-neighbors-warm", daemon=True).start()
+
+
+def _warm_plan_neighbors():
+    try:
+        indexed = plan_neighbors.warm(config.PLAN_NEIGHBORS_WARM_ROWS)
+        print(f"✅ Indexed {indexed} recent plans for neighbour lookups")
+    except Exception as e:
+        print("⚠️ Plan neighbour index warm-up failed:", e)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    job_store.shutdown()
+    plan_upgrades.shutdown()
+    inference_pool.stop(timeout=5)
+    request_log.close()
+
+
+@app.get("/")
+def root():
+    return {"message": "Gym AI Backend running"}
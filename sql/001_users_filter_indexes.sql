@@ -0,0 +1,5 @@
+-- Indexes backing keyset pagination + filters on GET /users and /users/export.
+-- Each index ends in id so "WHERE ... AND id > ? ORDER BY id LIMIT n" is an index range scan.
+CREATE INDEX idx_users_goal_id ON users (goal, id);
+CREATE INDEX idx_users_activity_id ON users (activity_level, id);
+CREATE INDEX idx_users_goal_activity_id ON users (goal, activity_level, id);
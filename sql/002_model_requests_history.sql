@@ -0,0 +1,10 @@
+-- Plan history: GET /users/{id}/plans pages newest first with
+-- "WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT n",
+-- an index range scan on this index.
+CREATE INDEX idx_model_requests_user_created ON model_requests (user_id, created_at, id);
+
+-- Payloads are now zlib-compressed bytes (app/services/plan_history.py).
+-- Existing JSON text is kept byte for byte and still decodes.
+ALTER TABLE model_requests
+    MODIFY request_json MEDIUMBLOB,
+    MODIFY response_json MEDIUMBLOB;
@@ -1,6 +1,7 @@
 import React, { useState } from "react";
 import PlanForm from "./components/PlanForm";
 import PlanDisplay from "./components/PlanDisplay";
+import PlanResult from "./components/PlanResult";
 import "./App.css";
 
 function App() {
@@ -14,7 +15,7 @@ function App() {
       <PlanForm setPlan={setPlan} />
 
       {/* Display generated plan */}
-      {plan && <PlanDisplay plan={plan} />}
+      {plan && (plan.mode === "ai" ? <PlanResult plan={plan} /> : <PlanDisplay plan={plan} />)}
     </div>
   );
 }
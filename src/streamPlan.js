@@ -0,0 +1,34 @@
+// src/streamPlan.js
+// Reads /ai/generate/stream (NDJSON) and hands every event to onEvent
+// as soon as it arrives: macros → meal_day/workout_day … → done.
+
+const API_URL = "http://127.0.0.1:8000";
+
+export async function streamAiPlan(params, onEvent, signal) {
+  const query = new URLSearchParams({ ...params, format: "ndjson" });
+  const res = await fetch(`${API_URL}/ai/generate/stream?${query}`, { signal });
+
+  if (!res.ok) {
+    const body = await res.json().catch(() => ({}));
+    throw new Error(body.detail || `Request failed (${res.status})`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
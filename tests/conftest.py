@@ -0,0 +1,26 @@
+"""
+Test Setup
+----------
+Runs the app against a throwaway SQLite database with no model file, so
+the suite needs neither MySQL nor a GGUF. The environment is set before
+any app module is imported (app.config reads it once).
+
+Usage:
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="gym-ai-tests-"), "test.sqlite3"))
+os.environ.setdefault("PLAN_CACHE_PATH", "")
+os.environ.setdefault("PLAN_LIBRARY_PATH", "")
+os.environ.setdefault("LLM_LOAD_MODE", "lazy")
+os.environ.setdefault("LLM_PREFIX_CACHE", "off")
+os.environ.setdefault("LLM_OUTPUT_MODE", "json")
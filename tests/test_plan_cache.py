@@ -0,0 +1,81 @@
+import pytest
+
+from app.services import plan_cache as plan_cache_module
+from app.services.plan_cache import DiskPlanCache, PlanCache
+
+PLAN = {"meal_plan": [{"day": 1}], "workout_plan": [{"day": 1}]}
+
+
+class FakeClock:
+    """Stands in for the time module: wall clock and monotonic move together."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now - 999_000.0
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(plan_cache_module, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def disk(tmp_path, clock):
+    return DiskPlanCache(str(tmp_path / "plan_cache.sqlite3"), ttl=100)
+
+
+def test_memory_entry_expires(clock):
+    cache = PlanCache(max_size=10, ttl=100)
+    cache.set("k", PLAN)
+    clock.advance(99)
+    assert cache.get("k") == PLAN
+    clock.advance(2)
+    assert cache.get("k") is None
+
+
+def test_promoted_entry_keeps_its_remaining_lifetime(clock, disk):
+    writer = PlanCache(max_size=10, ttl=100, disk=disk)
+    reader = PlanCache(max_size=10, ttl=100, disk=disk)
+    writer.set("k", PLAN)
+
+    clock.advance(60)
+    assert reader.get("k") == PLAN
+    assert reader.stats()["disk_hits"] == 1
+
+    # A fresh TTL on promotion would keep it alive until t=160
+    clock.advance(41)
+    assert reader.get("k") is None
+
+
+def test_disk_row_is_deleted_once_expired(clock, disk):
+    disk.set("k", PLAN)
+    clock.advance(101)
+    assert disk.get("k") is None
+    assert disk._conn.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0] == 0
+
+
+def test_disk_purges_expired_rows_on_write(clock, disk):
+    disk.set("old", PLAN)
+    clock.advance(101)
+    for i in range(DiskPlanCache.PURGE_EVERY - 1):
+        disk.set(f"new{i}", PLAN)
+    keys = {row[0] for row in disk._conn.execute("SELECT cache_key FROM plan_cache")}
+    assert "old" not in keys
+    assert len(keys) == DiskPlanCache.PURGE_EVERY - 1
+
+
+def test_cached_value_is_a_copy(clock):
+    cache = PlanCache(max_size=10, ttl=0)
+    cache.set("k", PLAN)
+    cache.get("k")["meal_plan"].clear()
+    assert cache.get("k") == PLAN
@@ -0,0 +1,79 @@
+import json
+
+from app.services.ai_model import parse_plan_output
+from app.services.plan_stream import PLAN_DAYS, IncrementalPlanParser, merge_days, missing_days
+
+
+def _meal_day(day):
+    return {"day": day, "meals": [{"meal_time": "breakfast", "food": f"Oats {day}"}]}
+
+
+def _workout_day(day):
+    return {"day": day, "exercises": [{"name": f"Squats {day}", "sets": 3, "reps": "8-12"}]}
+
+
+def _completion(meal_days, workout_days):
+    plan = {
+        "meal_plan": [_meal_day(d) for d in meal_days],
+        "workout_plan": [_workout_day(d) for d in workout_days],
+    }
+    return "BEGIN_JSON\n" + json.dumps(plan, indent=2) + "\nEND_JSON"
+
+
+def _cut_after(text, marker):
+    return text[:text.index(marker) + len(marker)]
+
+
+def test_complete_output_parses():
+    ideas = parse_plan_output(_completion(PLAN_DAYS, PLAN_DAYS))
+    assert missing_days(ideas) == []
+
+
+def test_truncated_mid_meals_keeps_finished_days():
+    text = _completion(PLAN_DAYS, PLAN_DAYS)
+    ideas = parse_plan_output(_cut_after(text, '"food": "Oats 4"'))
+    assert [day["day"] for day in ideas["meal_plan"]] == [1, 2, 3]
+    assert ideas["workout_plan"] == []
+
+
+def test_truncated_mid_workout_keeps_all_meal_days():
+    # Every meal day finished, the first workout day never closed
+    text = _completion(PLAN_DAYS, PLAN_DAYS)
+    ideas = parse_plan_output(_cut_after(text, '"name": "Squats 1"'))
+    assert ideas is not None
+    assert [day["day"] for day in ideas["meal_plan"]] == list(PLAN_DAYS)
+    assert ideas["workout_plan"] == []
+    assert missing_days(ideas) == list(PLAN_DAYS)
+
+
+def test_truncated_mid_workout_merges_only_missing_section_days():
+    text = _completion(PLAN_DAYS, PLAN_DAYS)
+    ideas = parse_plan_output(_cut_after(text, '"name": "Squats 3"'))
+    assert [day["day"] for day in ideas["workout_plan"]] == [1, 2]
+
+    days = missing_days(ideas)
+    continuation = {
+        "meal_plan": [dict(_meal_day(d), meals=[]) for d in days],
+        "workout_plan": [_workout_day(d) for d in days],
+    }
+    merged = merge_days(ideas, continuation, days)
+    assert missing_days(merged) == []
+    # Finished meal days are kept, not replaced by the continuation's
+    assert merged["meal_plan"] == [_meal_day(d) for d in PLAN_DAYS]
+    assert [day["day"] for day in merged["workout_plan"]] == list(PLAN_DAYS)
+
+
+def test_no_finished_day_is_unusable():
+    text = _completion(PLAN_DAYS, PLAN_DAYS)
+    assert parse_plan_output(_cut_after(text, '"food": "Oats 1"')) is None
+    assert parse_plan_output("I cannot help with that.") is None
+
+
+def test_incremental_parser_reports_days_as_they_close():
+    text = _completion([1, 2], [1])
+    parser = IncrementalPlanParser()
+    events = []
+    for i in range(0, len(text), 7):
+        events.extend((section, day["day"]) for section, day in parser.feed(text[i:i + 7]))
+    assert events == [("meal_plan", 1), ("meal_plan", 2), ("workout_plan", 1)]
+    assert parser.finished
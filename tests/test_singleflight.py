@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _run_concurrently(flights, key, fn, callers):
+    """Start one leader, then callers - 1 waiters; returns (results, errors) once all finish."""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flights.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    _wait_for(lambda: flights.stats()["in_flight"] == 1)
+    threads += [threading.Thread(target=call) for _ in range(callers - 1)]
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for(lambda: flights.stats()["waiting"] == callers - 1)
+    return threads, results, errors
+
+
+def test_waiters_share_the_leaders_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        release.wait()
+        return {"plan": 1}
+
+    threads, results, errors = _run_concurrently(flights, "k", fn, callers=4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert runs == [1]
+    assert results == [{"plan": 1}] * 4 and not errors
+    assert flights.stats()["coalesced"] == 3
+
+
+def test_leader_error_reaches_every_waiter():
+    flights = SingleFlight()
+    release = threading.Event()
+    failure = RuntimeError("model crashed")
+
+    def fn():
+        release.wait()
+        raise failure
+
+    threads, results, errors = _run_concurrently(flights, "k", fn, callers=3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert not results
+    assert errors == [failure] * 3
+    # The failed call is forgotten: the next caller runs fn again
+    assert flights.stats()["in_flight"] == 0
+    assert flights.do("k", lambda: "retried") == "retried"
+
+
+def test_disabled_runs_every_call():
+    flights = SingleFlight(enabled=False)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flights.do("k", fail)
+    assert flights.do("k", lambda: 2) == 2
+    assert flights.stats()["leaders"] == 0
@@ -0,0 +1,65 @@
+import uuid
+
+from app.db import get_db_connection
+from app.routes import users
+from app.routes.users import INSERT_USER, UserCreate, _insert_users, _user_values
+
+
+def _user(email):
+    return UserCreate(email=email, age=30, height_cm=180, weight_kg=80,
+                      gender="male", activity_level="moderate", goal="maintain")
+
+
+def _emails(count):
+    prefix = uuid.uuid4().hex[:8]
+    return [f"{prefix}-{i}@example.com" for i in range(count)]
+
+
+def _insert(user):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(INSERT_USER, _user_values(user))
+        conn.commit()
+        return cursor.lastrowid
+
+
+def test_new_existing_and_repeated_emails():
+    new, taken = _emails(2)
+    taken_id = _insert(_user(taken))
+
+    results = _insert_users([(0, _user(new)), (1, _user(taken)), (2, _user(new.upper()))])
+
+    assert [r["status"] for r in results] == ["created", "duplicate", "duplicate"]
+    assert results[1]["id"] == taken_id
+    # The repeat within the upload points at the row just created
+    assert results[2]["id"] == results[0]["id"] is not None
+
+
+def test_created_ids_are_distinct():
+    results = _insert_users([(i, _user(email)) for i, email in enumerate(_emails(50))])
+    assert all(r["status"] == "created" for r in results)
+    assert len({r["id"] for r in results}) == 50
+
+
+def test_email_taken_after_the_existing_check(monkeypatch):
+    # Another import inserts one of the emails between the SELECT and the
+    # INSERT: the chunk falls back to per-row inserts and reports it as a
+    # duplicate instead of counting it as created
+    free, raced = _emails(2)
+    raced_id = _insert(_user(raced))
+    real_user_ids = users._user_ids
+    calls = []
+
+    def stale_first_lookup(cursor, emails):
+        calls.append(emails)
+        return {} if len(calls) == 1 else real_user_ids(cursor, emails)
+
+    monkeypatch.setattr(users, "_user_ids", stale_first_lookup)
+    results = _insert_users([(0, _user(free)), (1, _user(raced))])
+
+    assert [r["status"] for r in results] == ["created", "duplicate"]
+    assert results[1]["id"] == raced_id
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users WHERE email IN (%s, %s)", (free, raced))
+        assert cursor.fetchone()[0] == 2